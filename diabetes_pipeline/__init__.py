@@ -0,0 +1,4 @@
+######################################## diabetes_pipeline
+# The diabetes analysis as an importable package, run as
+# python -m diabetes_pipeline <command> (see cli.py). Nothing is imported here,
+# so every command only loads the modules it needs.
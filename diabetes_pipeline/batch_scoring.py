@@ -0,0 +1,139 @@
+######################################## batch scoring
+# Scores new patients with the saved classifier without rerunning the training
+# script. The training run saves everything scoring needs into one joblib file
+# (the classifier and its feature transform compiled into an InferencePlan),
+# and score_file streams a CSV or Parquet file through it in fixed-size chunks:
+# zeros to NaN, missingness indicators, imputation, add_custom_features, the
+# pairwise features and predict_proba. Chunks are scored in worker processes
+# that load the artifacts once each, and the probabilities are appended to the
+# output file in input order as chunks finish, so memory stays flat whatever
+# the size of the input.
+#
+#   python -m diabetes_pipeline score scoring_artifacts.joblib patients.csv probabilities.csv
+import os
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, dump, load, parallel_config
+
+from .data_store import COLUMNS_WITH_ZEROS
+from .feature_engineering import add_custom_features
+from .inference_plan import compile_plan
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+# Missingness indicator columns the preprocessor was fitted with, and their source
+MISSING_INDICATORS = {'Insulin_missing': 'Insulin', 'BMI_missing': 'BMI'}
+
+
+def save_scoring_artifacts(path, preprocessor, classifier, imputed_columns, model_features,
+                           columns_with_zeros=COLUMNS_WITH_ZEROS,
+                           missing_indicators=MISSING_INDICATORS, dtype=np.float64):
+    # The transform is compiled here, at fit time, into a plan that computes only
+    # model_features from the raw inputs (see inference_plan.py); dtype is the dtype
+    # training computed the custom features in
+    plan = compile_plan(preprocessor, imputed_columns, model_features, add_custom_features,
+                        columns_with_zeros, missing_indicators, dtype)
+    artifacts = {
+        'preprocessor': preprocessor,
+        'classifier': classifier,
+        'plan': plan,
+        'raw_columns': plan.raw_columns,
+        'model_features': list(model_features),
+    }
+    dump(artifacts, path)
+    return path
+
+
+# Artifacts already loaded in this process, by path
+_ARTIFACTS = {}
+
+
+def _load_artifacts(path):
+    if path not in _ARTIFACTS:
+        _ARTIFACTS[path] = load(path)
+    return _ARTIFACTS[path]
+
+
+# The model's feature matrix for a chunk of raw rows
+def transform_chunk(chunk, artifacts):
+    return artifacts['plan'].transform(chunk[artifacts['raw_columns']].to_numpy(dtype=np.float64))
+
+
+def _score_chunk(artifacts_path, start, chunk, id_column):
+    artifacts = _load_artifacts(artifacts_path)
+    features = transform_chunk(chunk, artifacts)
+    scored = pd.DataFrame({'row': np.arange(start, start + len(chunk))})
+    if id_column is not None:
+        scored[id_column] = chunk[id_column].to_numpy()
+    scored['probability'] = artifacts['classifier'].predict_proba(features)[:, 1]
+    return scored
+
+
+def iter_chunks(path, chunk_size):
+    if str(path).endswith(PARQUET_SUFFIXES):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+# Appends scored chunks to a CSV or Parquet file
+class _ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = str(path).endswith(PARQUET_SUFFIXES)
+        self._writer = None
+        self._header = True
+
+    def write(self, scored):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            scored.to_csv(self.path, mode='w' if self._header else 'a',
+                          header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _numbered(chunks):
+    start = 0
+    for chunk in chunks:
+        yield start, chunk
+        start += len(chunk)
+
+
+# Score every row of input_path and write row number (plus id_column when given)
+# and probability to output_path; returns the number of rows scored
+def score_file(artifacts_path, input_path, output_path, chunk_size=50_000, n_jobs=None,
+               id_column=None, verbose=0):
+    artifacts_path = os.path.abspath(artifacts_path)
+    writer = _ChunkWriter(output_path)
+    n_rows = 0
+    try:
+        # One thread per worker: the workers are the parallelism. pre_dispatch
+        # bounds the chunks in flight, and the ordered generator hands results
+        # back in input order
+        with parallel_config(backend='loky', inner_max_num_threads=1):
+            scored_chunks = Parallel(n_jobs=n_jobs, return_as='generator',
+                                     pre_dispatch='2*n_jobs')(
+                delayed(_score_chunk)(artifacts_path, start, chunk, id_column)
+                for start, chunk in _numbered(iter_chunks(input_path, chunk_size)))
+            for scored in scored_chunks:
+                writer.write(scored)
+                n_rows += len(scored)
+                if verbose:
+                    print(f"[batch_scoring] {n_rows} rows scored")
+    finally:
+        writer.close()
+    return n_rows
+
@@ -0,0 +1,296 @@
+######################################## benchmark suite
+# Times and memory-profiles the pipeline stages on synthetic data of growing
+# size (10^3 to 10^7 rows):
+#   imputation         the ColumnTransformer (median + KNN imputers) fit_transform
+#   custom_features    add_custom_features
+#   feature_synthesis  the pairwise (DFS) features
+#   xgboost_cv         3-fold cross-validation of an XGBoost classifier
+#   feature_selection  the top-n feature subset loop (coarse_to_fine)
+#   batch_scoring      score_file on a CSV of the raw rows
+# synthetic_diabetes generates rows with the Pima schema, similar marginals, a
+# Glucose/BMI/Age driven outcome and the dataset's zero ("not measured")
+# patterns, including SkinThickness zeros that nearly always come with Insulin
+# zeros. Each stage's inputs are prepared untimed, so selecting one stage only
+# measures that stage. Stages whose cost grows too fast to be practical are
+# skipped above STAGE_MAX_ROWS (override with max_rows). Results are written to
+# a JSON file with the commit and library versions; compare_results puts two
+# such files side by side.
+#
+#   python -m diabetes_pipeline bench --sizes 1e3 1e4 1e5 1e6 --output bench.json
+#   python -m diabetes_pipeline bench --compare old.json new.json
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from xgboost import XGBClassifier
+
+from .batch_scoring import MISSING_INDICATORS, save_scoring_artifacts, score_file
+from .data_store import COLUMNS_WITH_ZEROS
+from .feature_engineering import add_custom_features
+from .feature_selection import select_top_features
+from .pairwise_features import pairwise_features
+from .profiling import measure
+from .training import imputation_search_space
+
+SIZES = (10 ** 3, 10 ** 4, 10 ** 5)
+
+STAGES = ('imputation', 'custom_features', 'feature_synthesis', 'xgboost_cv',
+          'feature_selection', 'batch_scoring')
+
+# Largest size each stage runs at by default (the pairwise matrix has ~780
+# float32 columns, the selection loop refits XGBoost many times); None means no
+# limit
+STAGE_MAX_ROWS = {
+    'imputation': None,
+    'custom_features': None,
+    'feature_synthesis': 10 ** 6,
+    'xgboost_cv': 10 ** 6,
+    'feature_selection': 10 ** 5,
+    'batch_scoring': 10 ** 6,
+}
+
+# Rows the scoring artifacts' imputers and model are fitted on, and the number of
+# (most important) features the scoring model uses
+SCORING_FIT_ROWS = 5000
+SCORING_FEATURES = 20
+
+# What each stage needs prepared (untimed) before it is measured
+STAGE_INPUTS = {
+    'imputation': ('prepared', 'preprocessor'),
+    'custom_features': ('imputed',),
+    'feature_synthesis': ('enhanced',),
+    'xgboost_cv': ('features', 'prepared'),
+    'feature_selection': ('features', 'prepared', 'ranking'),
+    'batch_scoring': ('artifacts', 'csv'),
+}
+
+TARGET = 'Outcome'
+
+
+# Synthetic rows with the diabetes.csv schema; zeros mark unmeasured values as in the original
+def synthetic_diabetes(n_rows, random_state=0):
+    rng = np.random.default_rng(random_state)
+    pregnancies = rng.poisson(3.8, n_rows)
+    glucose = np.clip(rng.normal(121, 30, n_rows), 44, 199).round()
+    blood_pressure = np.clip(rng.normal(72, 12, n_rows), 24, 122).round()
+    skin_thickness = np.clip(rng.normal(29, 10, n_rows), 7, 99).round()
+    insulin = np.clip(rng.lognormal(4.85, 0.6, n_rows), 14, 846).round()
+    bmi = np.clip(rng.normal(32.4, 6.9, n_rows), 18.2, 67.1).round(1)
+    pedigree = np.clip(rng.lognormal(-0.95, 0.6, n_rows), 0.078, 2.42).round(3)
+    age = np.clip(21 + rng.gamma(1.6, 7.5, n_rows), 21, 81).round()
+
+    # Roughly 35% positives, rising with glucose, BMI, age, pregnancies and pedigree
+    logit = (-9.1 + 0.035 * glucose + 0.09 * bmi + 0.012 * age + 0.12 * pregnancies
+             + 0.9 * pedigree)
+    outcome = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+
+    # Share of zeros per column in the Pima data; Insulin is missing for nearly
+    # every row without SkinThickness, plus some more
+    skin_missing = rng.random(n_rows) < 0.296
+    insulin_missing = skin_missing | (rng.random(n_rows) < 0.271)
+    glucose[rng.random(n_rows) < 0.0065] = 0
+    blood_pressure[rng.random(n_rows) < 0.046] = 0
+    bmi[rng.random(n_rows) < 0.014] = 0
+    skin_thickness[skin_missing] = 0
+    insulin[insulin_missing] = 0
+
+    return pd.DataFrame({
+        'Pregnancies': pregnancies.astype(np.int64),
+        'Glucose': glucose.astype(np.int64),
+        'BloodPressure': blood_pressure.astype(np.int64),
+        'SkinThickness': skin_thickness.astype(np.int64),
+        'Insulin': insulin.astype(np.int64),
+        'BMI': bmi,
+        'DiabetesPedigreeFunction': pedigree,
+        'Age': age.astype(np.int64),
+        'Outcome': outcome,
+    })
+
+
+def _classifier(n_estimators=100):
+    return XGBClassifier(n_estimators=n_estimators, max_depth=5, learning_rate=0.1,
+                         tree_method='hist', eval_metric='logloss')
+
+
+# Inputs and outputs of the stages at one size, computed on first use; the tests
+# use it for fitted scoring artifacts ('artifacts') and the raw rows ('csv', 'raw')
+class SizeRun:
+    def __init__(self, n_rows, random_state, workdir):
+        self.n_rows = n_rows
+        self.random_state = random_state
+        self.workdir = workdir
+        self.values = {}
+
+    def get(self, key):
+        if key not in self.values:
+            self.values[key] = getattr(self, f'_make_{key}')()
+        return self.values[key]
+
+    def _make_raw(self):
+        return synthetic_diabetes(self.n_rows, self.random_state)
+
+    # Zeros to NaN and the missingness indicators, as the data store and
+    # analyze_missingness do
+    def _make_prepared(self):
+        df = self.get('raw').copy()
+        df[COLUMNS_WITH_ZEROS] = df[COLUMNS_WITH_ZEROS].replace(0, np.nan)
+        for indicator, column in MISSING_INDICATORS.items():
+            df[indicator] = df[column].isnull().astype(int)
+        return df.drop(columns=[TARGET]), df[TARGET]
+
+    # Cheap median fill, so the stages after imputation do not depend on running it
+    def _make_imputed(self):
+        X, _ = self.get('prepared')
+        return X.fillna(X.median())
+
+    def _make_enhanced(self):
+        return add_custom_features(self.get('imputed'))
+
+    def _make_features(self):
+        enhanced = self.get('enhanced')
+        return pairwise_features(enhanced, enhanced.columns)
+
+    # Features ranked by the importance of one XGBoost fit
+    def _make_ranking(self):
+        features = self.get('features')
+        model = _classifier(50).fit(features, self.get('prepared')[1])
+        return features.columns[np.argsort(model.feature_importances_)[::-1]]
+
+    def _make_preprocessor(self):
+        pipeline, _ = imputation_search_space()
+        return pipeline.named_steps['preprocessor']
+
+    def _make_csv(self):
+        path = os.path.join(self.workdir, f'raw_{self.n_rows}.csv')
+        self.get('raw').to_csv(path, index=False)
+        return path
+
+    def _make_artifacts(self):
+        X, y = self.get('prepared')
+        n_fit = min(SCORING_FIT_ROWS, self.n_rows)
+        preprocessor = clone(self.get('preprocessor')).fit(X.iloc[:n_fit])
+        feature_names = list(self.get('ranking')[:SCORING_FEATURES])
+        model = _classifier().fit(self.get('features')[feature_names].iloc[:n_fit], y.iloc[:n_fit])
+        # Output names are '<transformer>__<column>'
+        imputed_columns = [name.split('__', 1)[1] for name in preprocessor.get_feature_names_out()]
+        path = os.path.join(self.workdir, f'artifacts_{self.n_rows}.joblib')
+        return save_scoring_artifacts(path, preprocessor, model, imputed_columns, feature_names)
+
+    # The timed work of one stage (its STAGE_INPUTS are prepared beforehand)
+    def stage(self, name):
+        if name == 'imputation':
+            X, _ = self.get('prepared')
+            clone(self.get('preprocessor')).fit_transform(X)
+        elif name == 'custom_features':
+            self.values['enhanced'] = add_custom_features(self.get('imputed'))
+        elif name == 'feature_synthesis':
+            enhanced = self.get('enhanced')
+            self.values['features'] = pairwise_features(enhanced, enhanced.columns)
+        elif name == 'xgboost_cv':
+            cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=self.random_state)
+            cross_val_score(_classifier(), self.get('features'), self.get('prepared')[1], cv=cv,
+                            scoring='roc_auc')
+        elif name == 'feature_selection':
+            cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=self.random_state)
+            select_top_features(_classifier(50), self.get('features'), self.get('prepared')[1],
+                                self.get('ranking'), cv=cv, method='coarse_to_fine',
+                                coarse_points=10, n_jobs=1)
+        elif name == 'batch_scoring':
+            score_file(self.get('artifacts'), self.get('csv'),
+                       os.path.join(self.workdir, f'scores_{self.n_rows}.csv'))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import sklearn
+    import xgboost
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__, 'machine': platform.machine(),
+            'cpu_count': os.cpu_count()}
+
+
+# Run the benchmark and write the results to output (JSON); returns the result rows
+def run_benchmark(sizes=SIZES, stages=STAGES, output='benchmark_results.json', repeats=1,
+                  max_rows=None, random_state=0, verbose=1):
+    limits = dict(STAGE_MAX_ROWS, **(max_rows or {}))
+    results = []
+    with tempfile.TemporaryDirectory(prefix='diabetes_bench_') as workdir:
+        for n_rows in sizes:
+            run = SizeRun(n_rows, random_state, workdir)
+            for stage in stages:
+                row = {'stage': stage, 'n_rows': n_rows}
+                limit = limits.get(stage)
+                if limit is not None and n_rows > limit:
+                    results.append(dict(row, status=f'skipped (above {limit} rows)'))
+                    continue
+                for key in STAGE_INPUTS[stage]:
+                    run.get(key)
+                for repeat in range(repeats):
+                    with measure() as measurement:
+                        run.stage(stage)
+                    results.append(dict(row, status='ok', repeat=repeat, **measurement.as_dict()))
+                    if verbose:
+                        print(f"[bench] {stage:<18} n={n_rows:>9}  {measurement.wall_s:8.3f}s  "
+                              f"cpu {measurement.cpu_s:8.3f}s  peak {measurement.peak_rss_mb:8.1f} MB")
+            del run
+
+    report = {
+        'commit': _git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'sizes': list(sizes),
+        'results': results,
+    }
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    return results
+
+
+# Best (lowest) wall time and peak memory per (stage, n_rows) of a results file
+def _best(path):
+    with open(path) as file:
+        report = json.load(file)
+    best = {}
+    for row in report['results']:
+        if row['status'] != 'ok':
+            continue
+        key = (row['stage'], row['n_rows'])
+        wall, peak = best.get(key, (np.inf, np.inf))
+        best[key] = (min(wall, row['wall_s']), min(peak, row['peak_rss_mb']))
+    return report.get('commit'), best
+
+
+# Side-by-side wall time and peak memory of two results files
+def compare_results(old_path, new_path):
+    old_commit, old = _best(old_path)
+    new_commit, new = _best(new_path)
+    print(f"old: {old_commit}  new: {new_commit}")
+    print(f"{'stage':<18} {'rows':>9} {'old s':>9} {'new s':>9} {'ratio':>6} "
+          f"{'old MB':>8} {'new MB':>8}")
+    rows = []
+    for key in sorted(set(old) & set(new), key=lambda key: (STAGES.index(key[0])
+                                                           if key[0] in STAGES else 99, key[1])):
+        (old_wall, old_peak), (new_wall, new_peak) = old[key], new[key]
+        ratio = new_wall / old_wall if old_wall else np.nan
+        rows.append({'stage': key[0], 'n_rows': key[1], 'old_wall_s': old_wall,
+                     'new_wall_s': new_wall, 'ratio': ratio, 'old_peak_rss_mb': old_peak,
+                     'new_peak_rss_mb': new_peak})
+        print(f"{key[0]:<18} {key[1]:>9} {old_wall:9.3f} {new_wall:9.3f} {ratio:6.2f} "
+              f"{old_peak:8.1f} {new_peak:8.1f}")
+    return rows
@@ -0,0 +1,116 @@
+######################################## stage checkpoints
+# Each pipeline stage is a plain function. StageCache.run(stage, func, *args,
+# **kwargs) stores the stage's return value under a key hashed from the stage
+# name, the code the stage can run and every argument (joblib.hash, so
+# DataFrames, arrays, param grids and estimators all count by content). The code
+# is the source of the function's module and of every module of the same
+# package it imports, followed transitively, so an edit to any helper a stage
+# calls (pairwise_features, HalvingSearchCV, little_mcar_test, ...) gives a new
+# key; upgrades of other packages (sklearn, xgboost) do not. A rerun with the same inputs
+# loads the stored artifact instead of recomputing it, and anything that changes
+# an input - a new CSV, an edited param_grid, the output of an upstream stage -
+# gives a new key. depends_on adds values that the key must cover but the
+# function does not take, such as the CSV file's content hash (functions and
+# classes count by their module code). Each run is a tracing span, so an open
+# trace times every stage, hit or miss.
+import ast
+import hashlib
+import importlib.util
+import inspect
+import os
+
+import joblib
+
+from . import tracing
+
+
+# Content hash of a file, read in chunks
+def file_fingerprint(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Source of a module and of every module of its package it imports, also inside
+# functions (read from the files, so nothing is imported), by module name
+def _module_sources(module_name):
+    package = module_name.split('.')[0]
+    sources, seen, todo = {}, set(), [module_name]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            continue  # not a module (an imported function), or __main__
+        if spec is None or not str(spec.origin).endswith('.py'):
+            continue
+        with open(spec.origin) as file:
+            sources[name] = file.read()
+        parent = name if spec.submodule_search_locations else name.rpartition('.')[0]
+        for node in ast.walk(ast.parse(sources[name])):
+            if isinstance(node, ast.ImportFrom):
+                base = (importlib.util.resolve_name('.' * node.level + (node.module or ''), parent)
+                        if node.level else node.module)
+                targets = [base] + [f'{base}.{alias.name}' for alias in node.names]
+            elif isinstance(node, ast.Import):
+                targets = [alias.name for alias in node.names]
+            else:
+                continue
+            todo.extend(target for target in targets if target.split('.')[0] == package)
+    return sorted(sources.items())
+
+
+def _source(value):
+    if inspect.isfunction(value) or inspect.isclass(value):
+        sources = _module_sources(value.__module__)
+        if sources:
+            return value.__qualname__, sources
+        # Defined interactively: fall back to the compiled bytecode
+        code = getattr(value, '__code__', None)
+        return value.__qualname__, code.co_code if code is not None else None
+    return value
+
+
+class StageCache:
+    def __init__(self, root='checkpoints', enabled=True, verbose=1):
+        self.root = root
+        self.enabled = enabled
+        self.verbose = verbose
+        self.hits = []
+        self.misses = []
+
+    def key(self, stage, func, args, kwargs, depends_on=()):
+        return joblib.hash((stage, _source(func), args, sorted(kwargs.items()),
+                            [_source(value) for value in depends_on]))
+
+    def path(self, stage, key):
+        return os.path.join(self.root, stage, f'{key}.joblib')
+
+    def run(self, stage, func, *args, depends_on=(), **kwargs):
+        if not self.enabled:
+            with tracing.span(stage, checkpoint='off'):
+                return func(*args, **kwargs)
+        key = self.key(stage, func, args, kwargs, depends_on)
+        path = self.path(stage, key)
+        if os.path.exists(path):
+            if self.verbose:
+                print(f"[checkpoint] {stage}: reusing {path}")
+            self.hits.append(stage)
+            with tracing.span(stage, checkpoint='hit'):
+                return joblib.load(path)
+
+        with tracing.span(stage, checkpoint='miss'):
+            result = func(*args, **kwargs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so a killed run never leaves a partial artifact
+        joblib.dump(result, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        if self.verbose:
+            print(f"[checkpoint] {stage}: saved {path}")
+        self.misses.append(stage)
+        return result
@@ -0,0 +1,274 @@
+######################################## command line
+#   python -m diabetes_pipeline eda       figures of the raw data and its missingness
+#   python -m diabetes_pipeline train     imputation search, feature synthesis, XGBoost tuning
+#   python -m diabetes_pipeline select    feature selection; saves scoring_artifacts.joblib
+#   python -m diabetes_pipeline compare   imputation strategies and the model x scaler comparison
+#   python -m diabetes_pipeline score     batch-score a CSV / Parquet file with the saved model
+#   python -m diabetes_pipeline serve     local prediction server
+#   python -m diabetes_pipeline bench     stage benchmarks on synthetic data
+#   python -m diabetes_pipeline trace-summary TRACE   slowest stages and fits of a --trace file
+#   python -m diabetes_pipeline worker    cross-validation worker for --workers (see cluster.py)
+# Each command imports its modules inside its handler, so a command only pays for
+# the libraries it uses: score and serve never import matplotlib, seaborn,
+# missingno, optuna or the training code, and the modelling commands only import
+# the plotting stack when figures are drawn. train / select / compare run their
+# upstream stages through the checkpoints, so e.g. select after train reuses its
+# results.
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+
+# Budget for the score path's startup: the wall time of a fresh
+# `python -m diabetes_pipeline score ARTIFACTS --load-only` (interpreter start,
+# imports, loading the artifacts) minus that of `python -c "import xgboost"`.
+# Unpickling the model imports xgboost, which itself imports sklearn, scipy and
+# pandas, so that is the floor; everything the package adds on top must stay
+# under this many seconds. Checked with `score ARTIFACTS --startup-check`
+SCORE_STARTUP_OVERHEAD_TARGET = 0.5
+
+STAGE_MODULES = {
+    'eda': 'preparation',
+    'train': 'training',
+    'select': 'selection',
+    'compare': 'comparison',
+}
+
+
+def _run_stage(args):
+    import importlib
+    from . import tracing
+    from .context import RunContext
+    from .profiling import measure
+    module = importlib.import_module(f'.{STAGE_MODULES[args.command]}', __package__)
+    ctx = RunContext(data_path=args.data, store_dir=args.store_dir,
+                     checkpoint_dir=args.checkpoint_dir, use_checkpoints=not args.no_checkpoints,
+                     eda_mode=args.eda_mode, eda_output_dir=args.eda_output_dir,
+                     compact=args.compact)
+    if args.workers:
+        from .cluster import use_workers
+        workers = use_workers(args.workers)
+    else:
+        workers = contextlib.nullcontext()
+    with tracing.trace(args.trace), workers, tracing.span(args.command, kind='command'), \
+            measure() as measurement:
+        try:
+            module.run(ctx)
+        except BaseException:
+            # A failure while closing is reported, not raised, so the stage's own
+            # exception and traceback are the ones that surface
+            try:
+                ctx.close()
+            except Exception:
+                print("Closing the run context failed as well:", file=sys.stderr)
+                traceback.print_exc()
+            raise
+        # Wait for any figures still rendering in the background
+        saved_figures = ctx.close()
+        if saved_figures:
+            print("Saved figures:", saved_figures)
+    # Compare with and without --compact to see what the compact mode saves
+    print(f"Peak memory: {measurement.peak_rss_mb:.1f} MB (started at "
+          f"{measurement.start_rss_mb:.1f} MB, {'compact' if args.compact else 'default'} "
+          f"mode, {measurement.wall_s:.1f}s)")
+    if args.trace:
+        print(f"Trace written to {args.trace}")
+    return 0
+
+
+def _median_wall_time(command, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _startup_check(args):
+    score = _median_wall_time([sys.executable, '-m', __package__, 'score', args.artifacts,
+                               '--load-only'], args.repeats)
+    floor = _median_wall_time([sys.executable, '-c', 'import xgboost'], args.repeats)
+    overhead = score - floor
+    print(f"score startup: {score:.3f}s, import xgboost alone: {floor:.3f}s, overhead "
+          f"{overhead:.3f}s (target {SCORE_STARTUP_OVERHEAD_TARGET:.1f}s; medians of "
+          f"{args.repeats} runs)")
+    return 0 if overhead <= SCORE_STARTUP_OVERHEAD_TARGET else 1
+
+
+def _score(args):
+    if args.startup_check:
+        return _startup_check(args)
+    from .batch_scoring import _load_artifacts, score_file
+    if args.load_only:
+        _load_artifacts(os.path.abspath(args.artifacts))
+        return 0
+    if args.input is None or args.output is None:
+        raise SystemExit("score: input and output files are required")
+    n_rows = score_file(args.artifacts, args.input, args.output, chunk_size=args.chunk_size,
+                        n_jobs=args.n_jobs, id_column=args.id_column, verbose=1)
+    print(f"Wrote {n_rows} probabilities to {args.output}")
+    return 0
+
+
+def _serve(args):
+    import asyncio
+    from .prediction_server import PredictionServer
+    server = PredictionServer(args.artifacts, host=args.host, port=args.port,
+                              max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _parse_max_rows(value):
+    stage, _, rows = value.partition('=')
+    return stage, None if rows == 'none' else int(float(rows))
+
+
+def _bench(args):
+    from . import benchmark
+    if args.compare:
+        benchmark.compare_results(*args.compare)
+        return 0
+    unknown = set(args.stages or ()) - set(benchmark.STAGES)
+    if unknown:
+        raise SystemExit(f"bench: unknown stages {sorted(unknown)}; choose from {benchmark.STAGES}")
+    benchmark.run_benchmark(sizes=args.sizes, stages=args.stages or benchmark.STAGES,
+                            output=args.output,
+                            repeats=args.repeats, max_rows=dict(args.max_rows),
+                            random_state=args.random_state)
+    print(f"Benchmark results written to {args.output}")
+    return 0
+
+
+def _trace_summary(args):
+    from .tracing import summarize_trace
+    summarize_trace(args.trace, top=args.top)
+    return 0
+
+
+def _worker(args):
+    from . import cluster
+    authkey = os.environ.get(cluster.AUTHKEY_ENV)
+    if not authkey:
+        raise SystemExit(f"worker: set {cluster.AUTHKEY_ENV} to the key shared with the coordinator")
+    try:
+        if args.processes == 1:
+            cluster.serve_worker(args.host, args.port, authkey.encode())
+        else:
+            processes, _ = cluster.start_workers(args.processes, args.host, args.port, authkey)
+            for process in processes:
+                process.wait()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m diabetes_pipeline',
+                                     description="Diabetes prediction pipeline")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Options of the pipeline stages; the environment variables of the original
+    # script still set the defaults
+    stage_options = argparse.ArgumentParser(add_help=False)
+    stage_options.add_argument('--data', default=os.environ.get('DATA_PATH'),
+                               help="diabetes CSV (default: ../data/diabetes.csv)")
+    stage_options.add_argument('--store-dir', default=os.environ.get('DATA_STORE_DIR'),
+                               help="columnar store of the CSV (default: next to the CSV)")
+    stage_options.add_argument('--checkpoint-dir',
+                               default=os.environ.get('CHECKPOINT_DIR', 'checkpoints'))
+    stage_options.add_argument('--no-checkpoints', action='store_true',
+                               default=os.environ.get('CHECKPOINTS', 'on') == 'off',
+                               help="recompute every stage")
+    stage_options.add_argument('--eda-output-dir',
+                               default=os.environ.get('EDA_OUTPUT_DIR', 'figures'))
+    stage_options.add_argument('--trace', default=os.environ.get('TRACE_PATH'),
+                               help="write stage and per-fit timings: a .jsonl file, or "
+                                    "any other name for a Chrome trace-event file")
+    stage_options.add_argument('--compact', action='store_true',
+                               default=os.environ.get('COMPACT_MEMORY', 'off') == 'on',
+                               help="float32 features, uint8 indicators, boolean Outcome "
+                                    "and fewer copies between stages")
+    stage_options.add_argument('--workers', default=os.environ.get('CV_WORKERS'),
+                               help="run the cross-validation fits on N local worker processes, "
+                                    "or on host:port[-port],... started with the worker command "
+                                    "(same CLUSTER_AUTHKEY)")
+
+    help_texts = {
+        'eda': "figures of the raw data and its missingness",
+        'train': "imputation search, feature synthesis and XGBoost tuning",
+        'select': "feature selection; saves the scoring artifacts",
+        'compare': "imputation strategies and the model x scaler comparison",
+    }
+    for command, help_text in help_texts.items():
+        stage = commands.add_parser(command, parents=[stage_options], help=help_text)
+        # Only the eda command draws figures unless asked to
+        stage.add_argument('--eda-mode', choices=['interactive', 'headless', 'skip'],
+                           default=os.environ.get('EDA_MODE',
+                                                  'interactive' if command == 'eda' else 'skip'))
+        stage.set_defaults(handler=_run_stage)
+
+    score = commands.add_parser('score', help="batch-score a CSV or Parquet file")
+    score.add_argument('artifacts', help="scoring artifacts saved by the select command")
+    score.add_argument('input', nargs='?', help="CSV or Parquet file of raw patient rows")
+    score.add_argument('output', nargs='?', help="CSV or Parquet file for the probabilities")
+    score.add_argument('--chunk-size', type=int, default=50_000)
+    score.add_argument('--n-jobs', type=int, default=None)
+    score.add_argument('--id-column', default=None, help="input column copied to the output")
+    score.add_argument('--load-only', action='store_true',
+                       help="load the artifacts and exit (what --startup-check times)")
+    score.add_argument('--startup-check', action='store_true',
+                       help="time the score startup against SCORE_STARTUP_OVERHEAD_TARGET")
+    score.add_argument('--repeats', type=int, default=5)
+    score.set_defaults(handler=_score)
+
+    serve = commands.add_parser('serve', help="local prediction server")
+    serve.add_argument('artifacts', help="scoring artifacts saved by the select command")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--max-batch-size', type=int, default=64)
+    serve.add_argument('--max-wait-ms', type=float, default=5.0,
+                       help="latency budget for filling a micro-batch")
+    serve.set_defaults(handler=_serve)
+
+    bench = commands.add_parser('bench', help="time and memory-profile the stages on synthetic data")
+    bench.add_argument('--sizes', nargs='+', type=lambda value: int(float(value)),
+                       default=[10 ** 3, 10 ** 4, 10 ** 5], help="row counts, e.g. 1e3 1e5 1e7")
+    bench.add_argument('--stages', nargs='+', default=None,
+                       help="stages to run (default: all, see benchmark.STAGES)")
+    bench.add_argument('--output', default='benchmark_results.json')
+    bench.add_argument('--repeats', type=int, default=1)
+    bench.add_argument('--max-rows', nargs='*', type=_parse_max_rows, default=[],
+                       metavar='STAGE=ROWS', help="override a stage's size limit ('none' for no limit)")
+    bench.add_argument('--random-state', type=int, default=0)
+    bench.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                       help="compare two results files instead of running")
+    bench.set_defaults(handler=_bench)
+
+    trace_summary = commands.add_parser('trace-summary',
+                                        help="slowest stages and fits of a --trace file")
+    trace_summary.add_argument('trace')
+    trace_summary.add_argument('--top', type=int, default=15)
+    trace_summary.set_defaults(handler=_trace_summary)
+
+    worker = commands.add_parser('worker', help="cross-validation worker for the --workers option")
+    worker.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on (0.0.0.0 to accept other machines)")
+    worker.add_argument('--port', type=int, default=7001)
+    worker.add_argument('--processes', type=int, default=1,
+                        help="worker processes, on ports PORT, PORT + 1, ...")
+    worker.set_defaults(handler=_worker)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -0,0 +1,383 @@
+######################################## cross-validation on worker processes
+# The searches hand their (candidate, fold) fits to joblib's Parallel. Inside
+# use_workers(...) (the --workers option of the stage commands), every Parallel
+# call that runs with n_jobs != 1 on joblib's default backend goes to worker
+# processes over sockets instead of the local loky pool: the imputation search,
+# HalvingSearchCV, the persistent search and the top-n feature selection run
+# unchanged. The model comparison keeps its own loky pool.
+#
+#   python -m diabetes_pipeline train --workers 4          4 workers on this machine
+#   CLUSTER_AUTHKEY=... python -m diabetes_pipeline worker --host 0.0.0.0 --port 7001 --processes 8
+#   CLUSTER_AUTHKEY=... python -m diabetes_pipeline train --workers node1:7001-7008,node2:7001-7008
+#
+# A coordinator thread per worker takes the next batch of fits from a shared
+# queue, sends it and waits for the result, so faster workers take more work.
+# Arguments of at least CACHE_MIN_BYTES (the data and its folds) are not sent
+# with every batch: each one is sent once to the worker, which keeps it for the
+# rest of the run, and the batches refer to it by a hash of its content. Each
+# worker holds at most WORKER_STORE_BYTES of them; the least recently used are
+# dropped first. When a worker dies or its connection breaks, its batch goes back
+# to the front of the queue for another worker, up to TASK_RETRIES times. An
+# exception raised by a fit is not retried: it is raised by Parallel as usual.
+#
+# Messages are pickles over multiprocessing.connection (so the fitted functions
+# must be importable, as the searches' are), authenticated with the
+# HMAC key in CLUSTER_AUTHKEY (random for local workers); anyone holding the key
+# can run code on the workers. Workers bind 127.0.0.1 unless given --host, and
+# remote workers need the same package and library versions as the coordinator.
+import os
+import pickle
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+import pandas as pd
+from joblib import cpu_count, hash as content_hash, parallel_config
+from joblib._parallel_backends import AutoBatchingMixin, ParallelBackendBase
+
+AUTHKEY_ENV = 'CLUSTER_AUTHKEY'
+CACHE_MIN_BYTES = 64 * 2 ** 10
+WORKER_STORE_BYTES = 2 * 2 ** 30
+TASK_RETRIES = 2
+CONNECT_TIMEOUT = 30  # seconds to wait for a worker that is still starting
+
+# Thread pools of the numerical libraries, split between the processes of a machine
+THREAD_LIMIT_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                     'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+# An argument kept in the worker's object store
+class _Ref:
+    def __init__(self, key):
+        self.key = key
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    return 0
+
+
+######################################## worker
+def _run_calls(calls, store):
+    def resolve(value):
+        return store[value.key] if isinstance(value, _Ref) else value
+    # Nested Parallel calls run in this process: the machine's cores are its worker processes
+    with parallel_config(backend='sequential'):
+        return [func(*map(resolve, args), **{name: resolve(value) for name, value in kwargs.items()})
+                for func, args, kwargs in calls]
+
+
+# Answer one coordinator until it disconnects; the object store lives as long
+# as the connection. A task message carries the objects to add to the store and
+# the keys to drop, then the pickled calls, which are only unpickled here so that
+# a call that cannot be loaded is reported like any other error.
+def _serve_connection(connection):
+    store = {}
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        _, puts, drops, calls = message
+        for key in drops:
+            store.pop(key, None)
+        store.update(puts)
+        try:
+            connection.send(('done', _run_calls(pickle.loads(calls), store)))
+        except Exception as exc:
+            text = traceback.format_exc()
+            try:
+                connection.send(('error', exc, text))
+            except Exception:  # an exception that does not pickle
+                connection.send(('error', RuntimeError(str(exc)), text))
+
+
+# Serve coordinators one at a time, until interrupted
+def serve_worker(host='127.0.0.1', port=7001, authkey=None):
+    with Listener((host, port), authkey=authkey) as listener:
+        print(f"Worker {os.getpid()} listening on {host}:{port}", flush=True)
+        while True:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as exc:
+                print(f"Worker {os.getpid()}: rejected a connection ({exc!r})", flush=True)
+                continue
+            with connection:
+                try:
+                    _serve_connection(connection)
+                except (OSError, EOFError):
+                    pass  # the coordinator went away mid-message
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+# Start n worker processes on this machine, on ports port, port + 1, ... (free
+# ports for port=0); returns the processes and their addresses
+def start_workers(n, host='127.0.0.1', port=0, authkey=None):
+    env = dict(os.environ, **{AUTHKEY_ENV: authkey})
+    n_threads = str(max(cpu_count() // n, 1))
+    for var in THREAD_LIMIT_VARS:
+        env.setdefault(var, n_threads)
+    processes, addresses = [], []
+    for i in range(n):
+        worker_port = _free_port(host) if port == 0 else port + i
+        processes.append(subprocess.Popen([sys.executable, '-m', __package__, 'worker',
+                                           '--host', host, '--port', str(worker_port)], env=env))
+        addresses.append((host, worker_port))
+    return processes, addresses
+
+
+######################################## coordinator
+class _Task:
+    def __init__(self, calls, objects):
+        self.calls = calls  # pickled
+        self.objects = objects  # key -> (object, size in bytes)
+        self.future = Future()
+        self.attempts = 0
+
+
+# The connection to one worker, and the thread that feeds it tasks
+class _WorkerLink(threading.Thread):
+    def __init__(self, pool, address):
+        super().__init__(name=f'worker {address[0]}:{address[1]}', daemon=True)
+        self.pool = pool
+        self.address = address
+        self.connection = Client(address, authkey=pool.authkey)
+        self.stored = OrderedDict()  # key -> size of the objects the worker holds, oldest use first
+        self.alive = True
+
+    # The objects to send with a task (the ones the worker does not hold yet) and
+    # the keys to drop: the least recently used ones the task does not need, once
+    # the worker would hold more than WORKER_STORE_BYTES
+    def _store(self, objects):
+        for key in objects:
+            if key in self.stored:
+                self.stored.move_to_end(key)
+        puts = {key: value for key, (value, _) in objects.items() if key not in self.stored}
+        total = sum(self.stored.values()) + sum(objects[key][1] for key in puts)
+        drops = []
+        for key in list(self.stored):
+            if total <= WORKER_STORE_BYTES:
+                break
+            if key not in objects:
+                total -= self.stored.pop(key)
+                drops.append(key)
+        self.stored.update((key, objects[key][1]) for key in puts)
+        return puts, drops
+
+    def run(self):
+        while True:
+            task = self.pool._next_task()
+            if task is None:
+                break
+            try:
+                self.connection.send(('run', *self._store(task.objects), task.calls))
+                reply = self.connection.recv()
+            except (OSError, EOFError) as exc:
+                self.alive = False
+                self.pool._worker_lost(self, task, exc)
+                break
+            if reply[0] == 'done':
+                task.future.set_result(reply[1])
+            else:
+                exc = reply[1]
+                exc.add_note(f"Raised on cluster {self.name}:\n{reply[2]}")
+                task.future.set_exception(exc)
+        self.connection.close()
+
+
+# Connections to a fixed set of workers, and the queue of tasks they share
+class WorkerPool:
+    def __init__(self, addresses, authkey, retries=TASK_RETRIES, connect_timeout=CONNECT_TIMEOUT):
+        self.authkey = authkey
+        self.retries = retries
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.links = [link for link in (self._connect(address, connect_timeout)
+                                        for address in addresses) if link is not None]
+        if not self.links:
+            raise RuntimeError(f"No cluster worker is reachable at {addresses}")
+        for link in self.links:
+            link.start()
+
+    def _connect(self, address, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return _WorkerLink(self, address)
+            except (OSError, EOFError, AuthenticationError) as exc:
+                if isinstance(exc, AuthenticationError) or time.monotonic() >= deadline:
+                    print(f"Cluster worker {address[0]}:{address[1]} unreachable: {exc!r}")
+                    return None
+                time.sleep(0.1)
+
+    def n_alive(self):
+        return sum(link.alive for link in self.links)
+
+    def submit(self, calls, objects):
+        task = _Task(pickle.dumps(calls, protocol=pickle.HIGHEST_PROTOCOL), objects)
+        with self._condition:
+            if self.n_alive():
+                self._queue.append(task)
+                self._condition.notify()
+                return task.future
+        task.future.set_exception(RuntimeError("All cluster workers were lost"))
+        return task.future
+
+    def _next_task(self):
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            return self._queue.popleft() if self._queue else None
+
+    # Put the lost worker's task back at the front of the queue; fail it once it
+    # has been retried too often, and every queued task once no worker is left
+    def _worker_lost(self, link, task, exc):
+        print(f"Lost cluster {link.name} ({exc!r}); {self.n_alive()} workers left")
+        task.attempts += 1
+        with self._condition:
+            alive = self.n_alive()
+            if alive and task.attempts <= self.retries:
+                self._queue.appendleft(task)
+                self._condition.notify()
+                return
+            failed = [task]
+            if not alive:
+                failed.extend(self._queue)
+                self._queue.clear()
+        for failed_task in failed:
+            failed_task.future.set_exception(RuntimeError(
+                f"Cluster task failed after {failed_task.attempts} lost workers"
+                if alive else "All cluster workers were lost"))
+
+    # Forget the queued tasks (the ones already sent still finish)
+    def cancel_queued(self):
+        with self._condition:
+            self._queue.clear()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+
+######################################## joblib backend
+class ClusterBackend(AutoBatchingMixin, ParallelBackendBase):
+    supports_retrieve_callback = True
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(nesting_level=0, **kwargs)
+        self.pool = pool
+        self._keys = {}
+
+    def effective_n_jobs(self, n_jobs):
+        if n_jobs == 0:
+            raise ValueError("n_jobs == 0 in Parallel has no meaning")
+        n_workers = self.pool.n_alive()
+        if n_jobs is None or n_jobs < 0:
+            return n_workers
+        return min(n_jobs, n_workers)
+
+    def configure(self, n_jobs=1, parallel=None, prefer=None, require=None, **backend_kwargs):
+        self.parallel = parallel
+        n = self.effective_n_jobs(n_jobs)
+        # Parallel runs n_jobs=1 in-process, so a single worker still counts as two
+        return 2 if n == 1 and n_jobs != 1 else n
+
+    def start_call(self):
+        self._keys = {}
+
+    # The content hashes are only reused within one Parallel call: between calls
+    # the caller may have changed an array in place
+    def stop_call(self):
+        self._keys = {}
+
+    # The batch's calls with their large arguments replaced by references, and the referenced objects
+    def _encode(self, calls):
+        objects = {}
+
+        def encode(value):
+            size = _nbytes(value)
+            if size < CACHE_MIN_BYTES:
+                return value
+            if id(value) not in self._keys:
+                self._keys[id(value)] = (value, content_hash(value))
+            key = self._keys[id(value)][1]
+            objects[key] = (value, size)
+            return _Ref(key)
+        return [(func, tuple(map(encode, args)),
+                 {name: encode(value) for name, value in kwargs.items()})
+                for func, args, kwargs in calls], objects
+
+    def submit(self, func, callback=None):
+        future = self.pool.submit(*self._encode(func.items))
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def retrieve_result_callback(self, future):
+        return future.result()
+
+    def terminate(self):
+        self.reset_batch_stats()
+
+    def abort_everything(self, ensure_ready=True):
+        self.pool.cancel_queued()
+
+
+# 'N' for N local workers, or 'host:port,host:first-last,...'; returns the
+# number of local workers and the addresses
+def parse_workers(spec):
+    if str(spec).isdigit():
+        return int(spec), []
+    addresses = []
+    for item in str(spec).split(','):
+        host, _, ports = item.strip().rpartition(':')
+        first, _, last = ports.partition('-')
+        addresses.extend((host, port) for port in range(int(first), int(last or first) + 1))
+    return 0, addresses
+
+
+# Run the block's cross-validation on the workers of spec (see parse_workers);
+# local workers are started here and stopped at the end
+@contextmanager
+def use_workers(spec, authkey=None):
+    n_local, addresses = parse_workers(spec)
+    authkey = authkey or os.environ.get(AUTHKEY_ENV) or (secrets.token_hex(16) if n_local else None)
+    if authkey is None:
+        raise ValueError(f"Set {AUTHKEY_ENV} to the key the workers were started with")
+    processes = []
+    try:
+        if n_local:
+            processes, addresses = start_workers(n_local, authkey=authkey)
+        pool = WorkerPool(addresses, authkey.encode())
+        print(f"Cross-validation on {len(pool.links)} cluster workers")
+        try:
+            with parallel_config(backend=ClusterBackend(pool)):
+                yield pool
+        finally:
+            pool.close()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
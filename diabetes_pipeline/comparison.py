@@ -0,0 +1,121 @@
+######################################## compare
+# The imputation strategy comparison and the model x scaler comparison, run on
+# the train/test split after the select command.
+from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score, make_scorer
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
+from sklearn.svm import SVC
+from xgboost import XGBClassifier
+
+from . import selection
+from .imputation import ImputerCache, impute_data, evaluate_imputation_methods
+from .model_comparison import compare_models
+
+######################################## imputation strategies
+STRATEGIES = ['mean', 'median', 'most_frequent', 'knn', 'mice']
+
+
+def compare_imputation_strategies(X_train, X_test, y_train, strategies, scorer, cv):
+    # 'fold' fits each imputer inside the CV folds (no leakage) and runs strategies
+    # and folds in parallel; impute_data below then fits only the winner on all of
+    # X_train, and the cache keeps every fit for a rerun on the same data
+    imputer_cache = ImputerCache()
+    performance_roc_auc = evaluate_imputation_methods(X_train, y_train,
+                                                      strategies,
+                                                      scorer,
+                                                      cv=cv,
+                                                      mode='fold',
+                                                      cache=imputer_cache,
+                                                      n_jobs=-1)
+
+    # Find the best method based on ROC-AUC score
+    best_roc_auc_method = max(performance_roc_auc, key=performance_roc_auc.get)
+
+    # Impute using the best ROC-AUC method
+    X_train_final, X_test_final = impute_data(X_train, X_test,
+                                              strategy=best_roc_auc_method,
+                                              cache=imputer_cache,
+                                              n_jobs=-1)
+    return performance_roc_auc, best_roc_auc_method, X_train_final, X_test_final
+
+
+######################################## model comparison
+def comparison_space():
+    # Define your models dictionary
+    models = {
+        'Naive_Bayes': GaussianNB(),
+        'Logistic_Regression': LogisticRegression(max_iter=1000),
+        'SVM': SVC(probability=True),  # Ensure probability is True for ROC-AUC if using SVM
+        'Random_Forest': RandomForestClassifier(),
+        'AdaBoost': AdaBoostClassifier(),
+        'XGBoost': XGBClassifier(use_label_encoder=False, eval_metric='logloss'),
+        'Neural_Network': MLPClassifier()
+    }
+
+    # Define your scalers dictionary
+    scalers = {
+        'standard': StandardScaler(),
+        'robust': RobustScaler(),
+        'minmax': MinMaxScaler()
+    }
+
+    # Define hyperparameters for each model
+    param_grid = {
+        # your existing paramgrid code here
+    }
+    return models, scalers, param_grid
+
+
+def run_model_comparison(models, scalers, param_grid, X_train_final, y_train,
+                         X_test_final, y_test, skf):
+    # Run the model x scaler grid searches concurrently and collect each result row
+    # as soon as its combination finishes
+    results = []
+    for result in compare_models(models, scalers, param_grid, X_train_final, y_train,
+                                 X_test_final, y_test, cv=skf, scoring='roc_auc', verbose=10):
+        results.append(result)
+        print(result)
+    return results
+
+
+def run(ctx):
+    selected = selection.run(ctx)
+    y_train, y_test = selected['y_train'], selected['y_test']
+
+    # Checking if there are any missing values in X_train_optimal
+    missing_in_train = selected['X_train_optimal'].isna().any().any()
+    print(f"Are there missing values in X_train_optimal? {missing_in_train}")
+
+    # Checking if there are any missing values in X_test_optimal
+    missing_in_test = selected['X_test_optimal'].isna().any().any()
+    print(f"Are there missing values in X_test_optimal? {missing_in_test}")
+
+    # As in the original script the comparisons run on the full train/test split,
+    # not on the optimal features checked above
+    X_train, X_test = selected['X_train'], selected['X_test']
+
+    # Define the stratified K-Fold and scoring
+    cv_strategy = StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    roc_auc_scorer = make_scorer(roc_auc_score, needs_proba=True)
+    performance_roc_auc, best_roc_auc_method, X_train_final, X_test_final = ctx.checkpoints.run(
+        'imputation_strategies', compare_imputation_strategies, X_train, X_test, y_train,
+        STRATEGIES, roc_auc_scorer, cv_strategy)
+
+    # Display the performance results
+    print("\nROC-AUC Scores by Imputation Method:")
+    print(performance_roc_auc)
+
+    # Setting up Stratified K-Fold
+    skf = StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    models, scalers, param_grid = comparison_space()
+    results = ctx.checkpoints.run('model_comparison', run_model_comparison, models, scalers,
+                                  param_grid, X_train_final, y_train, X_test_final, y_test, skf)
+
+    # Displaying the results might be useful
+    for result in results:
+        print(result)
+    return results
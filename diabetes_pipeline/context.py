@@ -0,0 +1,43 @@
+######################################## run context
+# Settings shared by the stages of one command: where the data, its columnar
+# store and the stage checkpoints live, and how figures are drawn. Figures go
+# through RunContext.render, which only imports the plotting stack (matplotlib,
+# seaborn, missingno) once a figure is actually drawn, so the modelling commands
+# never pay for it in the default 'skip' mode. compact=True selects the compact
+# memory mode: float32 features, uint8 indicators, a boolean Outcome and fewer
+# intermediate copies (the data gets its own columnar store in that mode).
+from pathlib import Path
+
+from .checkpoints import StageCache
+
+# The data folder next to the repository, as in the original script
+DEFAULT_DATA_PATH = Path(__file__).resolve().parent.parent.parent / 'data' / 'diabetes.csv'
+
+
+class RunContext:
+    def __init__(self, data_path=None, store_dir=None, checkpoint_dir='checkpoints',
+                 use_checkpoints=True, eda_mode='skip', eda_output_dir='figures',
+                 compact=False):
+        self.data_path = Path(data_path) if data_path else DEFAULT_DATA_PATH
+        self.compact = compact
+        self.store_dir = store_dir or self.data_path.parent / (
+            'diabetes_store_compact' if compact else 'diabetes_store')
+        self.checkpoints = StageCache(checkpoint_dir, enabled=use_checkpoints)
+        self.eda_mode = eda_mode
+        self.eda_output_dir = eda_output_dir
+        self._renderer = None
+
+    # Draw eda.<plot_name>(df, *args, **kwargs) as the figure called name
+    def render(self, name, plot_name, df, *args, **kwargs):
+        if self.eda_mode == 'skip':
+            return None
+        from . import eda
+        if self._renderer is None:
+            self._renderer = eda.FigureRenderer(mode=self.eda_mode, output_dir=self.eda_output_dir)
+        return self._renderer.render(name, getattr(eda, plot_name), df, *args, **kwargs)
+
+    # Wait for any figures still rendering in the background; returns the saved paths
+    def close(self):
+        if self._renderer is None:
+            return []
+        return self._renderer.close()
@@ -0,0 +1,163 @@
+######################################## columnar data store
+# Converts a diabetes CSV once into one typed .npy file per column plus a
+# meta.json with the schema and the source file's fingerprint. The CSV is read
+# in chunks, once to count the rows and once to write them straight into
+# preallocated memory-mapped column files; the schema is validated on the way,
+# and zeros in columns_with_zeros are already stored as NaN. Later loads memory-map the column files read-only
+# instead of parsing the CSV again; the store is rebuilt automatically when
+# the CSV changes.
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .checkpoints import file_fingerprint
+
+# Expected columns and the dtype each is stored as (the columns that hold
+# missing values are float so they can store NaN)
+DIABETES_SCHEMA = {
+    'Pregnancies': 'int64',
+    'Glucose': 'float64',
+    'BloodPressure': 'float64',
+    'SkinThickness': 'float64',
+    'Insulin': 'float64',
+    'BMI': 'float64',
+    'DiabetesPedigreeFunction': 'float64',
+    'Age': 'int64',
+    'Outcome': 'int64',
+}
+
+# The compact mode's schema: float32 features (exact for these measurements,
+# half the memory) and a boolean outcome
+COMPACT_SCHEMA = dict({column: 'float32' for column in DIABETES_SCHEMA}, Outcome='bool')
+
+# A value of 0 in these columns means "not measured"
+COLUMNS_WITH_ZEROS = ['Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
+
+STORE_VERSION = 1
+
+
+# Rows as the CSV parser reads them (a first pass over the chunks, so blank lines
+# and quoted newlines are counted the way the ingest will see them)
+def _count_rows(csv_path, chunk_size):
+    return sum(len(chunk) for chunk in pd.read_csv(csv_path, chunksize=chunk_size, usecols=[0]))
+
+
+# Check one chunk against the schema and return it with the stored dtypes
+def _validate_chunk(chunk, schema, start):
+    missing = [column for column in schema if column not in chunk.columns]
+    extra = [column for column in chunk.columns if column not in schema]
+    if missing or extra:
+        raise ValueError(f"CSV columns do not match the schema: missing {missing}, "
+                         f"unexpected {extra}")
+    for column, dtype in schema.items():
+        values = pd.to_numeric(chunk[column], errors='coerce')
+        bad = values.isna() & chunk[column].notna()
+        if bad.any():
+            row = start + int(np.flatnonzero(bad.to_numpy())[0])
+            raise ValueError(f"Non-numeric value {chunk[column].iloc[row - start]!r} "
+                             f"in column {column!r}, row {row}")
+        if np.issubdtype(np.dtype(dtype), np.integer):
+            if values.isna().any():
+                raise ValueError(f"Missing value in integer column {column!r}")
+            if (values % 1 != 0).any():
+                raise ValueError(f"Non-integer value in integer column {column!r}")
+        if (values < 0).any():
+            raise ValueError(f"Negative value in column {column!r}")
+        chunk[column] = values
+    if not chunk['Outcome'].isin([0, 1]).all():
+        raise ValueError("Outcome must be 0 or 1")
+    return chunk
+
+
+def ingest_csv(csv_path, store_dir, schema=DIABETES_SCHEMA, columns_with_zeros=COLUMNS_WITH_ZEROS,
+               chunk_size=100_000):
+    n_rows = _count_rows(csv_path, chunk_size)
+    os.makedirs(store_dir, exist_ok=True)
+    columns = {column: np.lib.format.open_memmap(os.path.join(store_dir, f'{column}.npy'),
+                                                 mode='w+', dtype=dtype, shape=(n_rows,))
+               for column, dtype in schema.items()}
+
+    start = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        chunk = _validate_chunk(chunk, schema, start)
+        stop = start + len(chunk)
+        for column, array in columns.items():
+            block = array[start:stop]
+            block[:] = chunk[column].to_numpy(dtype=schema[column])
+            if column in columns_with_zeros:
+                block[block == 0] = np.nan
+        start = stop
+    if start != n_rows:
+        raise ValueError(f"Expected {n_rows} rows in {csv_path}, read {start}")
+    for array in columns.values():
+        array.flush()
+
+    stat = os.stat(csv_path)
+    meta = {
+        'version': STORE_VERSION,
+        'columns': list(schema),
+        'dtypes': dict(schema),
+        'columns_with_zeros': list(columns_with_zeros),
+        'n_rows': n_rows,
+        'source': {'path': os.path.abspath(csv_path), 'size': stat.st_size,
+                   'mtime_ns': stat.st_mtime_ns, 'sha1': file_fingerprint(csv_path)},
+    }
+    # meta.json is written last, so an interrupted ingest is never taken as valid
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file, indent=2)
+    return meta
+
+
+def _read_meta(store_dir):
+    path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+# Whether the store was built from the current CSV with the same schema. Size
+# and mtime are checked first; the content hash only when those changed.
+def store_is_current(csv_path, store_dir, schema=DIABETES_SCHEMA,
+                     columns_with_zeros=COLUMNS_WITH_ZEROS):
+    meta = _read_meta(store_dir)
+    if (meta is None or meta['version'] != STORE_VERSION or meta['dtypes'] != dict(schema)
+            or meta['columns_with_zeros'] != list(columns_with_zeros)):
+        return False
+    stat = os.stat(csv_path)
+    source = meta['source']
+    if stat.st_size != source['size']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns']:
+        return True
+    if file_fingerprint(csv_path) != source['sha1']:
+        return False
+    # Same content, only touched: remember the new mtime
+    source['mtime_ns'] = stat.st_mtime_ns
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file, indent=2)
+    return True
+
+
+# Read-only memory maps of the stored columns, by name
+def load_columns(store_dir):
+    meta = _read_meta(store_dir)
+    return {column: np.load(os.path.join(store_dir, f'{column}.npy'), mmap_mode='r')
+            for column in meta['columns']}
+
+
+# DataFrame over the memory-mapped columns (no copy of the data)
+def load_store(store_dir):
+    return pd.DataFrame(load_columns(store_dir), copy=False)
+
+
+# Load the diabetes data through the store, (re)building it from the CSV first
+# when it is missing or out of date
+def load_diabetes(csv_path, store_dir=None, schema=DIABETES_SCHEMA,
+                  columns_with_zeros=COLUMNS_WITH_ZEROS):
+    store_dir = store_dir or os.path.splitext(str(csv_path))[0] + '_store'
+    if not store_is_current(csv_path, store_dir, schema, columns_with_zeros):
+        ingest_csv(csv_path, store_dir, schema, columns_with_zeros)
+    return load_store(store_dir)
@@ -0,0 +1,186 @@
+######################################## EDA plots
+# The plotting code of the analysis, one function per figure, each returning the
+# matplotlib Figure it drew. A FigureRenderer decides what happens to them:
+#   'interactive' - draw in this process and plt.show() (the original behaviour)
+#   'headless'    - draw on the non-GUI Agg backend in a background process pool
+#                   and save to files, so the modeling never waits on plotting
+#   'skip'        - do not draw anything
+# Scatter-type plots (pair plot, scatter plot, missingness matrix) are drawn
+# from at most SAMPLE_LIMITS[name] randomly sampled rows.
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns
+import missingno as msno
+from joblib.externals.loky import ProcessPoolExecutor
+
+EDA_MODES = ('interactive', 'headless', 'skip')
+
+# Maximum rows drawn per figure (None draws every row)
+SAMPLE_LIMITS = {
+    'pairplot': 2000,
+    'scatter_glucose_bmi': 5000,
+    'missing_matrix': 1000,
+}
+
+# Resolution of the saved files, per figure
+FIGURE_DPI = {
+    'pairplot': 300,
+}
+
+
+# Histograms for each feature
+def plot_histograms(df):
+    axes = df.hist(bins=20, figsize=(14, 7), layout=(3, 3))  # Smaller figure size and 3x3 grid layout
+    fig = axes.flat[0].figure
+    fig.tight_layout()  # Adjusts subplot parameters for a neat fit
+    return fig
+
+
+# boxplot
+def plot_boxplots(df):
+    num_columns = len(df.columns)  # Number of columns
+    # Increase the number of rows to reduce overall width
+    rows = int(num_columns ** 0.5) + 1  # ensures more vertical distribution
+    cols = (num_columns // rows) + (num_columns % rows > 0)  # Determining the number of columns for subplots
+    # Set fixed dimensions for each subplot (width, height)
+    subplot_width = 5
+    subplot_height = 3
+    # Calculate the figure dimensions based on the number of rows and columns
+    fig_width = cols * subplot_width  # Increase total width by increasing subplot width
+    fig_height = rows * subplot_height
+    fig = plt.figure(figsize=(fig_width, fig_height))
+    #
+    for i, column in enumerate(df.columns):
+        ax = fig.add_subplot(rows, cols, i + 1)  # Create a subplot for each column
+        sns.boxplot(x=df[column], ax=ax)
+        ax.set_title(f'Box plot of {column}', fontsize=10)  # Reduced title font size
+
+        # Set smaller font size for x and y axis labels and titles
+        ax.set_xlabel(column, fontsize=8)  # Smaller font size for x-axis labels
+        ax.set_ylabel('Values', fontsize=8)  # Smaller font size for y-axis labels
+        ax.tick_params(axis='both', which='major', labelsize=8)  # Smaller ticks
+    # Adjust layout
+    fig.tight_layout()
+    fig.subplots_adjust(wspace=0.5, hspace=0.6)  # Adjust horizontal and vertical spaces
+    return fig
+
+
+# Correlation matrix
+def plot_correlation_matrix(df):
+    fig = plt.figure(figsize=(12, 7))
+    sns.heatmap(df.corr(), annot=True, fmt=".2f", cmap='coolwarm')
+    return fig
+
+
+# Create a pair plot with adjusted size
+def plot_pairplot(df, hue='Outcome'):
+    grid = sns.pairplot(df, hue=hue, height=3, aspect=1)
+    grid.figure.tight_layout()  # Adjust layout to make room for all elements
+    return grid.figure
+
+
+# Scatter plots for specific variables
+def plot_scatter(df, x, y, hue='Outcome'):
+    fig = plt.figure(figsize=(8, 6))
+    sns.scatterplot(x=x, y=y, hue=hue, data=df)
+    plt.title(f'{x} vs {y} colored by {hue}')
+    return fig
+
+
+# Matrix plot to visualize missing data
+def plot_missing_matrix(df):
+    ax = msno.matrix(df)
+    return ax.figure
+
+
+# Function to plot correlation matrix
+def plot_correlation(df, title):
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(df.corr(), annot=True, cmap='coolwarm', linewidths=1,
+                linecolor='white')
+    plt.title(title)
+    plt.xticks(rotation=45)
+    plt.yticks(rotation=0)
+    return fig
+
+
+def visualize_distributions(data, title):
+    num_cols = 3  # Number of columns in subplot
+    num_rows = (len(data.columns) + num_cols - 1) // num_cols  # Calculate the necessary number of rows
+    fig = plt.figure(figsize=(num_cols * 5, num_rows * 4))  # Dynamically size the figure based on number of features
+    for i, feature in enumerate(data.columns):
+        plt.subplot(num_rows, num_cols, i + 1)
+        sns.histplot(data[feature], kde=True)
+        plt.title(feature)
+    plt.tight_layout()
+    plt.suptitle(title, fontsize=16)
+    return fig
+
+
+# Draw one figure on the Agg backend and save it (runs in a worker process)
+def _render_to_file(plot_func, args, kwargs, path, dpi):
+    matplotlib.use('Agg')
+    fig = plot_func(*args, **kwargs)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+class FigureRenderer:
+    def __init__(self, mode='interactive', output_dir='figures', n_workers=2,
+                 sample_limits=None, random_state=1234):
+        if mode not in EDA_MODES:
+            raise ValueError(f"Unknown EDA mode: {mode!r}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.n_workers = n_workers
+        self.sample_limits = dict(SAMPLE_LIMITS, **(sample_limits or {}))
+        self.random_state = random_state
+        self._futures = []
+        self._executor = None
+        if mode == 'headless':
+            os.makedirs(output_dir, exist_ok=True)
+
+    # Sample the frame down to the figure's row limit before it is drawn or
+    # shipped to a worker
+    def _sample(self, name, df):
+        limit = self.sample_limits.get(name)
+        if limit is None or len(df) <= limit:
+            return df
+        return df.sample(n=limit, random_state=self.random_state)
+
+    # Draw the figure plot_func(df, *args, **kwargs) under the given file name
+    def render(self, name, plot_func, df, *args, **kwargs):
+        if self.mode == 'skip':
+            return None
+        df = self._sample(name, df)
+        if self.mode == 'interactive':
+            plot_func(df, *args, **kwargs)
+            plt.show()
+            return None
+        # A pool of its own, so joblib's shared pool used by the modeling stages
+        # never has to wait for (or be resized around) running figures
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_workers,
+                                                 env={'MPLBACKEND': 'Agg'})
+        path = os.path.join(self.output_dir, f'{name}.png')
+        future = self._executor.submit(_render_to_file, plot_func, (df,) + args, kwargs, path,
+                                       FIGURE_DPI.get(name, 100))
+        self._futures.append(future)
+        return future
+
+    # Wait for the background figures and return the saved file paths. The pool is
+    # shut down even when a figure failed (its error is raised here); figures not
+    # started yet are then cancelled.
+    def close(self):
+        try:
+            return [future.result() for future in self._futures]
+        finally:
+            for future in self._futures:
+                future.cancel()
+            self._futures = []
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,31 @@
+######################################## custom features
+# The hand-made features added to the imputed data before the pairwise feature
+# synthesis. Used both by the training script and by batch scoring, so new
+# rows get exactly the features the model was trained on. copy=False adds the
+# features to df itself (the compact mode passes a shallow copy).
+import numpy as np
+
+
+# Define custom feature creation functions
+def add_custom_features(df, copy=True):
+    df_copy = df.copy() if copy else df
+
+    # Interaction features
+    df_copy['BMI_Age'] = df_copy['BMI'] * df_copy['Age']
+    df_copy['Preg_Age'] = df_copy['Pregnancies'] * df_copy['Age']
+
+    # Ratio features with conditional check to avoid division by zero
+    df_copy['Insulin_Glucose_Ratio'] = np.where(df_copy['Glucose'] != 0, df_copy['Insulin'] / df_copy['Glucose'], np.nan)
+    df_copy['Skin_BMI_Ratio'] = np.where(df_copy['BMI'] != 0, df_copy['SkinThickness'] / df_copy['BMI'], np.nan)
+
+    # Polynomial features
+    df_copy['Glucose_Squared'] = df_copy['Glucose'] ** 2
+    df_copy['BMI_Squared'] = df_copy['BMI'] ** 2
+
+    # More complex features based on initial code snippet provided
+    df_copy['glucose_insulin_ratio'] = np.where(df_copy['Insulin'] != 0, df_copy['Glucose'] / df_copy['Insulin'], np.nan)
+    df_copy['bmi_skinthickness_product'] = df_copy['BMI'] * df_copy['SkinThickness']
+    df_copy['age_adjusted_risk'] = (df_copy['Age'] * df_copy['Glucose'] * df_copy['BMI']) / 1000
+    df_copy['pregnancy_health_impact'] = (df_copy['Pregnancies'] + 1) * (df_copy['BMI'] / 25) * (df_copy['BloodPressure'] / 120)
+
+    return df_copy
@@ -0,0 +1,143 @@
+######################################## top-n feature selection
+# Scores prefixes of the importance-ranked feature list (top 1, top 2, ...) with
+# cross-validation. The folds are computed once, every (n, fold) fit runs in
+# parallel, and instead of trying every n the search can go coarse-to-fine or
+# bisect on the slope of the AUC curve, and stop early once the AUC plateaus.
+import math
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+
+from . import tracing
+
+
+# Fit on the first n columns of one training fold and score the validation fold;
+# returns the score and the timing of the fit
+def _score_prefix(estimator, X, y, n, train, test, scorer):
+    clock = tracing.FitClock()
+    model = clone(estimator)
+    model.fit(X[train, :n], y[train])
+    clock.fitted()
+    return scorer(model, X[test, :n], y[test]), clock.stop()
+
+
+class PrefixScorer:
+    # Cross-validated score of the top-n feature subsets, memoised per n
+    def __init__(self, estimator, X, y, sorted_features, cv, scoring='roc_auc',
+                 n_jobs=None, verbose=0):
+        self.estimator = estimator
+        # One contiguous array ordered by importance, so every prefix is a column slice
+        self.X = np.ascontiguousarray(X[list(sorted_features)].to_numpy())
+        self.y = np.asarray(y)
+        self.splits = list(cv.split(self.X, self.y))
+        self.scorer = check_scoring(estimator, scoring=scoring)
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.n_max = len(sorted_features)
+        self.scores = {}
+
+    # Score every n not seen before; all (n, fold) fits go to one parallel batch
+    def evaluate(self, ns):
+        todo = sorted({n for n in ns if 1 <= n <= self.n_max and n not in self.scores})
+        units = [(n, train, test) for n in todo for train, test in self.splits]
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_score_prefix)(self.estimator, self.X, self.y, n, train, test, self.scorer)
+            for n, train, test in units)
+        n_folds = len(self.splits)
+        fold_scores = [score for score, _ in results]
+        for i, (_, timing) in enumerate(results):
+            tracing.record_fit('top_n', timing, params={'n_features': todo[i // n_folds]},
+                               fold=i % n_folds)
+        for i, n in enumerate(todo):
+            self.scores[n] = float(np.mean(fold_scores[i * n_folds:(i + 1) * n_folds]))
+            if self.verbose:
+                print(f"Mean ROC-AUC with top {n} features: {self.scores[n]}")
+        return [self.scores[n] for n in ns if n in self.scores]
+
+    def best(self):
+        return max(self.scores, key=lambda n: (self.scores[n], -n))
+
+
+# Try n = 1, 2, ... in batches of batch_size; with patience set, stop once the
+# best score has not improved by more than tol for patience consecutive n
+def _search_exhaustive(prefix, batch_size, patience, tol):
+    best_score, since_best = -np.inf, 0
+    for start in range(1, prefix.n_max + 1, batch_size):
+        ns = list(range(start, min(start + batch_size, prefix.n_max + 1)))
+        for score in prefix.evaluate(ns):
+            if score > best_score + tol:
+                best_score, since_best = score, 0
+            else:
+                since_best += 1
+        if patience is not None and since_best >= patience:
+            break
+
+
+# Evaluate a coarse grid of n, then repeatedly refine a window around the best n
+# with a finer step until the step reaches 1
+def _search_coarse_to_fine(prefix, coarse_points, refine_factor, patience, tol):
+    step = max(1, prefix.n_max // coarse_points)
+    coarse = list(range(step, prefix.n_max + 1, step))
+    if patience is None:
+        prefix.evaluate([1] + coarse)
+    else:
+        # Walk the coarse grid in order and stop once it plateaus
+        best_score, since_best = -np.inf, 0
+        for n in [1] + coarse:
+            score, = prefix.evaluate([n])
+            if score > best_score + tol:
+                best_score, since_best = score, 0
+            else:
+                since_best += 1
+                if since_best >= patience:
+                    break
+    while step > 1:
+        center = prefix.best()
+        fine = max(1, step // refine_factor)
+        prefix.evaluate(list(range(center - step + fine, center + step, fine)))
+        step = fine
+
+
+# Bisect on the slope of the AUC curve: if adding one more feature to the middle
+# prefix still helps by more than tol, the peak lies to the right
+def _search_bisection(prefix, tol):
+    lo, hi = 1, prefix.n_max
+    prefix.evaluate([lo, hi])
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        left, right = prefix.evaluate([mid, mid + 1])
+        if right > left + tol:
+            lo = mid + 1
+        else:
+            hi = mid
+
+
+# Run the top-n search and return the same results that go to model_results.pkl.
+# auc_scores lines up with n_features_list, which holds the n that were evaluated
+# (every n from 1 upwards for the exhaustive search without early stopping).
+def select_top_features(estimator, X, y, sorted_features, cv, method='exhaustive',
+                        scoring='roc_auc', patience=None, tol=1e-4, coarse_points=20,
+                        refine_factor=4, batch_size=None, n_jobs=None, verbose=0):
+    prefix = PrefixScorer(estimator, X, y, sorted_features, cv, scoring=scoring,
+                          n_jobs=n_jobs, verbose=verbose)
+    if method == 'exhaustive':
+        batch_size = batch_size or (prefix.n_max if patience is None else
+                                    max(1, int(math.ceil(patience / 2))))
+        _search_exhaustive(prefix, batch_size, patience, tol)
+    elif method == 'coarse_to_fine':
+        _search_coarse_to_fine(prefix, coarse_points, refine_factor, patience, tol)
+    elif method == 'bisection':
+        _search_bisection(prefix, tol)
+    else:
+        raise ValueError(f"Unknown feature selection method: {method!r}")
+
+    n_features_list = sorted(prefix.scores)
+    optimal_features = prefix.best()
+    return {
+        'auc_scores': [prefix.scores[n] for n in n_features_list],
+        'n_features_list': n_features_list,
+        'optimal_features': optimal_features,
+        'max_auc_score': prefix.scores[optimal_features],
+    }
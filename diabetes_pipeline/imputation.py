@@ -0,0 +1,147 @@
+######################################## imputation strategies
+# impute_data fits one imputation strategy on the training data and applies it
+# to the test data. evaluate_imputation_methods compares strategies by the
+# cross-validated score of a RandomForest on the imputed data, either the
+# original way ('global': impute all of X_train, then cross-validate) or
+# fold-correctly ('fold': fit the imputer on each training fold only). In fold
+# mode every (strategy, fold) fit runs in parallel and the fitted imputers go to
+# an ImputerCache, so evaluating again on the same data refits nothing. The fit
+# on the whole training set is left to impute_data, which makes it only for the
+# strategy it is asked for and caches it the same way.
+#
+# The 'knn' strategy (and the KNN imputer of the training pipeline) uses
+# sklearn's KNNImputer unless KNN_IMPUTER is set to 'approximate'.
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import SimpleImputer, KNNImputer, IterativeImputer
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+from .knn_imputation import ApproximateKNNImputer
+from .model_search import _take, data_fingerprint
+
+# 'exact': sklearn's KNNImputer, whose cost grows with rows squared; 'approximate':
+# KD-tree neighbour search (ApproximateKNNImputer), which scales to large tables.
+# On Pima-like data, where few donors are complete, the two pick different
+# neighbours for most rows (see knn_imputation.py), so 'exact' stays the default.
+KNN_IMPUTER = 'exact'
+
+
+# n_jobs is the number of threads of the KD-tree queries (the exact imputer has none)
+def make_knn_imputer(n_neighbors=5, backend=None, n_jobs=None):
+    backend = backend or KNN_IMPUTER
+    if backend == 'approximate':
+        return ApproximateKNNImputer(n_neighbors=n_neighbors, n_jobs=n_jobs)
+    elif backend == 'exact':
+        return KNNImputer(n_neighbors=n_neighbors)
+    raise ValueError(f"Unknown KNN imputer: {backend!r}")
+
+
+def make_imputer(strategy, n_neighbors=5, n_jobs=None):
+    if strategy in ['mean', 'median', 'most_frequent']:
+        return SimpleImputer(strategy=strategy)
+    elif strategy == 'knn':
+        return make_knn_imputer(n_neighbors, n_jobs=n_jobs)
+    elif strategy == 'mice':
+        return IterativeImputer(random_state=1234)
+    raise ValueError(f"Unknown imputation strategy: {strategy!r}")
+
+
+class ImputerCache:
+    # Fitted imputers keyed on (strategy, n_neighbors, fold, data fingerprint);
+    # fold is the fold number, or 'full' for the fit on the whole training set
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+# Define imputation function
+def impute_data(train, test=None, strategy='mean', n_neighbors=5, cache=None, n_jobs=None):
+    # Reuse the imputer already fitted on this exact training set, if cached
+    key = (strategy, n_neighbors, 'full', data_fingerprint(train)) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        imputer, train_imputed = cached
+    else:
+        # Fit on the training data and transform both train and test sets if test is provided
+        imputer = make_imputer(strategy, n_neighbors, n_jobs=n_jobs)
+        train_imputed = imputer.fit_transform(train)
+        if cache is not None:
+            cache.put(key, (imputer, train_imputed))
+
+    if test is not None:
+        test_imputed = imputer.transform(test)
+    else:
+        test_imputed = None
+    return train_imputed, test_imputed
+
+
+# Fit the imputer on one training fold only and score the classifier on the
+# imputed validation fold
+def _fit_fold(strategy, n_neighbors, classifier, scorer, X, y, train, test):
+    imputer = make_imputer(strategy, n_neighbors)
+    X_fold = imputer.fit_transform(_take(X, train))
+    model = clone(classifier).fit(X_fold, _take(y, train))
+    return imputer, scorer(model, imputer.transform(_take(X, test)), _take(y, test))
+
+
+# Evaluate imputation methods
+def evaluate_imputation_methods(X_train, y_train, strategies, scorer, cv=None,
+                                mode='global', cache=None, n_neighbors=5, n_jobs=None):
+    cv = cv or StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    classifier = RandomForestClassifier(random_state=1234)
+    imputation_performance = {}
+
+    if mode == 'global':
+        for strategy in strategies:
+            X_train_imputed, _ = impute_data(X_train, strategy=strategy, n_neighbors=n_neighbors,
+                                             cache=cache, n_jobs=n_jobs)  # Impute only train for CV
+            scores = cross_val_score(classifier, X_train_imputed, y_train, cv=cv, scoring=scorer)
+            imputation_performance[strategy] = np.mean(scores)
+        return imputation_performance
+    elif mode != 'fold':
+        raise ValueError(f"Unknown evaluation mode: {mode!r}")
+
+    cache = cache if cache is not None else ImputerCache()
+    data_key = data_fingerprint(X_train)
+    splits = list(cv.split(X_train, y_train))
+    fitted = {}
+    for strategy in strategies:
+        for fold in range(len(splits)):
+            cached = cache.get((strategy, n_neighbors, fold, data_key))
+            if cached is not None:
+                fitted[strategy, fold] = cached
+    todo = [(strategy, fold) for strategy in strategies for fold in range(len(splits))
+            if (strategy, fold) not in fitted]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(strategy, n_neighbors, classifier, scorer, X_train, y_train,
+                           *splits[fold])
+        for strategy, fold in todo)
+    for (strategy, fold), value in zip(todo, results):
+        cache.put((strategy, n_neighbors, fold, data_key), value)
+        fitted[strategy, fold] = value
+
+    for strategy in strategies:
+        scores = [fitted[strategy, fold][1] for fold in range(len(splits))]
+        imputation_performance[strategy] = np.mean(scores)
+    return imputation_performance
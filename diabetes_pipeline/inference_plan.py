@@ -0,0 +1,224 @@
+######################################## compiled inference transform
+# Compiles the scoring transform (zeros to NaN, missingness indicators,
+# imputation, add_custom_features and the pairwise features) into a flat NumPy
+# plan that computes only the columns the final model uses, straight from the
+# raw inputs. add_custom_features is not rewritten: it is run once at compile
+# time on a dict of symbolic columns, which records every column it builds as
+# an expression; pairwise names such as 'BMI * Age' become one more operation
+# on top. Only the expressions the selected features reach are kept, shared
+# subexpressions are computed once, and an imputer is only called when one of
+# its output columns is needed (a SimpleImputer becomes a NaN fill with its
+# learned statistics). Values match the pandas path: custom features in the
+# dtype training computed them in (float64, or float32 in the compact mode, where
+# the imputed columns are cast first), pairwise features in float32 with
+# infinities as NaN.
+import warnings
+
+import numpy as np
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from .pairwise_features import OPERATIONS
+
+
+# A symbolic column. Arithmetic on it (and np.where) builds a new expression
+class _Expr:
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.key = (op,) + tuple(arg.key if isinstance(arg, _Expr) else ('const', arg)
+                                 for arg in args)
+
+    def __add__(self, other):
+        return _Expr('add', (self, other))
+
+    def __radd__(self, other):
+        return _Expr('add', (other, self))
+
+    def __sub__(self, other):
+        return _Expr('subtract', (self, other))
+
+    def __rsub__(self, other):
+        return _Expr('subtract', (other, self))
+
+    def __mul__(self, other):
+        return _Expr('multiply', (self, other))
+
+    def __rmul__(self, other):
+        return _Expr('multiply', (other, self))
+
+    def __truediv__(self, other):
+        return _Expr('divide', (self, other))
+
+    def __rtruediv__(self, other):
+        return _Expr('divide', (other, self))
+
+    def __pow__(self, other):
+        return _Expr('power', (self, other))
+
+    def __ne__(self, other):
+        return _Expr('not_equal', (self, other))
+
+    __hash__ = None
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func is np.where and not kwargs:
+            return _Expr('where', args)
+        return NotImplemented
+
+
+# Stand-in for the DataFrame add_custom_features receives
+class _TraceFrame(dict):
+    def copy(self):
+        return _TraceFrame(self)
+
+
+_BINARY = {'add': np.add, 'subtract': np.subtract, 'multiply': np.multiply,
+           'divide': np.divide, 'power': np.power, 'not_equal': np.not_equal}
+
+
+def _impute_group(transformer, block):
+    imputer = transformer.steps[-1][1] if isinstance(transformer, Pipeline) and \
+        len(transformer.steps) == 1 else transformer
+    if isinstance(imputer, SimpleImputer) and not imputer.add_indicator:
+        return np.where(np.isnan(block), imputer.statistics_, block)
+    with warnings.catch_warnings():
+        # Fitted on a DataFrame, called on an array in the same column order
+        warnings.simplefilter('ignore', UserWarning)
+        return transformer.transform(block)
+
+
+class InferencePlan:
+    def __init__(self, raw_columns, feature_names, steps, outputs, groups, last_use):
+        self.raw_columns = raw_columns
+        self.feature_names = feature_names
+        self.steps = steps
+        self.outputs = outputs
+        self.groups = groups
+        self.last_use = last_use
+
+    # Feature matrix (float32, one column per feature_names) for a 2-D array of
+    # raw inputs in raw_columns order
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        slots = [None] * len(self.steps)
+        out = np.empty((len(X), len(self.feature_names)), dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for i, (op, args) in enumerate(self.steps):
+                values = [slots[arg] if isinstance(arg, int) else arg[1] for arg in args]
+                if op == 'input':
+                    result = X[:, args[0][1]]
+                elif op == 'zero_nan':
+                    result = np.where(values[0] == 0, np.nan, values[0])
+                elif op == 'isnull':
+                    result = np.isnan(values[0]).astype(np.float64)
+                elif op == 'impute':
+                    result = _impute_group(self.groups[args[0][1]], np.column_stack(values[1:]))
+                elif op == 'take':
+                    result = values[0][:, values[1]]
+                elif op == 'where':
+                    result = np.where(*values)
+                elif op == 'astype':
+                    result = values[0].astype(values[1])
+                elif op == 'float32':
+                    result = values[0].astype(np.float32)
+                    result[~np.isfinite(result)] = np.nan
+                elif op == 'pair':
+                    result = OPERATIONS[values[0]][0](values[1], values[2])
+                    result[~np.isfinite(result)] = np.nan
+                else:
+                    result = _BINARY[op](*values)
+                slots[i] = result
+                for column in self.outputs.get(i, ()):
+                    out[:, column] = result
+                for released in self.last_use.get(i, ()):
+                    slots[released] = None
+        return out
+
+    def transform_records(self, records):
+        return self.transform([[record[column] for column in self.raw_columns]
+                               for record in records])
+
+
+# Symbolic imputed columns: one leaf per ColumnTransformer output, in output order
+def _preprocessor_outputs(preprocessor, raw_columns, columns_with_zeros, missing_indicators):
+    sources = {}
+    for column in raw_columns:
+        source = _Expr('input', (raw_columns.index(column),))
+        sources[column] = _Expr('zero_nan', (source,)) if column in columns_with_zeros else source
+    for indicator, column in missing_indicators.items():
+        sources[indicator] = _Expr('isnull', (sources[column],))
+
+    names_in = list(preprocessor.feature_names_in_)
+    outputs, groups = [], []
+    for _, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop':
+            continue
+        columns = [names_in[column] if isinstance(column, (int, np.integer)) else column
+                   for column in columns]
+        if len(columns) == 0:
+            continue
+        inputs = [sources[column] for column in columns]
+        # A fitted ColumnTransformer holds 'passthrough' as an identity FunctionTransformer
+        if transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer)
+                                            and transformer.func is None):
+            outputs.extend(inputs)
+            continue
+        block = _Expr('impute', (len(groups),) + tuple(inputs))
+        groups.append(transformer)
+        outputs.extend(_Expr('take', (block, position)) for position in range(len(columns)))
+    return outputs, groups
+
+
+# Expression of one model feature: a base column or 'a <symbol> b' of two of them
+def _feature_expr(name, base):
+    if name in base:
+        return _Expr('float32', (base[name],))
+    for operation, (_, symbol, _) in OPERATIONS.items():
+        left, found, right = name.partition(f' {symbol} ')
+        if found and left in base and right in base:
+            return _Expr('pair', (operation, _Expr('float32', (base[left],)),
+                                  _Expr('float32', (base[right],))))
+    raise ValueError(f"Cannot compile feature {name!r}")
+
+
+# dtype: the dtype the imputed columns had when add_custom_features ran in training
+def compile_plan(preprocessor, imputed_columns, feature_names, add_custom_features,
+                 columns_with_zeros, missing_indicators, dtype=np.float64):
+    raw_columns = [column for column in preprocessor.feature_names_in_
+                   if column not in missing_indicators]
+    outputs, groups = _preprocessor_outputs(preprocessor, raw_columns, columns_with_zeros,
+                                            missing_indicators)
+    if np.dtype(dtype) != np.float64:
+        outputs = [_Expr('astype', (output, np.dtype(dtype).name)) for output in outputs]
+    frame = _TraceFrame(zip(imputed_columns, outputs))
+    base = dict(add_custom_features(frame))
+
+    # Topological order of the needed expressions, shared subexpressions once
+    steps, slot_of, feature_slots = [], {}, {}
+
+    def visit(expr):
+        if expr.key in slot_of:
+            return slot_of[expr.key]
+        args = tuple(visit(arg) if isinstance(arg, _Expr) else ('const', arg)
+                     for arg in expr.args)
+        steps.append((expr.op, args))
+        slot_of[expr.key] = len(steps) - 1
+        return slot_of[expr.key]
+
+    for position, name in enumerate(feature_names):
+        feature_slots.setdefault(visit(_feature_expr(name, base)), []).append(position)
+
+    # Free every intermediate right after its last use (features are copied out first)
+    last_use = {slot: slot for slot in range(len(steps))}
+    for i, (_, args) in enumerate(steps):
+        for arg in args:
+            if isinstance(arg, int):
+                last_use[arg] = i
+    released = {}
+    for slot, step in last_use.items():
+        released.setdefault(step, []).append(slot)
+    return InferencePlan(raw_columns, list(feature_names), steps, feature_slots, groups, released)
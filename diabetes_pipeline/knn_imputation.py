@@ -0,0 +1,226 @@
+######################################## approximate KNN imputation
+# KNNImputer computes the NaN-aware distance from every row to every training
+# row, which grows quadratically with the number of rows. ApproximateKNNImputer
+# has the same interface (n_neighbors, weights, fit / transform) but searches a
+# KD-tree instead. The rows to impute are grouped by their missingness pattern;
+# for a pattern with observed columns o and a missing column c, the donors are
+# the training rows with o and c all observed, indexed on o. Queries run in
+# chunks of chunk_size rows, on n_jobs threads, and eps > 0 allows approximate
+# neighbours (each is at most (1 + eps) times farther than the true one).
+#
+# Clinical measurements repeat a lot (integer glucose, insulin, ...), and many
+# identical points make a KD-tree slow, so the tree holds each distinct donor
+# point once with the count and sum of its donors' values, and each distinct
+# query is searched once. When only part of a point's donors fit in the k
+# neighbours, they count with the mean of its donors' values (KNNImputer picks
+# some of the tied donors arbitrarily), and equally distant points are taken in
+# the order of their index, so a row gets the same value in any batch. Rare
+# patterns with at most BRUTE_FORCE_QUERIES distinct queries are compared with
+# every donor point (BRUTE_FORCE_BYTES of differences at a time) instead of
+# building a tree.
+#
+# KNNImputer also takes donors that miss some of o and rescales their partial
+# distances, so the two can pick different neighbours when few training rows
+# are complete; with eps=0 the neighbours are otherwise the same. On Pima-like
+# data (synthetic_diabetes with zeros as NaN) only about 37% of the imputed
+# values match KNNImputer's and a RandomForest's CV AUC drops by 0.002-0.011,
+# which is why imputation.KNN_IMPUTER defaults to 'exact'. Like KNNImputer, a
+# column is filled with its training mean when a row has no observed column or
+# a column has no donor.
+import numpy as np
+import pandas as pd
+from scipy.spatial import KDTree
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+BRUTE_FORCE_QUERIES = 32
+BRUTE_FORCE_BYTES = 64 * 2 ** 20
+
+
+# Group number of every row of a 2-D array, by hashing (no sort of the rows)
+def _row_groups(points):
+    return pd.DataFrame(points).groupby(list(range(points.shape[1])), sort=False,
+                                        dropna=False).ngroup().to_numpy()
+
+
+# The distinct rows of points and the group of every row
+def _unique_rows(points):
+    groups = _row_groups(points)
+    _, first = np.unique(groups, return_index=True)
+    return points[first], groups
+
+
+# Euclidean distances from each query to its rows of points (shape (queries,
+# points, features), or broadcast to it). Both search paths use this, so equal
+# points get bit-identical distances.
+def _distances(queries, points):
+    difference = queries[:, None, :] - points
+    return np.sqrt(np.square(difference).sum(axis=2))
+
+
+# The n columns of each row with the smallest (distance, column) among those at most kth away
+def _first_by_distance(distances, kth, n):
+    result_distances = np.empty((len(distances), n))
+    result_indices = np.empty((len(distances), n), dtype=np.intp)
+    for row, row_distances in enumerate(distances):
+        candidates = np.flatnonzero(row_distances <= kth[row])
+        candidates = candidates[np.argsort(row_distances[candidates], kind='stable')[:n]]
+        result_distances[row] = row_distances[candidates]
+        result_indices[row] = candidates
+    return result_distances, result_indices
+
+
+class ApproximateKNNImputer(TransformerMixin, BaseEstimator):
+    def __init__(self, n_neighbors=5, weights='uniform', eps=0.0, chunk_size=10_000,
+                 leaf_size=40, n_jobs=None):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.eps = eps
+        self.chunk_size = chunk_size
+        self.leaf_size = leaf_size
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None):
+        if self.weights not in ('uniform', 'distance'):
+            raise ValueError(f"Unknown weights: {self.weights!r}")
+        if hasattr(X, 'columns'):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        X = np.asarray(X, dtype=float)
+        self.n_features_in_ = X.shape[1]
+        self._fit_X = X
+        self._fit_observed = ~np.isnan(X)
+        with np.errstate(invalid='ignore'):
+            self.column_means_ = np.nanmean(np.where(self._fit_observed, X, np.nan), axis=0)
+        self._trees = {}
+        return self
+
+    # The distinct donor points of (observed columns, target column), with the
+    # number of donors at each point and the sum of their target values; the
+    # KD-tree over the points is added by _tree
+    def _donors(self, observed_columns, column):
+        key = (observed_columns, column)
+        if key not in self._trees:
+            needed = list(observed_columns) + [column]
+            donors = np.flatnonzero(self._fit_observed[:, needed].all(axis=1))
+            if len(donors) == 0:
+                self._trees[key] = None
+            else:
+                points, groups = _unique_rows(self._fit_X[np.ix_(donors, observed_columns)])
+                self._trees[key] = {'points': points, 'counts': np.bincount(groups).astype(float),
+                                    'sums': np.bincount(groups, weights=self._fit_X[donors, column])}
+        return self._trees[key]
+
+    def _tree(self, donors):
+        if 'tree' not in donors:
+            # Midpoint splits build faster than median splits and query as fast
+            donors['tree'] = KDTree(donors['points'], leafsize=self.leaf_size,
+                                    balanced_tree=False)
+        return donors['tree']
+
+    # Distances and indices of the n nearest donor points of each query, ordered
+    # by (distance, point index), so equally distant points are taken in the same
+    # order by both paths and a row's value does not depend on the rest of its
+    # batch. With eps > 0 every pattern uses the tree.
+    def _nearest(self, donors, queries, n, k):
+        points = donors['points']
+        if len(queries) <= BRUTE_FORCE_QUERIES and self.eps == 0:
+            block = max(1, BRUTE_FORCE_BYTES // (16 * points.size))
+            distances = np.empty((len(queries), len(points)))
+            for start in range(0, len(queries), block):
+                distances[start:start + block] = _distances(queries[start:start + block],
+                                                            points[None, :, :])
+            kth = np.partition(distances, n - 1, axis=1)[:, n - 1]
+            return _first_by_distance(distances, kth, n)
+
+        workers = -1 if self.n_jobs == -1 else (self.n_jobs or 1)
+        tree = self._tree(donors)
+        _, indices = tree.query(queries, k=[n] if n == 1 else n, eps=self.eps, workers=workers)
+        indices = indices.reshape(len(queries), n)
+        distances = _distances(queries, points[indices])
+        order = np.lexsort((indices, distances), axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        if self.eps > 0 or n == len(points):
+            return distances, indices
+
+        # Rows whose k donors are not all strictly closer than the last distance are
+        # queried again with twice as many neighbours until the points at that
+        # distance are all found (the farthest one found is farther)
+        last = distances[:, -1]
+        closer = np.where(distances < last[:, None], donors['counts'][indices], 0).sum(axis=1)
+        pending = np.flatnonzero(closer < k)
+        m = n
+        while len(pending) and m < len(points):
+            m = min(2 * m, len(points))
+            _, wider = tree.query(queries[pending], k=m, workers=workers)
+            wider_distances = _distances(queries[pending], points[wider])
+            order = np.lexsort((wider, wider_distances), axis=1)[:, :n]
+            distances[pending] = np.take_along_axis(wider_distances, order, axis=1)
+            indices[pending] = np.take_along_axis(wider, order, axis=1)
+            pending = pending[wider_distances.max(axis=1) <= last[pending]]
+        return distances, indices
+
+    # Mean (or inverse-distance weighted mean) target value of the k nearest donors
+    def _neighbour_mean(self, donors, queries):
+        counts, sums = donors['counts'], donors['sums']
+        k = min(self.n_neighbors, counts.sum())
+        n_points = min(self.n_neighbors, len(counts))
+        queries, groups = _unique_rows(queries)
+        result = np.empty(len(queries))
+        for start in range(0, len(queries), self.chunk_size):
+            chunk = queries[start:start + self.chunk_size]
+            distances, indices = self._nearest(donors, chunk, n_points, k)
+            # Donors taken from each neighbouring point, nearest first, until k are taken
+            point_counts = counts[indices]
+            taken = np.clip(k - (np.cumsum(point_counts, axis=1) - point_counts), 0, point_counts)
+            point_means = sums[indices] / point_counts
+            if self.weights == 'uniform':
+                weights = taken
+            else:
+                # As in sklearn: exact matches take all the weight
+                exact = distances == 0
+                with np.errstate(divide='ignore'):
+                    weights = np.where(exact.any(axis=1)[:, None], taken * exact,
+                                       taken / distances)
+            result[start:start + len(chunk)] = ((weights * point_means).sum(axis=1)
+                                                / weights.sum(axis=1))
+        return result[groups]
+
+    def transform(self, X):
+        check_is_fitted(self, 'column_means_')
+        X = np.array(X, dtype=float)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but ApproximateKNNImputer was "
+                             f"fitted with {self.n_features_in_}")
+        missing = np.isnan(X)
+        rows = np.flatnonzero(missing.any(axis=1))
+        if len(rows) == 0:
+            return X
+
+        patterns, inverse, counts = np.unique(missing[rows], axis=0, return_inverse=True,
+                                              return_counts=True)
+        by_pattern = np.split(rows[np.argsort(inverse.ravel(), kind='stable')],
+                              np.cumsum(counts)[:-1])
+        for pattern, pattern_rows in zip(patterns, by_pattern):
+            observed_columns = tuple(np.flatnonzero(~pattern))
+            queries = X[np.ix_(pattern_rows, observed_columns)] if observed_columns else None
+            for column in np.flatnonzero(pattern):
+                donors = self._donors(observed_columns, column) if observed_columns else None
+                if donors is None:
+                    X[pattern_rows, column] = self.column_means_[column]
+                else:
+                    X[pattern_rows, column] = self._neighbour_mean(donors, queries)
+        return X
+
+    def get_feature_names_out(self, input_features=None):
+        if input_features is not None:
+            return np.asarray(input_features, dtype=object)
+        if hasattr(self, 'feature_names_in_'):
+            return self.feature_names_in_
+        return np.asarray([f'x{i}' for i in range(self.n_features_in_)], dtype=object)
+
+    # The donor points and KD-trees are rebuilt on demand rather than pickled with the model
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_trees'] = {}
+        return state
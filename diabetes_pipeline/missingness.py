@@ -0,0 +1,178 @@
+######################################## Little's MCAR test
+# Little (1988): under MCAR, the mean of the observed columns in each
+# missingness pattern only differs from the overall mean by chance. With the
+# maximum-likelihood mean mu and covariance S of the data (EM under a normal
+# model), the statistic
+#     d2 = sum over patterns j of n_j (ybar_j - mu_o)' S_oo^-1 (ybar_j - mu_o)
+# (o = the pattern's observed columns) is chi-square with sum_j |o_j| - p
+# degrees of freedom.
+#
+# Rows are grouped by missingness pattern once and reduced to per-pattern sums
+# of the observed values and of their outer products. Every EM iteration then
+# works on those sums only, and patterns with the same number of observed
+# columns are handled together with batched NumPy linear algebra, so the cost
+# of an iteration does not depend on the number of rows. Rows with no observed
+# value carry no information and are left out.
+import numpy as np
+from scipy.stats import chi2
+
+# Patterns with at least this many rows get their outer products from one matrix
+# product; the rows of rarer patterns are summed in chunks of outer products
+_DENSE_PATTERN_ROWS = 32
+_OUTER_CHUNK_BYTES = 64 * 2 ** 20
+
+
+# Pattern number of every row. The mask rows are packed into 64-bit words and
+# the words combined one at a time, which is much faster than np.unique(axis=0)
+# on the boolean rows.
+def _pattern_codes(observed):
+    packed = np.packbits(observed, axis=1)
+    packed = np.pad(packed, ((0, 0), (0, -packed.shape[1] % 8)))
+    words = packed.view(np.uint64)
+    codes = np.zeros(len(observed), dtype=np.int64)
+    for word in words.T:
+        _, word_codes = np.unique(word, return_inverse=True)
+        _, codes = np.unique(codes * (word_codes.max() + 1) + word_codes, return_inverse=True)
+    return codes.ravel()
+
+
+# Per-pattern counts, sums and sums of outer products of the observed values
+# (missing values as 0), with the rows sorted by pattern
+def _pattern_sums(values, observed):
+    inverse = _pattern_codes(observed)
+    order = np.argsort(inverse, kind='stable')
+    counts = np.bincount(inverse).astype(np.int64)
+    patterns = observed[order[np.concatenate(([0], np.cumsum(counts)[:-1]))]]
+    filled = np.where(observed, values, 0.0)[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    n_columns = values.shape[1]
+    sums = np.add.reduceat(filled, starts, axis=0)
+    outer = np.zeros((len(patterns), n_columns, n_columns))
+    sparse = []
+    for pattern, (start, count) in enumerate(zip(starts, counts)):
+        if count >= _DENSE_PATTERN_ROWS:
+            block = filled[start:start + count]
+            outer[pattern] = block.T @ block
+        else:
+            sparse.append(pattern)
+    if sparse:
+        # The rows are sorted by pattern, so each chunk is summed per run of equal patterns
+        rows = np.concatenate([np.arange(starts[j], starts[j] + counts[j]) for j in sparse])
+        row_patterns = inverse[order][rows]
+        chunk = max(1, _OUTER_CHUNK_BYTES // (8 * n_columns * n_columns))
+        for start in range(0, len(rows), chunk):
+            block = filled[rows[start:start + chunk]]
+            block_patterns = row_patterns[start:start + chunk]
+            runs = np.flatnonzero(np.diff(block_patterns, prepend=-1))
+            np.add.at(outer, block_patterns[runs],
+                      np.add.reduceat(block[:, :, None] * block[:, None, :], runs, axis=0))
+    return patterns, counts.astype(float), sums, outer
+
+
+# Patterns grouped by their number of observed columns:
+# [(pattern indices, observed column indices, missing column indices)]
+def _groups_by_observed(patterns):
+    n_observed = patterns.sum(axis=1)
+    columns = np.arange(patterns.shape[1])
+    groups = []
+    for q in np.unique(n_observed):
+        members = np.flatnonzero(n_observed == q)
+        observed = np.array([columns[patterns[j]] for j in members]).reshape(len(members), q)
+        missing = np.array([columns[~patterns[j]] for j in members]).reshape(len(members), -1)
+        groups.append((members, observed, missing))
+    return groups
+
+
+# The (rows, columns) block of a matrix for every pattern of a group
+def _block(matrix, rows, columns):
+    return matrix[rows[:, :, None], columns[:, None, :]]
+
+
+# One EM step: expected sums of x and x x' over all rows given mu and S
+def _em_step(mu, S, counts, sums, outer, groups):
+    n_columns = len(mu)
+    total = np.zeros(n_columns)
+    total_outer = np.zeros((n_columns, n_columns))
+    for members, o, m in groups:
+        n = counts[members]
+        T1 = sums[members[:, None], o]
+        T2 = outer[members[:, None, None], o[:, :, None], o[:, None, :]]
+        np.add.at(total, o, T1)
+        np.add.at(total_outer, (o[:, :, None], o[:, None, :]), T2)
+        if m.shape[1] == 0:
+            continue
+
+        # Regression of the missing columns on the observed ones
+        mu_o, mu_m = mu[o], mu[m]
+        S_oo, S_om, S_mm = _block(S, o, o), _block(S, o, m), _block(S, m, m)
+        B = np.linalg.solve(S_oo, S_om)
+        C = S_mm - S_om.transpose(0, 2, 1) @ B
+
+        A1 = T1 - n[:, None] * mu_o
+        A2 = (T2 - np.einsum('kq,ks->kqs', mu_o, T1) - np.einsum('kq,ks->kqs', T1, mu_o)
+              + n[:, None, None] * np.einsum('kq,ks->kqs', mu_o, mu_o))
+        v = np.einsum('kqr,kq->kr', B, A1)
+        sum_m = n[:, None] * mu_m + v
+        outer_om = (np.einsum('kq,kr->kqr', T1, mu_m)
+                    + (T2 - np.einsum('kq,ks->kqs', T1, mu_o)) @ B)
+        outer_mm = (n[:, None, None] * np.einsum('kr,ks->krs', mu_m, mu_m)
+                    + np.einsum('kr,ks->krs', mu_m, v) + np.einsum('kr,ks->krs', v, mu_m)
+                    + B.transpose(0, 2, 1) @ A2 @ B + n[:, None, None] * C)
+
+        np.add.at(total, m, sum_m)
+        np.add.at(total_outer, (o[:, :, None], m[:, None, :]), outer_om)
+        np.add.at(total_outer, (m[:, :, None], o[:, None, :]), outer_om.transpose(0, 2, 1))
+        np.add.at(total_outer, (m[:, :, None], m[:, None, :]), outer_mm)
+    return total, total_outer
+
+
+# Little's MCAR test on a DataFrame or 2-D array with NaN for missing values.
+# Returns the chi-square statistic, its degrees of freedom and p-value, with the
+# EM estimates of the mean and covariance.
+def little_mcar_test(data, max_iter=200, tol=1e-6):
+    values = np.asarray(data, dtype=float)
+    observed = ~np.isnan(values)
+    if not observed.any(axis=0).all():
+        raise ValueError("Little's MCAR test needs at least one observed value per column")
+    keep = observed.any(axis=1)
+    values, observed = values[keep], observed[keep]
+    n_rows, n_columns = values.shape
+
+    patterns, counts, sums, outer = _pattern_sums(values, observed)
+    groups = _groups_by_observed(patterns)
+
+    # EM, starting from the observed means and variances
+    n_observed = counts @ patterns
+    mu = sums.sum(axis=0) / n_observed
+    S = np.diag(np.einsum('kii->i', outer) / n_observed - mu ** 2)
+    for iteration in range(1, max_iter + 1):
+        total, total_outer = _em_step(mu, S, counts, sums, outer, groups)
+        new_mu = total / n_rows
+        new_S = total_outer / n_rows - np.outer(new_mu, new_mu)
+        change = max(np.max(np.abs(new_mu - mu)), np.max(np.abs(new_S - S)))
+        scale = max(np.max(np.abs(new_mu)), np.max(np.abs(new_S)), 1.0)
+        mu, S = new_mu, new_S
+        if change <= tol * scale:
+            break
+
+    # d2 over the patterns, batched by their number of observed columns
+    statistic = 0.0
+    dof = -n_columns
+    for members, o, _ in groups:
+        n = counts[members]
+        diff = sums[members[:, None], o] / n[:, None] - mu[o]
+        solved = np.linalg.solve(_block(S, o, o), diff[:, :, None])[:, :, 0]
+        statistic += float(np.sum(n * np.einsum('kq,kq->k', diff, solved)))
+        dof += o.size
+    p_value = float(chi2.sf(statistic, dof)) if dof > 0 else np.nan
+    return {
+        'chi2': statistic,
+        'dof': dof,
+        'p_value': p_value,
+        'n_patterns': len(patterns),
+        'n_rows': n_rows,
+        'n_iter': iteration,
+        'mean': mu,
+        'covariance': S,
+    }
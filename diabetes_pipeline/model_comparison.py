@@ -0,0 +1,166 @@
+######################################## model x scaler comparison
+# Runs the grid search of every (model, scaler) combination concurrently in a
+# pool of worker processes. The training and test arrays are written once to
+# .npy files and memory-mapped read-only by the workers instead of being pickled
+# to each of them, and the machine's cores are split between the workers so that
+# workers x CV jobs x estimator threads never exceeds the core count. Result
+# rows are yielded as soon as each combination finishes.
+#
+# The scaled data does not depend on the classifier, so each scaler is fitted
+# once per CV fold up front (the fold store) and every classifier is trained on
+# read-only memory maps of the same scaled train / validation blocks.
+#
+# Each worker times its fits and the whole combination and sends the timings
+# back with the result row; they go to tracing.record_fit.
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from joblib import Parallel, cpu_count, delayed, parallel_config
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, check_scoring, f1_score, roc_auc_score
+from sklearn.model_selection import ParameterGrid
+from sklearn.pipeline import Pipeline
+
+from . import tracing
+
+# Read-only memory maps of the fold store, opened per combination (not cached in
+# the worker: reused workers would keep deleted fold stores mapped)
+def _load_shared(paths):
+    return {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+
+# Cap the estimator's own thread pool (RandomForest / XGBoost n_jobs)
+def _limit_estimator_threads(estimator, n_threads):
+    params = estimator.get_params(deep=False)
+    if 'n_jobs' in params:
+        estimator.set_params(n_jobs=n_threads)
+    if 'nthread' in params:
+        estimator.set_params(nthread=n_threads)
+    return estimator
+
+
+# Fit each scaler once per fold and save the scaled blocks as .npy files:
+# (scaler, fold, 'train' / 'valid') per CV fold, plus (scaler, 'full', 'train' /
+# 'test') for the refit on the whole training set
+def build_fold_store(scalers, X_train, X_test, splits, folder):
+    paths = {}
+
+    def save(key, array):
+        paths[key] = os.path.join(folder, '_'.join(map(str, key)) + '.npy')
+        np.save(paths[key], array)
+
+    for scaler_name, scaler in scalers.items():
+        for fold, (train, test) in enumerate(splits):
+            fitted = clone(scaler).fit(X_train[train])
+            save((scaler_name, fold, 'train'), fitted.transform(X_train[train]))
+            save((scaler_name, fold, 'valid'), fitted.transform(X_train[test]))
+        fitted = clone(scaler).fit(X_train)
+        save((scaler_name, 'full', 'train'), fitted.transform(X_train))
+        save((scaler_name, 'full', 'test'), fitted.transform(X_test))
+    return paths
+
+
+# Fit one parameter setting on one pre-scaled fold and score it; returns the
+# score and the timing of the fit
+def _fit_and_score(pipeline, params, X_train, y_train, X_valid, y_valid, scorer):
+    clock = tracing.FitClock()
+    model = clone(pipeline).set_params(**params)
+    model.fit(X_train, y_train)
+    clock.fitted()
+    return scorer(model, X_valid, y_valid), clock.stop()
+
+
+# Grid search one (model, scaler) combination on the fold store and evaluate it
+# on the test set. The classifier sits in a one-step pipeline so the
+# 'classifier__...' grid keys and best params keep their names. Returns the
+# result row and the timings [(kind, timing, details)] of its fits.
+def _run_combination(model_name, model, scaler_name, grid, splits, scoring,
+                     paths, cv_jobs, n_threads):
+    clock = tracing.FitClock()
+    data = _load_shared(paths)
+    y_train, y_test = data['y_train'], data['y_test']
+    pipeline = Pipeline([
+        ('classifier', _limit_estimator_threads(clone(model), n_threads))
+    ])
+    scorer = check_scoring(pipeline, scoring=scoring)
+    candidates = list(ParameterGrid(grid))
+
+    results = Parallel(n_jobs=cv_jobs)(
+        delayed(_fit_and_score)(pipeline, params,
+                                data[(scaler_name, fold, 'train')], y_train[train],
+                                data[(scaler_name, fold, 'valid')], y_train[test], scorer)
+        for params in candidates for fold, (train, test) in enumerate(splits))
+    scores = [score for score, _ in results]
+    mean_scores = np.asarray(scores).reshape(len(candidates), len(splits)).mean(axis=1)
+    best = int(np.argmax(mean_scores))
+    labels = {'model': model_name, 'scaler': scaler_name}
+    fits = [('fit', timing, dict(labels, params=candidates[i // len(splits)],
+                                 fold=i % len(splits)))
+            for i, (_, timing) in enumerate(results)]
+
+    best_model = clone(pipeline).set_params(**candidates[best])
+    best_model.fit(data[(scaler_name, 'full', 'train')], y_train)
+    X_test = data[(scaler_name, 'full', 'test')]
+    y_pred = best_model.predict(X_test)
+    fits.append(('combination', clock.stop(), dict(labels, params=candidates[best])))
+    row = {
+        'Model': model_name,
+        'Scaler': scaler_name,
+        'Best Score (ROC-AUC)': mean_scores[best],
+        'Test Accuracy': accuracy_score(y_test, y_pred),
+        'Test F1 Score': f1_score(y_test, y_pred, average='binary'),
+        'Test ROC-AUC Score': roc_auc_score(y_test, best_model.predict_proba(X_test)[:, 1]),
+        'Best Params': candidates[best]
+    }
+    return row, fits
+
+
+# Split n_cores between concurrent combinations, CV jobs and estimator threads
+def thread_budget(n_combinations, n_workers=None, cv_jobs=1, n_cores=None):
+    n_cores = n_cores or cpu_count()
+    n_workers = max(1, min(n_workers or n_cores, n_combinations, n_cores))
+    cv_jobs = max(1, min(cv_jobs, n_cores // n_workers))
+    n_threads = max(1, n_cores // (n_workers * cv_jobs))
+    return n_workers, cv_jobs, n_threads
+
+
+# Yield one result row per (model, scaler) combination, in completion order.
+# param_grid maps model names to their pipeline grids ('classifier__...');
+# models without an entry are fitted with their default settings.
+def compare_models(models, scalers, param_grid, X_train, y_train, X_test, y_test, cv,
+                   scoring='roc_auc', n_workers=None, cv_jobs=1, n_cores=None,
+                   temp_folder=None, verbose=0):
+    combinations = [(model_name, model, scaler_name, scaler)
+                    for model_name, model in models.items()
+                    for scaler_name, scaler in scalers.items()]
+    n_workers, cv_jobs, n_threads = thread_budget(len(combinations), n_workers,
+                                                  cv_jobs, n_cores)
+    if verbose:
+        print(f"Comparing {len(combinations)} combinations on {n_workers} workers "
+              f"x {cv_jobs} CV jobs x {n_threads} estimator threads")
+
+    X_train, X_test = np.asarray(X_train), np.asarray(X_test)
+    y_train = np.asarray(y_train)
+    splits = list(cv.split(X_train, y_train))
+    folder = tempfile.mkdtemp(prefix='model_comparison_', dir=temp_folder)
+    try:
+        paths = build_fold_store(scalers, X_train, X_test, splits, folder)
+        for name, array in (('y_train', y_train), ('y_test', np.asarray(y_test))):
+            paths[name] = os.path.join(folder, f'{name}.npy')
+            np.save(paths[name], array)
+
+        with parallel_config(backend='loky', inner_max_num_threads=n_threads):
+            rows = Parallel(n_jobs=n_workers, return_as='generator_unordered',
+                            verbose=verbose)(
+                delayed(_run_combination)(model_name, model, scaler_name,
+                                          param_grid.get(model_name, {}), splits, scoring,
+                                          paths, cv_jobs, n_threads)
+                for model_name, model, scaler_name, _ in combinations)
+            for row, fits in rows:
+                for kind, timing, details in fits:
+                    tracing.record_fit(kind, timing, **details)
+                yield row
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
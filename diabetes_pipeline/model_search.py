@@ -0,0 +1,425 @@
+######################################## pluggable hyperparameter search
+# GridSearchCV scores every candidate on every fold. For large grids the
+# successive halving / hyperband searches below score all candidates on a small
+# budget first (a few CV folds or a subsample of the training rows), keep the
+# best 1/factor of them for the next rung, and only give the full set of folds
+# to the survivors. Both expose the same best_params_ / best_score_ /
+# best_estimator_ surface as GridSearchCV.
+#
+# When a TransformCache is given, the leading pipeline step (the imputing
+# preprocessor) is fitted once per (fold, preprocessor params) and its output is
+# shared by every classifier setting that uses the same preprocessor.
+#
+# With staged_param set (e.g. 'classifier__n_estimators'), candidates that only
+# differ in their tree count share one fit with the largest count per fold, and
+# the smaller counts are scored from truncated copies of that ensemble.
+#
+# Every fit is timed in its worker and reported to tracing.record_fit, so an open
+# trace shows each (candidate, fold) fit with its parameters.
+import copy
+import hashlib
+import math
+from collections import OrderedDict
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import GridSearchCV, ParameterGrid, train_test_split
+
+from . import tracing
+
+
+# Row indexing that works for DataFrames/Series as well as numpy arrays
+def _take(data, indices):
+    return data.iloc[indices] if hasattr(data, 'iloc') else data[indices]
+
+
+# Copy of a fitted ensemble that only uses its first n trees / boosting rounds.
+# param names the tree-count parameter, with pipeline step prefixes if any.
+# RandomForest trees are drawn in sequence from one random state and boosting
+# rounds build on each other, so the prefix equals a model fitted with n directly.
+def truncate_ensemble(model, param, n):
+    if '__' in param:
+        step, rest = param.split('__', 1)
+        truncated = copy.copy(model)
+        truncated.steps = [(name, truncate_ensemble(est, rest, n) if name == step else est)
+                           for name, est in model.steps]
+        return truncated
+    truncated = copy.copy(model)
+    if hasattr(model, 'get_booster'):
+        # XGBoost: keep the first n boosting rounds (same as iteration_range=(0, n))
+        truncated._Booster = model.get_booster()[:n]
+    elif hasattr(model, 'estimators_'):
+        truncated.estimators_ = model.estimators_[:n]
+    else:
+        raise TypeError(f"Cannot truncate {type(model).__name__} to {n} trees")
+    setattr(truncated, param, n)
+    return truncated
+
+
+# Score a fitted model, or each truncated size of it when sizes are given
+def _score_sizes(model, X_test, y_test, scorer, staged_param, sizes):
+    if staged_param is None:
+        return [scorer(model, X_test, y_test)]
+    return [scorer(truncate_ensemble(model, staged_param, n), X_test, y_test)
+            for n in sizes]
+
+
+# Fit one candidate on one (possibly subsampled) training fold and score it
+# (once per tree count in sizes when staged); returns the scores and the timing
+def _fit_and_score(estimator, params, X, y, train, test, scorer, staged_param=None,
+                   sizes=None):
+    clock = tracing.FitClock()
+    model = clone(estimator).set_params(**params)
+    model.fit(_take(X, train), _take(y, train))
+    clock.fitted()
+    scores = _score_sizes(model, _take(X, test), _take(y, test), scorer, staged_param, sizes)
+    return scores, clock.stop()
+
+
+# Fit the cached head of the pipeline on a fold and transform both sides
+def _fit_transform(head, params, X, y, train, test):
+    clock = tracing.FitClock()
+    model = clone(head).set_params(**params)
+    X_train = model.fit_transform(_take(X, train), _take(y, train))
+    clock.fitted()
+    return (X_train, model.transform(_take(X, test))), clock.stop()
+
+
+# Fit the rest of the pipeline on already transformed fold data and score it
+def _fit_and_score_transformed(tail, params, X_train, y_train, X_test, y_test, scorer,
+                               staged_param=None, sizes=None):
+    clock = tracing.FitClock()
+    model = clone(tail).set_params(**params)
+    model.fit(X_train, y_train)
+    clock.fitted()
+    return _score_sizes(model, X_test, y_test, scorer, staged_param, sizes), clock.stop()
+
+
+# Fingerprint of the training data so cached transforms are never reused for other data
+def data_fingerprint(X):
+    digest = hashlib.sha1(np.ascontiguousarray(np.asarray(X, dtype=float)).tobytes())
+    if hasattr(X, 'columns'):
+        digest.update(repr(list(X.columns)).encode())
+    return digest.hexdigest()
+
+
+class TransformCache:
+    # Bounded LRU store of transformed fold data, keyed on the data fingerprint,
+    # the fold's train/test indices and the preprocessor params. A transform that
+    # is computed once and then used by k candidates counts as 1 miss and k - 1 hits.
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(data_key, train, test, params):
+        digest = hashlib.sha1(data_key.encode())
+        digest.update(np.asarray(train).tobytes())
+        digest.update(b'|')
+        digest.update(np.asarray(test).tobytes())
+        digest.update(repr(sorted(params.items())).encode())
+        return digest.hexdigest()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Record how many candidates are about to use a transform and whether it was
+    # cached. A hit counts as a use, so the misses stored after it in the same
+    # chunk cannot evict it before it is read.
+    def lookup(self, key, uses=1):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += uses
+            return True
+        self.misses += 1
+        self.hits += uses - 1
+        return False
+
+    def get(self, key):
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'max_entries': self.max_entries}
+
+
+class HalvingSearchCV:
+    # method: 'grid' scores every candidate on the full budget (exhaustive, but
+    #         still able to use the transform cache),
+    #         'halving' runs one successive halving bracket over the whole grid,
+    #         'hyperband' adds brackets that start fewer (randomly drawn)
+    #         candidates on larger budgets, as a hedge against dropping a good
+    #         candidate too early
+    # resource: 'folds' grows the number of CV folds per rung,
+    #           'n_samples' uses every fold but grows the training rows per rung
+    # transform_cache / cache_step: share the output of the pipeline step named
+    #           cache_step (and any steps before it) across candidates
+    # staged_param: tree-count parameter whose values are scored from one fit
+    #           with the largest value
+    def __init__(self, estimator, param_grid, cv, scoring='roc_auc', method='halving',
+                 resource='folds', factor=3, min_resource=None, n_jobs=None,
+                 verbose=0, random_state=1234, refit=True, transform_cache=None,
+                 cache_step='preprocessor', staged_param=None):
+        if method not in ('grid', 'halving', 'hyperband'):
+            raise ValueError(f"Unknown search method: {method!r}")
+        if resource not in ('folds', 'n_samples'):
+            raise ValueError(f"Unknown resource: {resource!r}")
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.scoring = scoring
+        self.method = method
+        self.resource = resource
+        self.factor = factor
+        self.min_resource = min_resource
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.random_state = random_state
+        self.refit = refit
+        self.transform_cache = transform_cache
+        self.cache_step = cache_step
+        self.staged_param = staged_param
+
+    def fit(self, X, y):
+        self._splits = list(self.cv.split(X, y))
+        self._candidates = list(ParameterGrid(self.param_grid))
+        self._scorer = check_scoring(self.estimator, scoring=self.scoring)
+        self._scores = {}  # (candidate, fold, n_rows) -> score, shared by all rungs and brackets
+        self._subsamples = {}  # (fold, n_rows) -> training rows
+        self._history = {}  # candidate -> (rung, budget, mean score) at its largest budget
+        self._rungs = []  # (bracket, rung, candidate, budget, mean score) per evaluation
+        self.n_fits_ = 0
+        if self.transform_cache is not None:
+            step_names = [name for name, _ in self.estimator.steps]
+            split = step_names.index(self.cache_step) + 1
+            self._head, self._tail = self.estimator[:split], self.estimator[split:]
+            self._head_steps = set(step_names[:split])
+            self._data_key = data_fingerprint(X)
+
+        if self.resource == 'folds':
+            max_resource = len(self._splits)
+        else:
+            max_resource = min(len(train) for train, _ in self._splits)
+        min_resource = self.min_resource or max(1, max_resource // self.factor ** 2)
+        n_levels = int(math.floor(math.log(max_resource / min_resource, self.factor))) + 1
+        budgets = [min_resource * self.factor ** i for i in range(n_levels - 1)] + [max_resource]
+        self._max_resource = max_resource
+
+        rng = np.random.RandomState(self.random_state)
+        n_candidates = len(self._candidates)
+        if self.method == 'grid':
+            brackets = [([max_resource], list(range(n_candidates)))]
+        elif self.method == 'halving':
+            brackets = [(budgets, list(range(n_candidates)))]
+        else:
+            # Bracket s starts on the last s + 1 budgets; the widest bracket takes the
+            # whole grid, narrower ones a random share of it on a larger budget
+            s_max = n_levels - 1
+            brackets = []
+            for s in range(s_max, -1, -1):
+                n = min(n_candidates, int(math.ceil(
+                    n_candidates * (s_max + 1) / (s + 1) * self.factor ** (s - s_max))))
+                chosen = sorted(rng.choice(n_candidates, size=n, replace=False))
+                brackets.append((budgets[s_max - s:], chosen))
+
+        for bracket, (bracket_budgets, survivors) in enumerate(brackets):
+            for rung, budget in enumerate(bracket_budgets):
+                if self.verbose:
+                    print(f"[{self.method}] bracket {bracket}, rung {rung}: "
+                          f"{len(survivors)} candidates x {budget} {self.resource}")
+                means = self._evaluate(X, y, survivors, budget)
+                for candidate, mean in zip(survivors, means):
+                    self._rungs.append((bracket, rung, candidate, budget, mean))
+                    # A later hyperband bracket may start the candidate on a smaller
+                    # budget again; its score at the larger budget is kept
+                    if candidate not in self._history or budget >= self._history[candidate][1]:
+                        self._history[candidate] = (rung, budget, mean)
+                if budget == max_resource:
+                    break
+                keep = max(1, int(math.ceil(len(survivors) / self.factor)))
+                order = np.argsort(means)[::-1][:keep]
+                survivors = [survivors[i] for i in sorted(order)]
+
+        self._build_results()
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        return self
+
+    # Units (candidate, fold, rows) that make up a candidate's score at a budget
+    def _units(self, candidate, budget):
+        if self.resource == 'folds':
+            return [(candidate, fold, None) for fold in range(budget)]
+        n_rows = None if budget == self._max_resource else budget
+        return [(candidate, fold, n_rows) for fold in range(len(self._splits))]
+
+    def _train_rows(self, y, fold, n_rows):
+        train = self._splits[fold][0]
+        if n_rows is None:
+            return train
+        key = (fold, n_rows)
+        if key not in self._subsamples:
+            self._subsamples[key], _ = train_test_split(
+                train, train_size=n_rows, stratify=np.asarray(_take(y, train)),
+                random_state=self.random_state)
+        return self._subsamples[key]
+
+    # Score every candidate at the given budget, fitting only units not seen before
+    def _evaluate(self, X, y, candidates, budget):
+        todo = [unit for candidate in candidates for unit in self._units(candidate, budget)
+                if unit not in self._scores]
+        if self.transform_cache is not None:
+            self.n_fits_ += self._evaluate_cached(X, y, todo)
+        else:
+            self.n_fits_ += self._evaluate_plain(X, y, todo)
+        return [np.mean([self._scores[unit] for unit in self._units(candidate, budget)])
+                for candidate in candidates]
+
+    # Merge units that only differ in the staged tree count into one fit:
+    # [(params with the largest count, [units], [counts])]
+    def _staged_jobs(self, units):
+        if self.staged_param is None:
+            return [(params, [unit], None) for unit, params in units]
+        jobs = OrderedDict()
+        for unit, params in units:
+            rest = {k: v for k, v in params.items() if k != self.staged_param}
+            key = (unit[1], unit[2], repr(sorted(rest.items())))
+            job = jobs.setdefault(key, (rest, [], []))
+            job[1].append(unit)
+            job[2].append(params[self.staged_param])
+        return [(dict(rest, **{self.staged_param: max(sizes)}), job_units, sizes)
+                for rest, job_units, sizes in jobs.values()]
+
+    def _evaluate_plain(self, X, y, todo):
+        jobs = self._staged_jobs([(unit, self._candidates[unit[0]]) for unit in todo])
+        results = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(_fit_and_score)(self.estimator, params, X, y,
+                                    self._train_rows(y, units[0][1], units[0][2]),
+                                    self._splits[units[0][1]][1], self._scorer,
+                                    self.staged_param, sizes)
+            for params, units, sizes in jobs)
+        for (params, units, sizes), (job_scores, timing) in zip(jobs, results):
+            self._scores.update(zip(units, job_scores))
+            self._record_fit('fit', timing, params, units, sizes)
+        return len(jobs)
+
+    def _record_fit(self, kind, timing, params, units, sizes=None):
+        _, fold, n_rows = units[0]
+        tracing.record_fit(kind, timing, search=self.method, params=params, fold=fold,
+                           n_rows=n_rows, candidates=[unit[0] for unit in units],
+                           staged_sizes=sizes)
+
+    # Group units by (fold, preprocessor params), fit each preprocessor once and
+    # fit the classifiers on the shared output. Groups are processed at most
+    # max_entries at a time so nothing still needed is evicted mid-rung.
+    def _evaluate_cached(self, X, y, todo):
+        cache = self.transform_cache
+        groups = OrderedDict()
+        for unit in todo:
+            candidate, fold, n_rows = unit
+            params = self._candidates[candidate]
+            head_params = {k: v for k, v in params.items()
+                           if k.split('__')[0] in self._head_steps}
+            tail_params = {k: v for k, v in params.items() if k not in head_params}
+            train, test = self._train_rows(y, fold, n_rows), self._splits[fold][1]
+            key = cache.make_key(self._data_key, train, test, head_params)
+            group = groups.setdefault(key, (head_params, train, test, []))
+            group[3].append((unit, tail_params))
+
+        keys = list(groups)
+        n_fits = 0
+        for start in range(0, len(keys), cache.max_entries):
+            chunk = keys[start:start + cache.max_entries]
+            missing = [key for key in chunk if not cache.lookup(key, uses=len(groups[key][3]))]
+            outputs = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+                delayed(_fit_transform)(self._head, groups[key][0], X, y,
+                                        groups[key][1], groups[key][2])
+                for key in missing)
+            for key, (output, timing) in zip(missing, outputs):
+                cache.put(key, output)
+                head_params, _, _, units = groups[key]
+                self._record_fit('transform', timing, head_params, [unit for unit, _ in units])
+
+            jobs = []
+            for key in chunk:
+                X_train, X_test = cache.get(key)
+                _, train, test, units = groups[key]
+                y_train, y_test = _take(y, train), _take(y, test)
+                jobs.extend((job_units, (params, X_train, y_train, X_test, y_test), sizes)
+                            for params, job_units, sizes in self._staged_jobs(units))
+            results = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+                delayed(_fit_and_score_transformed)(self._tail, *args, self._scorer,
+                                                    self.staged_param, sizes)
+                for _, args, sizes in jobs)
+            for (units, args, sizes), (job_scores, timing) in zip(jobs, results):
+                self._scores.update(zip(units, job_scores))
+                self._record_fit('fit', timing, args[0], units, sizes)
+            n_fits += len(missing) + len(jobs)
+        return n_fits
+
+    # One cv_results_ row per (bracket, rung, candidate) evaluation; the best
+    # candidate is chosen among those scored on the full budget
+    def _build_results(self):
+        self.cv_results_ = {
+            'params': [self._candidates[c] for _, _, c, _, _ in self._rungs],
+            'bracket': [bracket for bracket, _, _, _, _ in self._rungs],
+            'iter': [rung for _, rung, _, _, _ in self._rungs],
+            'n_resources': [budget for _, _, _, budget, _ in self._rungs],
+            'mean_test_score': [mean for _, _, _, _, mean in self._rungs],
+            'std_test_score': [np.std([self._scores[unit] for unit in self._units(c, budget)])
+                               for _, _, c, budget, _ in self._rungs],
+        }
+        finalists = [c for c in sorted(self._history)
+                     if self._history[c][1] == self._max_resource]
+        best = max(finalists, key=lambda c: self._history[c][2])
+        self.best_index_ = next(i for i, (_, _, c, budget, _) in enumerate(self._rungs)
+                                if c == best and budget == self._max_resource)
+        self.best_params_ = self._candidates[best]
+        self.best_score_ = self._history[best][2]
+        self.finalists_ = finalists
+        self.n_candidates_ = len(self._candidates)
+        self.n_splits_ = len(self._splits)
+
+
+# Build the search object for a stage: 'grid' is a plain GridSearchCV (or an
+# exhaustive HalvingSearchCV when a transform cache or staged trees are used),
+# 'halving' / 'hyperband' use HalvingSearchCV (extra keyword arguments such as
+# resource, factor or cache_step are passed through to it). staged_trees=True
+# scores every n_estimators value in the grid from one fit with the largest one.
+# 'tpe' is the resumable PersistentSearchCV (storage, study_name, n_trials and
+# timeout are passed through to it); it has no transform cache or staged trees.
+def make_search(estimator, param_grid, cv, method='grid', scoring='roc_auc',
+                n_jobs=None, verbose=0, transform_cache=None, staged_trees=False, **kwargs):
+    if method == 'tpe':
+        if transform_cache is not None or staged_trees:
+            raise ValueError("The 'tpe' search supports neither transform_cache nor staged_trees")
+        # optuna is only needed for this backend
+        from .persistent_search import PersistentSearchCV
+        return PersistentSearchCV(estimator, param_grid, cv=cv, scoring=scoring,
+                                  n_jobs=n_jobs, verbose=verbose, **kwargs)
+    staged_param = None
+    if staged_trees:
+        staged_param = next((key for key in param_grid if key.split('__')[-1] == 'n_estimators'),
+                            None)
+    if method == 'grid' and transform_cache is None and staged_param is None:
+        return GridSearchCV(estimator, param_grid, cv=cv, scoring=scoring,
+                            n_jobs=n_jobs, verbose=verbose)
+    return HalvingSearchCV(estimator, param_grid, cv=cv, scoring=scoring, method=method,
+                           n_jobs=n_jobs, verbose=verbose, transform_cache=transform_cache,
+                           staged_param=staged_param, **kwargs)
@@ -0,0 +1,181 @@
+######################################## pairwise feature synthesis
+# NumPy replacement for ft.dfs(trans_primitives=['add_numeric',
+# 'multiply_numeric', 'divide_numeric'], max_depth=1): the original columns
+# followed by every a + b and a * b pair and every ordered a / b pair. Each block
+# of pairs that shares a left-hand column is computed with infinities turned
+# into NaN on the spot, so no per-column pandas frames are built along the way.
+#
+# Without pruning every block is written straight into one preallocated float32
+# matrix of all the features. With prune=True the blocks go to a scratch buffer
+# of k - 1 columns (k input columns) and only the columns that survive are
+# copied out, so the unpruned matrix never exists: the peak is the surviving
+# features twice (kept blocks, then the final matrix), plus the scratch block
+# and its float64 standardised copy.
+import warnings
+from itertools import combinations, permutations
+
+import numpy as np
+import pandas as pd
+
+OPERATIONS = {
+    'add': (np.add, '+', True),
+    'multiply': (np.multiply, '*', True),
+    'divide': (np.divide, '/', False),
+}
+
+
+# Feature names in output order; commutative operations only use a < b
+def pairwise_feature_names(columns, operations=('add', 'multiply', 'divide')):
+    names = list(columns)
+    for operation in operations:
+        _, symbol, commutative = OPERATIONS[operation]
+        pairs = combinations(columns, 2) if commutative else permutations(columns, 2)
+        names.extend(f'{a} {symbol} {b}' for a, b in pairs)
+    return names
+
+
+# Right-hand column ranges paired with left-hand column i, in names order
+def _partners(i, k, commutative):
+    if commutative:
+        return [(i + 1, k)]
+    return [(0, i), (i + 1, k)]
+
+
+class _Pruner:
+    # Drops near-constant columns and columns that are a positive affine copy of a
+    # column that was already kept: same missing rows, standardised values equal
+    # to within 10 ** -decimals. Candidates are found from a short random
+    # projection of the standardised column (a copy's projection lies within a
+    # known radius of the original's) and then checked value by value, so float32
+    # rounding cannot hide a copy the way it can with rounded hashes. The kept
+    # columns are held in blocks, one per call of seed / keep.
+    def __init__(self, n_rows, min_std, decimals, n_components=8, random_state=0):
+        self.min_std = min_std
+        self.tol = 10.0 ** -decimals
+        rng = np.random.default_rng(random_state)
+        self.projection = rng.standard_normal((n_rows, n_components)) / np.sqrt(n_rows)
+        # |P' dz| <= |P column| * |dz| and |dz| <= tol * sqrt(rows) for a copy
+        self.radius = self.tol * np.sqrt(n_rows) * np.linalg.norm(self.projection, axis=0)
+        self.sketches = np.empty((0, n_components))
+        self.kept = []  # (block, column of the block, mean, std) per sketch
+        self.blocks = []
+        self.current = None  # the block being pruned, until its survivors are stored
+
+    def _column(self, block, j):
+        return self.current[:, j] if block == len(self.blocks) else self.blocks[block][:, j]
+
+    def _standardise(self, block):
+        # All-NaN columns give NaN statistics and count as constant
+        with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(block, axis=0, dtype=np.float64)
+            std = np.nanstd(block, axis=0, dtype=np.float64)
+        constant = ~(std > self.min_std * np.maximum(np.abs(mean), 1))
+        return constant, mean, np.where(constant, 1, std)
+
+    def _is_copy(self, column, mean, std, sketch):
+        near = np.flatnonzero((np.abs(self.sketches - sketch) <= self.radius).all(axis=1))
+        if not len(near):
+            return False
+        z = (column - mean) / std
+        missing = np.isnan(z)
+        for i in near:
+            block, j, kept_mean, kept_std = self.kept[i]
+            kept = self._column(block, j)
+            if not np.array_equal(missing, np.isnan(kept)):
+                continue
+            kept_z = (kept[~missing] - kept_mean) / kept_std
+            if np.max(np.abs(z[~missing] - kept_z), initial=0) <= self.tol:
+                return True
+        return False
+
+    def _sketch(self, block, mean, std):
+        return np.nan_to_num((block - mean) / std).T @ self.projection
+
+    def _add(self, j, mean, std, sketch):
+        self.sketches = np.vstack([self.sketches, sketch])
+        self.kept.append((len(self.blocks), j, mean, std))
+
+    # Keep every column of block (which is not copied) and compare later columns with it
+    def seed(self, block):
+        constant, mean, std = self._standardise(block)
+        sketches = self._sketch(block, mean, std)
+        for j in np.flatnonzero(~constant):
+            self._add(j, mean[j], std[j], sketches[j])
+        self.blocks.append(block)
+
+    # Store a copy of the columns of block that are not constant or copies, and
+    # return their mask; block itself may be overwritten afterwards
+    def keep(self, block):
+        constant, mean, std = self._standardise(block)
+        sketches = self._sketch(block, mean, std)
+        mask = np.zeros(block.shape[1], dtype=bool)
+        self.current = block
+        for j in range(block.shape[1]):
+            if constant[j] or self._is_copy(block[:, j], mean[j], std[j], sketches[j]):
+                continue
+            mask[j] = True
+            self._add(j, mean[j], std[j], sketches[j])
+        self.current = None
+        # The kept columns are renumbered within the stored copy, in order
+        n_keep = int(mask.sum())
+        first = len(self.kept) - n_keep
+        self.kept[first:] = [(b, rank, m, sd)
+                             for rank, (b, _, m, sd) in enumerate(self.kept[first:])]
+        self.blocks.append(np.asfortranarray(block[:, mask]))
+        return mask
+
+
+# Build the pairwise feature matrix for the given columns of df as a float32
+# DataFrame with df's index. With prune=True near-constant and near-duplicate
+# features are dropped block by block as they are generated.
+def pairwise_features(df, columns, operations=('add', 'multiply', 'divide'),
+                      dtype=np.float32, prune=False, min_std=1e-6, decimals=4):
+    columns = list(columns)
+    names = pairwise_feature_names(columns, operations)
+    # A copy of its own: pandas may hand out a read-only view of its data
+    base = df[columns].to_numpy(dtype=dtype, copy=True)
+    n_rows, k = base.shape
+    base[~np.isfinite(base)] = np.nan
+
+    # Column-major, so every block of pairs is a contiguous slice
+    if prune:
+        # The original columns are kept as they are; pairs are compared with them
+        out = np.empty((n_rows, max(k - 1, 0)), dtype=dtype, order='F')
+        pruner = _Pruner(n_rows, min_std, decimals)
+        pruner.seed(np.asfortranarray(base))
+    else:
+        out = np.empty((n_rows, len(names)), dtype=dtype, order='F')
+        out[:, :k] = base
+    kept = list(range(k))
+
+    position = k
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for operation in operations:
+            ufunc, _, commutative = OPERATIONS[operation]
+            for i in range(k):
+                width = sum(stop - start for start, stop in _partners(i, k, commutative))
+                if width == 0:
+                    continue
+                # The scratch buffer when pruning, the block's place in out otherwise
+                block = out[:, :width] if prune else out[:, position:position + width]
+                offset = 0
+                for start, stop in _partners(i, k, commutative):
+                    ufunc(base[:, i:i + 1], base[:, start:stop],
+                          out=block[:, offset:offset + stop - start])
+                    offset += stop - start
+                block[~np.isfinite(block)] = np.nan
+                if prune:
+                    kept.extend(position + np.flatnonzero(pruner.keep(block)))
+                else:
+                    kept.extend(range(position, position + width))
+                position += width
+
+    if prune:
+        out = np.empty((n_rows, len(kept)), dtype=dtype, order='F')
+        write = 0
+        while pruner.blocks:
+            block = pruner.blocks.pop(0)
+            out[:, write:write + block.shape[1]] = block
+            write += block.shape[1]
+    return pd.DataFrame(out, index=df.index, columns=[names[j] for j in kept], copy=False)
@@ -0,0 +1,132 @@
+######################################## resumable model-based search
+# Replaces the exhaustive grid with an optuna TPE search over the same grid
+# values. Every trial's params, fold scores and fit/score timings are stored in
+# a local SQLite file, so a killed run picks up where it stopped: completed
+# trials count towards the n_trials budget and trials that were running when the
+# process died are retried (up to MAX_RETRIES times each). One search runs per
+# study at a time, so any trial still RUNNING when fit starts was left by a dead
+# process; it is marked failed and its params are queued again, using only
+# stable optuna APIs (tell, enqueue_trial) rather than the experimental
+# heartbeat callbacks. timeout limits the wall-clock time of one run. The
+# study is named after a hash of everything its scores depend on, so a changed
+# dataset, grid, estimator or CV starts a new study rather than resuming stale
+# trials (or failing on the changed distributions).
+# Exposes the same best_params_ / best_score_ / best_estimator_ surface as
+# GridSearchCV.
+import numpy as np
+import optuna
+from joblib import Parallel, delayed, hash as content_hash
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+
+from . import tracing
+from .model_search import _take
+
+MAX_RETRIES = 3
+
+
+# Fit one candidate on one fold and return its score with the timing of the fit
+def _fit_and_score_timed(estimator, params, X, y, train, test, scorer):
+    clock = tracing.FitClock()
+    model = clone(estimator).set_params(**params)
+    model.fit(_take(X, train), _take(y, train))
+    clock.fitted()
+    score = scorer(model, _take(X, test), _take(y, test))
+    return score, clock.stop()
+
+
+class PersistentSearchCV:
+    # storage: path of the SQLite file; study_name: prefix of the study's name in
+    # it, completed by a hash of the estimator, grid, CV, scoring and data (the
+    # full name is study_name_ after fit)
+    def __init__(self, estimator, param_grid, cv, scoring='roc_auc', storage='search_trials.db',
+                 study_name='search', n_trials=200, timeout=None, n_jobs=None, verbose=0,
+                 random_state=1234, refit=True):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.scoring = scoring
+        self.storage = storage
+        self.study_name = study_name
+        self.n_trials = n_trials
+        self.timeout = timeout
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.random_state = random_state
+        self.refit = refit
+
+    def _load_study(self):
+        return optuna.create_study(study_name=self.study_name_,
+                                   storage=f'sqlite:///{self.storage}',
+                                   direction='maximize', load_if_exists=True,
+                                   sampler=optuna.samplers.TPESampler(seed=self.random_state))
+
+    # Fail the trials a killed run left RUNNING and queue their params again
+    def _retry_stale_trials(self, study):
+        stale = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.RUNNING])
+        for trial in stale:
+            study.tell(trial.number, state=optuna.trial.TrialState.FAIL)
+            retries = trial.user_attrs.get('retries', 0)
+            # A trial killed before suggesting its params has nothing to retry
+            if trial.params and retries < MAX_RETRIES:
+                study.enqueue_trial(trial.params, user_attrs={'retries': retries + 1})
+        return len(stale)
+
+    def fit(self, X, y):
+        splits = list(self.cv.split(X, y))
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        grid = {name: list(values) for name, values in self.param_grid.items()}
+        fingerprint = content_hash((self.estimator, grid, self.cv, self.scoring, X, y))
+        self.study_name_ = f'{self.study_name}_{fingerprint[:16]}'
+        study = self._load_study()
+        n_stale = self._retry_stale_trials(study)
+
+        # Previously completed trials, by params, so repeated suggestions are not refitted
+        completed = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.COMPLETE])
+        done = {repr(sorted(trial.params.items())): trial.value for trial in completed}
+        remaining = max(0, self.n_trials - len(completed))
+        if self.verbose:
+            print(f"[{self.study_name_}] {len(completed)} trials already in {self.storage}, "
+                  f"{n_stale} interrupted, running up to {remaining} more")
+
+        def objective(trial):
+            params = {name: trial.suggest_categorical(name, values)
+                      for name, values in grid.items()}
+            key = repr(sorted(params.items()))
+            if key in done:
+                trial.set_user_attr('duplicate', True)
+                return done[key]
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_and_score_timed)(self.estimator, params, X, y, train, test, scorer)
+                for train, test in splits)
+            scores = [float(score) for score, _ in results]
+            for fold, (_, timing) in enumerate(results):
+                tracing.record_fit('fit', timing, search='tpe', params=params, fold=fold,
+                                   trial=trial.number)
+            trial.set_user_attr('fold_scores', scores)
+            trial.set_user_attr('fit_times', [timing['fit_s'] for _, timing in results])
+            trial.set_user_attr('score_times', [timing['score_s'] for _, timing in results])
+            done[key] = float(np.mean(scores))
+            if self.verbose:
+                print(f"[{self.study_name_}] trial {trial.number}: {done[key]:.4f} {params}")
+            return done[key]
+
+        if remaining:
+            study.optimize(objective, n_trials=remaining, timeout=self.timeout)
+
+        self.study_ = study
+        trials = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.COMPLETE])
+        self.cv_results_ = {
+            'params': [trial.params for trial in trials],
+            'mean_test_score': [trial.value for trial in trials],
+            'fold_scores': [trial.user_attrs.get('fold_scores') for trial in trials],
+            'mean_fit_time': [np.mean(trial.user_attrs['fit_times'])
+                              if 'fit_times' in trial.user_attrs else np.nan for trial in trials],
+        }
+        self.best_params_ = study.best_params
+        self.best_score_ = study.best_value
+        self.n_trials_ = len(trials)
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        return self
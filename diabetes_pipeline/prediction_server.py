@@ -0,0 +1,215 @@
+######################################## local prediction server
+# A small asyncio HTTP service (standard library only, bound to localhost) that
+# keeps the scoring artifacts saved by the training script in memory and scores
+# single patients interactively:
+#   POST /predict  one JSON object of raw inputs, or a list of them
+#   GET  /stats    p50 / p99 latency (ms), request count and throughput
+#   GET  /health
+# Concurrent requests are coalesced into micro-batches: the batcher waits at
+# most max_wait_ms after the first queued request (or until max_batch_size
+# rows are waiting) and scores them with one transform + predict_proba call in
+# a worker thread, so the event loop keeps accepting requests meanwhile. Rows
+# are validated before they are queued, and a batch that still fails is scored
+# row by row, so one bad request never fails the requests batched with it.
+#
+#   python -m diabetes_pipeline serve scoring_artifacts.joblib --port 8000 --max-wait-ms 5
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from .batch_scoring import _load_artifacts
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+# Request latencies over a sliding window, plus overall counts
+class LatencyStats:
+    def __init__(self, window=10_000):
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.n_requests = 0
+        self.n_rows = 0
+        self.n_batches = 0
+
+    def record(self, latency, n_rows):
+        self.latencies.append(latency)
+        self.n_requests += 1
+        self.n_rows += n_rows
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'requests': self.n_requests,
+            'rows': self.n_rows,
+            'batches': self.n_batches,
+            'mean_batch_size': self.n_rows / self.n_batches if self.n_batches else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'throughput_rps': self.n_requests / elapsed if elapsed else 0.0,
+            'uptime_s': elapsed,
+        }
+
+
+class PredictionServer:
+    def __init__(self, artifacts_path, host='127.0.0.1', port=8000, max_batch_size=64,
+                 max_wait_ms=5.0, stats_window=10_000):
+        self.artifacts = _load_artifacts(artifacts_path)
+        self.plan = self.artifacts['plan']
+        self.raw_columns = self.plan.raw_columns
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = LatencyStats(stats_window)
+        self._queue = None
+
+    # No DataFrame on this path: the rows go straight into the compiled plan
+    def _predict(self, rows):
+        features = self.plan.transform(np.asarray(rows, dtype=np.float64))
+        return self.artifacts['classifier'].predict_proba(features)[:, 1]
+
+    # Probabilities of the rows of a micro-batch, scored together. If that fails
+    # they are scored one at a time, so only the row that fails gets the
+    # exception and the other requests of the batch still succeed.
+    async def _score(self, rows):
+        loop = asyncio.get_running_loop()
+        try:
+            return list(await loop.run_in_executor(None, self._predict, rows))
+        except Exception as error:
+            if len(rows) == 1:
+                return [error]
+        outcomes = []
+        for row in rows:
+            try:
+                outcomes.append((await loop.run_in_executor(None, self._predict, [row]))[0])
+            except Exception as error:
+                outcomes.append(error)
+        return outcomes
+
+    # Collect queued rows for up to max_wait after the first one, then score them together
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            outcomes = await self._score([row for row, _ in batch])
+            for (_, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(float(outcome))
+            self.stats.n_batches += 1
+
+    # The request's rows are checked and converted to floats before any is
+    # queued, so a bad row fails its own request only
+    async def predict(self, rows):
+        loop = asyncio.get_running_loop()
+        values = []
+        for row in rows:
+            if not isinstance(row, dict):
+                raise TypeError(f"Expected a JSON object per row, got {row!r}")
+            missing = [column for column in self.raw_columns if column not in row]
+            if missing:
+                raise ValueError(f"Missing inputs: {missing}")
+            converted = []
+            for column in self.raw_columns:
+                try:
+                    converted.append(float(row[column]))
+                except (TypeError, ValueError):
+                    raise ValueError(f"Non-numeric input {column}: {row[column]!r}") from None
+            values.append(converted)
+        futures = []
+        for row in values:
+            future = loop.create_future()
+            await self._queue.put((row, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats.summary()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST"}
+
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body)
+            single = isinstance(payload, dict)
+            rows = [payload] if single else payload
+            probabilities = await self.predict(rows)
+        except (ValueError, TypeError) as error:
+            return 400, {'error': str(error)}
+        self.stats.record(time.perf_counter() - start, len(rows))
+        if single:
+            return 200, {'probability': probabilities[0]}
+        return 200, {'probabilities': probabilities}
+
+    # Minimal HTTP/1.1 with keep-alive, enough for local clients and load testers
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, response = await self._route(method, path, body)
+                except Exception as error:
+                    status, response = 500, {'error': repr(error)}
+                data = json.dumps(response).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                             .encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        # Warm up the model so the first request does not pay for it
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._predict, [[1.0] * len(self.raw_columns)])
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"Serving predictions on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
@@ -0,0 +1,102 @@
+######################################## load the data and analyse missingness
+# The first stages of every command: load the data through the columnar store,
+# draw the raw-data figures (the eda command) and test the missingness.
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from . import tracing
+from .data_store import COLUMNS_WITH_ZEROS, COMPACT_SCHEMA, DIABETES_SCHEMA, load_diabetes
+from .missingness import little_mcar_test
+
+
+def load_data(ctx):
+    # The CSV is converted once into typed, memory-mappable column files (with the
+    # zeros in COLUMNS_WITH_ZEROS already stored as NaN); later runs map those files
+    # instead of parsing the CSV, and an edited CSV rebuilds them
+    schema = COMPACT_SCHEMA if ctx.compact else DIABETES_SCHEMA
+    df = load_diabetes(ctx.data_path, ctx.store_dir, schema=schema,
+                       columns_with_zeros=COLUMNS_WITH_ZEROS)
+    print(df.shape)
+    print(df.head(5))
+
+    # Summary statistics
+    print(df.describe())
+
+    # Check for missing values
+    print(df.isnull().sum())
+    return df
+
+
+def analyze_missingness(df, columns_with_zeros, compact=False):
+    # The zeros in columns_with_zeros are already NaN from the data store. Only
+    # columns are added, so the compact mode shares the loaded columns instead of
+    # copying them
+    df = df.copy(deep=not compact)
+    indicator_dtype = np.uint8 if compact else int
+
+    # Calculate percentage of missing values in each column
+    missing_percentage = df[columns_with_zeros].isnull().mean() * 100
+
+    # Create binary indicators for missing data directly within the DataFrame
+    df['Insulin_missing'] = df['Insulin'].isnull().astype(indicator_dtype)
+    df['BMI_missing'] = df['BMI'].isnull().astype(indicator_dtype)
+
+    # Create a contingency table and perform the Chi-square test
+    contingency = pd.crosstab(df['Insulin_missing'], df['BMI_missing'])
+    chi2, p, dof, expected = chi2_contingency(contingency)
+
+    # Perform Little's MCAR test
+    mcar = little_mcar_test(df[columns_with_zeros])
+
+    return df, {'missing_percentage': missing_percentage, 'chi2_p': p,
+                'mcar_chi2': mcar['chi2'], 'mcar_dof': mcar['dof'], 'mcar_p': mcar['p_value']}
+
+
+def report_missingness(missingness):
+    print("Percentage of missing values in each column:")
+    print(missingness['missing_percentage'])
+
+    p = missingness['chi2_p']
+    print(f'Chi-square test results for Insulin vs BMI Missingness: p={p}')
+
+    # Interpretation of the Chi-square test
+    if p < 0.05:
+        print('''There is a statistically significant association between
+          the missingness of Insulin and BMI.''')
+    else:
+        print('''There is no statistically significant association between
+          the missingness of Insulin and BMI.''')
+
+    result = missingness['mcar_p']
+    print(f"Little's MCAR test result: chi2={missingness['mcar_chi2']:.2f}, "
+          f"dof={missingness['mcar_dof']}, p-value={result}")
+
+    # Interpretation of Little's MCAR test
+    if result < 0.05:
+        print('''The data are not missing completely at random (MCAR).
+           There is a pattern to the missingness.''')
+    else:
+        print('''The data are missing completely at random (MCAR).
+          There is no apparent pattern to the missingness.''')
+
+
+# Load the data, draw the raw-data figures and analyse the missingness; returns
+# the frame with the missingness indicators and the test results
+def run(ctx):
+    with tracing.span('load_data'):
+        df = load_data(ctx)
+
+    ctx.render('histograms', 'plot_histograms', df)
+    ctx.render('boxplots', 'plot_boxplots', df)
+    ctx.render('correlation_matrix', 'plot_correlation_matrix', df)
+    ctx.render('pairplot', 'plot_pairplot', df, hue='Outcome')
+    ctx.render('scatter_glucose_bmi', 'plot_scatter', df, 'Glucose', 'BMI', hue='Outcome')
+
+    df, missingness = ctx.checkpoints.run('missingness', analyze_missingness, df,
+                                          COLUMNS_WITH_ZEROS, ctx.compact)
+    report_missingness(missingness)
+
+    # Matrix plot to visualize missing data
+    ctx.render('missing_matrix', 'plot_missing_matrix', df[COLUMNS_WITH_ZEROS])
+    return df, missingness
@@ -0,0 +1,98 @@
+######################################## resource measurement
+# measure() records the wall time, CPU time and peak resident memory (RSS) of a
+# block of code. The peak is sampled from /proc by a background thread every
+# `interval` seconds and includes the direct child processes (joblib / loky
+# workers), so memory allocated by NumPy, XGBoost or a worker pool all counts.
+# Without /proc it falls back to getrusage's process-lifetime maximum, which
+# never goes down between blocks. CPU time is this process's own (all threads);
+# time spent in still-running worker processes is not included.
+import glob
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+_HAS_PROC = os.path.exists('/proc/self/statm')
+
+
+def _rss(pid='self'):
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0  # the process exited between listing and reading
+
+
+def _child_pids():
+    pids = []
+    for path in glob.glob('/proc/self/task/*/children'):
+        try:
+            with open(path) as file:
+                pids.extend(file.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+# Resident memory of this process and its direct children, in bytes
+def current_rss(include_children=True):
+    if not _HAS_PROC:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    rss = _rss()
+    if include_children:
+        rss += sum(_rss(pid) for pid in _child_pids())
+    return rss
+
+
+class _PeakSampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+# Filled in when the measured block exits
+class Measurement:
+    def __init__(self):
+        self.wall_s = None
+        self.cpu_s = None
+        self.start_rss_mb = None
+        self.peak_rss_mb = None
+
+    def as_dict(self):
+        return {'wall_s': self.wall_s, 'cpu_s': self.cpu_s,
+                'start_rss_mb': self.start_rss_mb, 'peak_rss_mb': self.peak_rss_mb}
+
+
+# Memory held by DataFrames / Series, in MB
+def frame_megabytes(*frames):
+    return sum(frame.memory_usage(index=True, deep=True).sum() if hasattr(frame, 'columns')
+               else frame.memory_usage(index=True, deep=True) for frame in frames) / 2 ** 20
+
+
+@contextmanager
+def measure(interval=0.01):
+    result = Measurement()
+    result.start_rss_mb = current_rss() / 2 ** 20
+    sampler = _PeakSampler(interval)
+    sampler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield result
+    finally:
+        result.wall_s = time.perf_counter() - wall
+        result.cpu_s = time.process_time() - cpu
+        result.peak_rss_mb = sampler.stop() / 2 ** 20
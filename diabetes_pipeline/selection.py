@@ -0,0 +1,91 @@
+######################################## select
+# Feature selection on top of the tuned classifier, then the deployable model:
+# the classifier refitted on the optimal features and saved, with the imputers
+# and the compiled feature transform, to scoring_artifacts.joblib.
+import pickle
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
+
+from . import training
+from .batch_scoring import save_scoring_artifacts
+from .data_store import COLUMNS_WITH_ZEROS
+from .feature_selection import select_top_features
+
+# Score the top-n feature subsets ('exhaustive' tries every n, 'coarse_to_fine'
+# and 'bisection' only a fraction of them; patience stops once the AUC plateaus)
+SELECTION_METHOD = 'coarse_to_fine'
+
+
+def select_features(best_classifier, X_train, y_train, selection_method):
+    # Rank features by importance
+    feature_importances = best_classifier.feature_importances_
+    importance_indices = np.argsort(feature_importances)[::-1]
+    sorted_features = X_train.columns[importance_indices]
+
+    stratified_kfold = StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    selection = select_top_features(best_classifier, X_train, y_train, sorted_features,
+                                    cv=stratified_kfold, method=selection_method,
+                                    patience=10, n_jobs=-1, verbose=1)
+    return sorted_features, selection
+
+
+def run(ctx):
+    trained = training.run(ctx)
+    best_classifier = trained['best_classifier']
+    X_train, X_test, y_train = trained['X_train'], trained['X_test'], trained['y_train']
+
+    sorted_features, selection = ctx.checkpoints.run('feature_selection', select_features,
+                                                     best_classifier, X_train, y_train,
+                                                     SELECTION_METHOD)
+
+    # select optimal features
+    max_auc_score = selection['max_auc_score']
+    print(max_auc_score)
+    optimal_features = selection['optimal_features']
+    print(f"Optimal number of features: {optimal_features} with ROC-AUC: {max_auc_score}")
+
+    # Save the AUC scores and optimal features
+    results = {
+        'auc_scores': selection['auc_scores'],
+        'n_features_list': selection['n_features_list'],
+        'optimal_features': optimal_features,
+        'max_auc_score': max_auc_score
+    }
+
+    # Write the dictionary to a pickle file
+    with open('model_results.pkl', 'wb') as file:
+        pickle.dump(results, file)
+
+    print("Results saved successfully.")
+
+    # Subsetting training and testing data with optimal features
+    optimal_feature_names = sorted_features[:optimal_features].tolist()
+    X_train_optimal = X_train[optimal_feature_names]
+    X_test_optimal = X_test[optimal_feature_names]
+
+    print("Number of optimal features:", len(optimal_feature_names))
+    print("Optimal feature names:", optimal_feature_names)
+
+    # The deployed model: the tuned classifier refitted on the optimal features, saved
+    # with the imputers and a compiled transform that computes only those features from
+    # the raw inputs (used by the score and serve commands)
+    scoring_classifier = clone(best_classifier).fit(X_train_optimal, y_train)
+    save_scoring_artifacts('scoring_artifacts.joblib',
+                           trained['imputation_search']['best_preprocessor'],
+                           scoring_classifier,
+                           imputed_columns=trained['full_imputed_df'].columns.drop(training.TARGET),
+                           model_features=optimal_feature_names,
+                           columns_with_zeros=COLUMNS_WITH_ZEROS,
+                           dtype=np.float32 if ctx.compact else np.float64)
+
+    # Calling the function for both train and test datasets
+    ctx.render('train_distributions', 'visualize_distributions', X_train_optimal,
+               "Training Data Distributions")
+    ctx.render('test_distributions', 'visualize_distributions', X_test_optimal,
+               "Testing Data Distributions")
+
+    return dict(trained, sorted_features=sorted_features, selection=selection,
+                optimal_feature_names=optimal_feature_names,
+                X_train_optimal=X_train_optimal, X_test_optimal=X_test_optimal)
@@ -0,0 +1,192 @@
+######################################## run instrumentation
+# Structured timings of a run, instead of the searches' verbose console output.
+# While a trace is open (trace(path), or the --trace option of the stage
+# commands):
+#   span(name)          records the wall time, CPU time and peak RSS of a block
+#                       (profiling.measure); StageCache.run opens one per stage
+#   record_fit(kind)    records one fit a search ran in a worker: which stage,
+#                       candidate, fold and parameters, with the fit and score
+#                       times the worker measured with a FitClock
+# A path ending in .jsonl gets one JSON record per line. Any other path gets a
+# Chrome trace-event file (chrome://tracing, ui.perfetto.dev or speedscope) with
+# the stages on the main process's track and the fits on one track per worker
+# process. Records are flushed as they arrive, so a killed run still leaves a
+# readable file. Without an open trace, span and record_fit do nothing.
+#
+#   python -m diabetes_pipeline select --trace select_trace.json
+#   python -m diabetes_pipeline trace-summary select_trace.json
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from .profiling import measure
+
+# The open Tracer, if any
+_active = None
+
+
+# Timings of one fit, taken inside the worker process that runs it: call fitted()
+# between fitting and scoring, and stop() at the end
+class FitClock:
+    def __init__(self):
+        self.start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self.fit_s = None
+
+    def fitted(self):
+        self.fit_s = time.perf_counter() - self._wall
+
+    def stop(self):
+        wall_s = time.perf_counter() - self._wall
+        fit_s = wall_s if self.fit_s is None else self.fit_s
+        return {'start': self.start, 'wall_s': wall_s, 'fit_s': fit_s, 'score_s': wall_s - fit_s,
+                'cpu_s': time.process_time() - self._cpu, 'pid': os.getpid(),
+                'tid': threading.get_native_id()}
+
+
+class Tracer:
+    def __init__(self, path):
+        self.path = path
+        self.chrome = not str(path).endswith('.jsonl')
+        self._file = open(path, 'w')
+        self._lock = threading.Lock()
+        self._stack = []  # names of the open spans
+        self._named_pids = set()
+        self._n_events = 0
+        if self.chrome:
+            self._file.write('[\n')
+
+    def current(self):
+        return self._stack[-1] if self._stack else None
+
+    def write(self, record):
+        with self._lock:
+            if self.chrome:
+                for event in self._trace_events(record):
+                    separator = ',\n' if self._n_events else ''
+                    self._file.write(separator + json.dumps(event, default=str))
+                    self._n_events += 1
+            else:
+                self._file.write(json.dumps(record, default=str) + '\n')
+            self._file.flush()
+
+    # A complete ('X') event, preceded by a process name the first time a pid appears
+    def _trace_events(self, record):
+        pid = record['pid']
+        if pid not in self._named_pids:
+            self._named_pids.add(pid)
+            label = 'pipeline' if pid == os.getpid() else f'worker {pid}'
+            yield {'ph': 'M', 'name': 'process_name', 'pid': pid, 'args': {'name': label}}
+        args = {key: value for key, value in record.items()
+                if key not in ('type', 'name', 'start', 'wall_s', 'pid', 'tid')}
+        yield {'ph': 'X', 'name': record['name'], 'cat': record['type'],
+               'ts': record['start'] * 1e6, 'dur': record['wall_s'] * 1e6,
+               'pid': pid, 'tid': record['tid'], 'args': args}
+
+    def close(self):
+        if self.chrome:
+            self._file.write('\n]\n')
+        self._file.close()
+
+
+# Open a trace for the duration of the block; a false path traces nothing
+@contextmanager
+def trace(path):
+    global _active
+    if not path:
+        yield None
+        return
+    tracer, previous = Tracer(path), _active
+    _active = tracer
+    try:
+        yield tracer
+    finally:
+        _active = previous
+        tracer.close()
+
+
+# Record the block as one span; extra keyword arguments are stored with it
+@contextmanager
+def span(name, kind='stage', **args):
+    tracer = _active
+    if tracer is None:
+        yield
+        return
+    parent = tracer.current()
+    tracer._stack.append(name)
+    start = time.time()
+    try:
+        with measure() as measurement:
+            yield
+    finally:
+        tracer._stack.pop()
+        tracer.write(dict(type=kind, name=name, parent=parent, start=start, pid=os.getpid(),
+                          tid=threading.get_native_id(), **measurement.as_dict(), **args))
+
+
+# Record a fit timed by a FitClock in a worker; it is attributed to the open span
+def record_fit(kind, timing, **args):
+    tracer = _active
+    if tracer is not None:
+        tracer.write(dict(timing, type='fit', name=kind, stage=tracer.current(), **args))
+
+
+######################################## reading traces
+# The records of a trace file in either format
+def load_trace(path):
+    with open(path) as file:
+        text = file.read()
+    if str(path).endswith('.jsonl'):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    # A run that was killed leaves the event array unterminated
+    text = text.rstrip().rstrip(',')
+    if not text.endswith(']'):
+        text += ']'
+    records = []
+    for event in json.loads(text):
+        if event.get('ph') != 'X':
+            continue
+        records.append(dict(event['args'], type=event['cat'], name=event['name'],
+                            start=event['ts'] / 1e6, wall_s=event['dur'] / 1e6,
+                            pid=event['pid'], tid=event['tid']))
+    return records
+
+
+# Print the stages and the fit groups (stage, kind, estimator, parameters) that
+# took the most time; returns both tables as lists of dicts. The estimator is the
+# model / scaler pair of the model comparison, blank elsewhere.
+def summarize_trace(path, top=15):
+    records = load_trace(path)
+    stages = [record for record in records if record['type'] != 'fit']
+    fit_groups = defaultdict(lambda: {'n_fits': 0, 'wall_s': 0.0, 'fit_s': 0.0,
+                                      'score_s': 0.0, 'cpu_s': 0.0})
+    for record in records:
+        if record['type'] != 'fit':
+            continue
+        estimator = ' '.join(str(record[field]) for field in ('model', 'scaler') if field in record)
+        params = json.dumps(record.get('params'), sort_keys=True, default=str)
+        group = fit_groups[(record.get('stage'), record['name'], estimator, params)]
+        group['n_fits'] += 1
+        for field in ('wall_s', 'fit_s', 'score_s', 'cpu_s'):
+            group[field] += record.get(field) or 0.0
+
+    print(f"{'stage':<28} {'wall s':>9} {'cpu s':>9} {'peak MB':>9}  checkpoint")
+    for record in stages:
+        print(f"{record['name']:<28} {record['wall_s']:9.2f} {record['cpu_s']:9.2f} "
+              f"{record['peak_rss_mb']:9.1f}  {record.get('checkpoint', '')}")
+
+    fits = sorted(({'stage': stage, 'kind': kind, 'estimator': estimator,
+                    'params': json.loads(params), **totals}
+                   for (stage, kind, estimator, params), totals in fit_groups.items()),
+                  key=lambda group: group['wall_s'], reverse=True)
+    print(f"\n{'stage':<24} {'kind':<12} {'fits':>5} {'wall s':>9} {'fit s':>9} "
+          f"{'score s':>8}  estimator / params")
+    for group in fits[:top]:
+        print(f"{str(group['stage']):<24} {group['kind']:<12} {group['n_fits']:>5} "
+              f"{group['wall_s']:9.2f} {group['fit_s']:9.2f} {group['score_s']:8.2f}  "
+              f"{group['estimator']} {group['params']}".rstrip())
+    return stages, fits
@@ -0,0 +1,285 @@
+######################################## train
+# Imputation search, feature synthesis and XGBoost tuning: everything up to the
+# tuned classifier (saved to best_classifier.joblib). Each stage goes through
+# the run's StageCache, so the later commands (select, compare) reuse these
+# results instead of recomputing them. In the compact mode (ctx.compact) the
+# imputed data and the features are float32, the missingness indicators uint8,
+# and the pairwise features are built separately for the train and test rows
+# instead of splitting one full feature matrix into copies.
+import os
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import SimpleImputer, IterativeImputer
+from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+
+from . import preparation
+from .feature_engineering import add_custom_features
+from .imputation import make_knn_imputer
+from .model_search import make_search, TransformCache
+from .pairwise_features import pairwise_features
+from .profiling import frame_megabytes
+
+######################################## imputation search
+# Define columns
+COLUMNS_WITH_LESS_MISSING = ['Glucose', 'BloodPressure', 'BMI']
+COLUMNS_WITH_MORE_MISSING = ['Insulin', 'SkinThickness']
+TARGET = 'Outcome'
+
+# 'grid' scores all 960 candidates on all 10 folds; 'halving' and 'hyperband'
+# drop weak candidates on a few folds and give the full 10 only to the survivors
+SEARCH_METHOD = 'halving'
+
+
+def imputation_search_space():
+    # Prepare imputations for less and more missing data columns
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('less_missing', Pipeline([('imputer', SimpleImputer(strategy='median'))]), COLUMNS_WITH_LESS_MISSING),
+            ('more_missing', Pipeline([('imputer', make_knn_imputer())]), COLUMNS_WITH_MORE_MISSING)
+        ],
+        remainder='passthrough'
+    )
+
+    # Pipeline with classifier
+    pipeline = Pipeline([
+        ('preprocessor', preprocessor),
+        ('classifier', RandomForestClassifier(random_state=1234))
+    ])
+
+    # Parameter grid
+    param_grid = {
+        'preprocessor__more_missing__imputer__n_neighbors': range(1, 11),
+        'preprocessor__less_missing__imputer': [IterativeImputer(max_iter=iter, random_state=1234) for iter in [10, 20, 50, 100]],
+        'classifier__n_estimators': [100, 200, 300, 500],
+        'classifier__max_depth': [5, 10, 20, 30, 50, None]
+    }
+    return pipeline, param_grid
+
+
+def search_imputation(df, pipeline, param_grid, search_method, columns_with_less_missing,
+                      columns_with_more_missing, target, compact=False):
+    # Split dataset
+    X = df.drop(columns=[target])
+    y = df[target]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=123)
+
+    # Grid Search
+    # The imputing preprocessor only depends on its own params and the fold, so it is
+    # fitted once per fold and shared by all 24 classifier settings
+    preprocessor_cache = TransformCache(max_entries=128)
+    cv = StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    # staged_trees: each n_estimators value is scored from one 500-tree forest per fold
+    grid_search = make_search(pipeline, param_grid, cv=cv, method=search_method,
+                              scoring='roc_auc', verbose=10, n_jobs=-1,
+                              transform_cache=preprocessor_cache, staged_trees=True)
+    grid_search.fit(X_train, y_train)
+    print("Preprocessor cache:", preprocessor_cache.stats())
+
+    # Extract the best estimator
+    best_pipeline = grid_search.best_estimator_
+
+    # Get the best preprocessor from the pipeline
+    best_preprocessor = best_pipeline.named_steps['preprocessor']
+
+    # Get the feature names in the correct order
+    feature_names = (columns_with_less_missing +
+                     columns_with_more_missing +
+                     [col for col in df.columns if col not in columns_with_less_missing +
+                      columns_with_more_missing + [target]])
+
+    # Transform both training and test data
+    dtype = np.float32 if compact else np.float64
+    X_train_transformed = best_preprocessor.transform(X_train).astype(dtype, copy=False)
+    X_test_transformed = best_preprocessor.transform(X_test).astype(dtype, copy=False)
+
+    # Create DataFrames for both transformed datasets
+    train_df = pd.DataFrame(X_train_transformed, columns=feature_names, index=X_train.index)
+    test_df = pd.DataFrame(X_test_transformed, columns=feature_names, index=X_test.index)
+
+    # Add the target variable back
+    train_df[target] = y_train
+    test_df[target] = y_test
+
+    # Combine the transformed train and test sets to get the full imputed dataset
+    full_imputed_df = pd.concat([train_df, test_df])
+    if compact:
+        # The preprocessor's output is all float; the indicators go back to uint8
+        indicators = [col for col in full_imputed_df.columns if col.endswith('_missing')]
+        full_imputed_df[indicators] = full_imputed_df[indicators].astype(np.uint8)
+    return {
+        'full_imputed_df': full_imputed_df,
+        'best_preprocessor': best_preprocessor,
+        'best_params': grid_search.best_params_,
+        'best_score': grid_search.best_score_
+    }
+
+
+######################################## feature engineering
+# Generate every pairwise add / multiply / divide feature of the numeric columns
+# (the same features as featuretools DFS with max_depth=1); PRUNE_PAIRWISE drops
+# near-constant and near-duplicate features while they are generated
+PRUNE_PAIRWISE = False
+
+
+def synthesize_features(full_imputed_df, prune_pairwise, target, compact=False):
+    if compact:
+        return _synthesize_features_compact(full_imputed_df, prune_pairwise, target)
+
+    # Check if 'index' column exists, if not, reset index to create one
+    if 'index' not in full_imputed_df.columns:
+        full_imputed_df = full_imputed_df.reset_index(drop=False)
+
+    # Apply custom feature function on a copy of the DataFrame
+    enhanced_df = add_custom_features(full_imputed_df)
+
+    enhanced_df = enhanced_df.set_index('index')
+    pairwise_columns = [col for col in enhanced_df.columns if col != target]
+    feature_matrix = pairwise_features(enhanced_df, pairwise_columns, prune=prune_pairwise)
+
+    # Display the head of the generated feature matrix
+    print(feature_matrix.head())
+
+    # Infinite values from the divisions are already NaN
+    X = feature_matrix
+    y = enhanced_df[target].astype(bool)
+
+    # Split the data into training and testing sets
+    return train_test_split(X, y, test_size=0.2, random_state=1234)
+
+
+# synthesize_features with at most one feature matrix alive: the rows are split
+# first (the same split as above, which only depends on the row count) and the
+# pairwise features are built for each side. With pruning, the features kept
+# are chosen on the training rows.
+def _synthesize_features_compact(full_imputed_df, prune_pairwise, target):
+    # Custom features are added to a shallow copy instead of a full one
+    enhanced_df = full_imputed_df.copy(deep=False)
+    enhanced_df.index = enhanced_df.index.rename('index')
+    enhanced_df = add_custom_features(enhanced_df, copy=False)
+    pairwise_columns = [col for col in enhanced_df.columns if col != target]
+
+    train_rows, test_rows = train_test_split(np.arange(len(enhanced_df)), test_size=0.2,
+                                             random_state=1234)
+    X_train = pairwise_features(enhanced_df.iloc[train_rows], pairwise_columns,
+                                prune=prune_pairwise)
+    X_test = pairwise_features(enhanced_df.iloc[test_rows], pairwise_columns)
+    if prune_pairwise:
+        X_test = X_test[X_train.columns]
+    print(X_train.head())
+
+    y = enhanced_df[target].astype(bool)
+    return X_train, X_test, y.iloc[train_rows], y.iloc[test_rows]
+
+
+######################################## XGBoost tuning
+# The TPE search's SQLite file, study name prefix (a hash of the data, grid and
+# CV completes it) and trial budget
+XGBOOST_STORAGE = 'xgboost_search.db'
+XGBOOST_STUDY = 'xgboost_param_grid'
+XGBOOST_TRIALS = 200
+
+
+def xgboost_search_space():
+    # Setup Stratified K-Fold cross-validation
+    kfold = StratifiedKFold(n_splits=10, shuffle=True, random_state=1234)
+    classifier = XGBClassifier(use_label_encoder=False, eval_metric='logloss')
+
+    # Parameter grid for Grid Search
+    param_grid = {
+        'max_depth': [3, 5, 7],
+        'min_child_weight': [1, 3, 5],
+        'gamma': [0, 0.1, 0.2],
+        'subsample': [0.8, 0.9, 1.0],
+        'colsample_bytree': [0.8, 0.9, 1.0],
+        'n_estimators': [100, 200],
+        'learning_rate': [0.01, 0.1, 0.2]
+    }
+    return classifier, param_grid, kfold
+
+
+def tune_xgboost(classifier, param_grid, X_train, y_train, kfold, storage, study_name, n_trials):
+    # Perform the search: a TPE search over the grid values with every trial stored in
+    # storage, so a killed run resumes where it stopped ('grid' with
+    # staged_trees=True is the exhaustive alternative)
+    grid_search = make_search(classifier, param_grid, cv=kfold, method='tpe',
+                              scoring='roc_auc', n_jobs=-1, verbose=10,
+                              storage=storage, study_name=study_name,
+                              n_trials=n_trials, timeout=None)
+    grid_search.fit(X_train, y_train)
+
+    # Best estimator after grid search
+    best_classifier = grid_search.best_estimator_
+
+    # Cross-validation results
+    cv_results = cross_val_score(best_classifier, X_train, y_train, cv=kfold, scoring='roc_auc')
+
+    # Fit the best classifier to the training data
+    best_classifier.fit(X_train, y_train)
+    return best_classifier, grid_search.best_params_, np.mean(cv_results)
+
+
+def run(ctx):
+    df, missingness = preparation.run(ctx)
+
+    pipeline, param_grid = imputation_search_space()
+    imputation_search = ctx.checkpoints.run('imputation_search', search_imputation, df, pipeline,
+                                            param_grid, SEARCH_METHOD, COLUMNS_WITH_LESS_MISSING,
+                                            COLUMNS_WITH_MORE_MISSING, TARGET, ctx.compact)
+    full_imputed_df = imputation_search['full_imputed_df']
+
+    # Best parameters and score
+    print("Best parameters:", imputation_search['best_params'])
+    print("Best cross-validation score: {:.4f}".format(imputation_search['best_score']))
+    print(full_imputed_df.shape)
+    full_imputed_df.to_pickle('full_imputed_df.pkl')
+
+    # Plotting correlation matrices
+    ctx.render('correlation_best_imputation', 'plot_correlation', full_imputed_df,
+               "Correlation Matrix with Best Imputation")
+
+    X_train, X_test, y_train, y_test = ctx.checkpoints.run(
+        'feature_synthesis', synthesize_features, full_imputed_df, PRUNE_PAIRWISE, TARGET,
+        ctx.compact)
+    print(f"Data held: df {frame_megabytes(df):.1f} MB, full_imputed_df "
+          f"{frame_megabytes(full_imputed_df):.1f} MB, X_train + X_test "
+          f"{frame_megabytes(X_train, X_test):.1f} MB")
+
+    # If you're specifically working with a training set:
+    print("Class distribution in the training dataset (y_train):")
+    print(y_train.value_counts())
+    print("\nPercentage of each class in the training dataset (y_train):")
+    print(y_train.value_counts(normalize=True) * 100)
+
+    classifier, param_grid, kfold = xgboost_search_space()
+    # The study's identity is part of the checkpoint key: its storage file here, and
+    # the data, grid and CV its name is hashed from are arguments already
+    best_classifier, best_params, mean_cv_auc = ctx.checkpoints.run(
+        'xgboost_tuning', tune_xgboost, classifier, param_grid, X_train, y_train, kfold,
+        os.path.abspath(XGBOOST_STORAGE), XGBOOST_STUDY, XGBOOST_TRIALS)
+
+    # Save the model
+    dump(best_classifier, 'best_classifier.joblib')
+
+    print("Average ROC AUC after tuning:", mean_cv_auc)
+
+    # Additional outputs for verification
+    print("Best parameters found:", best_params)
+
+    return {
+        'imputation_search': imputation_search,
+        'full_imputed_df': full_imputed_df,
+        'X_train': X_train,
+        'X_test': X_test,
+        'y_train': y_train,
+        'y_test': y_test,
+        'best_classifier': best_classifier,
+        'best_params': best_params,
+        'mean_cv_auc': mean_cv_auc,
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from diabetes_pipeline.benchmark import SizeRun
+
+
+# The searches must not depend on optuna features that can change between versions
+def pytest_configure(config):
+    config.addinivalue_line('filterwarnings', 'error::optuna.exceptions.ExperimentalWarning')
+
+
+# Scoring artifacts (imputers, pairwise features, XGBoost) fitted on synthetic
+# rows, with the raw CSV they were made from
+@pytest.fixture(scope='session')
+def scoring_run(tmp_path_factory):
+    run = SizeRun(3000, random_state=0, workdir=str(tmp_path_factory.mktemp('scoring')))
+    run.get('artifacts')
+    run.get('csv')
+    return run
+
+
+# Four features with 10% missing values and a target driven by a and b
+@pytest.fixture
+def search_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=list('abcd'))
+    y = pd.Series((X['a'] + X['b'] + rng.normal(size=300) > 0).astype(int))
+    X = X.mask(rng.random(X.shape) < 0.1)
+    return X, y
+
+
+# The searches clone it, so one instance serves every search of a test
+@pytest.fixture
+def search_pipeline():
+    preprocessor = Pipeline([('imputer', SimpleImputer()), ('scaler', StandardScaler())])
+    return Pipeline([('preprocessor', preprocessor),
+                     ('classifier', RandomForestClassifier(random_state=0))])
+
+
+@pytest.fixture
+def param_grid():
+    return {'preprocessor__imputer__strategy': ['mean', 'median'],
+            'classifier__n_estimators': [4, 8, 16],
+            'classifier__max_depth': [2, None]}
+
+
+# Twelve complete features, of which f0, f1 and f2 (in that order) drive the target
+@pytest.fixture
+def selection_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 12)), columns=[f'f{i}' for i in range(12)])
+    y = (X['f0'] + 0.7 * X['f1'] + 0.4 * X['f2'] + rng.normal(size=300) > 0).astype(int)
+    return X, y
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from diabetes_pipeline.batch_scoring import score_file
+
+
+def _score(run, tmp_path, chunk_size):
+    output = tmp_path / f'scores_{chunk_size}.csv'
+    n_rows = score_file(run.get('artifacts'), run.get('csv'), output, chunk_size=chunk_size,
+                        n_jobs=1)
+    assert n_rows == run.n_rows
+    return pd.read_csv(output)
+
+
+@pytest.mark.parametrize('chunk_size', [7, 250, 1000])
+def test_scores_do_not_depend_on_the_chunk_size(scoring_run, tmp_path, chunk_size):
+    whole = _score(scoring_run, tmp_path, scoring_run.n_rows)
+    chunked = _score(scoring_run, tmp_path, chunk_size)
+    np.testing.assert_array_equal(chunked['row'], np.arange(scoring_run.n_rows))
+    np.testing.assert_array_equal(chunked['probability'], whole['probability'])
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from diabetes_pipeline.checkpoints import StageCache
+
+CALLS = []
+
+
+def _stage(df, storage):
+    CALLS.append(storage)
+    return df.sum().sum()
+
+
+def _helper():
+    return 1
+
+
+def test_changed_inputs_invalidate_the_stage(tmp_path):
+    cache = StageCache(tmp_path, verbose=0)
+    df = pd.DataFrame({'a': [1.0, 2.0]})
+    CALLS.clear()
+    cache.run('stage', _stage, df, 'a.db')
+    cache.run('stage', _stage, df.copy(), 'a.db')
+    assert len(CALLS) == 1 and cache.hits == ['stage']
+
+    cache.run('stage', _stage, df.assign(a=[1.0, 3.0]), 'a.db')
+    cache.run('stage', _stage, df, 'b.db')
+    cache.run('stage', _stage, df, 'a.db', depends_on=[_helper])
+    assert len(CALLS) == 4
+
+
+def test_disabled_cache_always_runs(tmp_path):
+    cache = StageCache(tmp_path, enabled=False)
+    CALLS.clear()
+    cache.run('stage', _stage, pd.DataFrame({'a': [1.0]}), 'a.db')
+    cache.run('stage', _stage, pd.DataFrame({'a': [1.0]}), 'a.db')
+    assert len(CALLS) == 2
+
+
+
+# A stage keyed on its module's code: editing a helper module it imports, even
+# inside a function, invalidates the checkpoint
+def test_edited_dependency_invalidates_the_stage(tmp_path, monkeypatch):
+    package = tmp_path / 'stagepkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'helpers.py').write_text('def double(x):\n    return 2 * x\n')
+    (package / 'lazy.py').write_text('OFFSET = 0\n')
+    (package / 'stages.py').write_text(
+        'from .helpers import double\n\n\n'
+        'def stage(x):\n    from . import lazy\n    return double(x) + lazy.OFFSET\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    from stagepkg.stages import stage
+
+    cache = StageCache(tmp_path / 'checkpoints', verbose=0)
+    cache.run('stage', stage, 1)
+    cache.run('stage', stage, 1)
+    assert cache.hits == ['stage'] and cache.misses == ['stage']
+
+    (package / 'helpers.py').write_text('def double(x):\n    return x + x\n')
+    cache.run('stage', stage, 1)
+    (package / 'lazy.py').write_text('OFFSET = 1\n')
+    cache.run('stage', stage, 1)
+    assert cache.misses == ['stage'] * 3
@@ -0,0 +1,23 @@
+import pytest
+
+from diabetes_pipeline import cli, preparation
+from diabetes_pipeline.context import RunContext
+
+
+def _fail(*args):
+    raise ValueError('stage failed')
+
+
+def _fail_to_close(self):
+    raise RuntimeError('figure pool failed')
+
+
+# An error while closing the run context must not replace the stage's own error
+def test_stage_error_survives_a_failing_close(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(preparation, 'run', _fail)
+    monkeypatch.setattr(RunContext, 'close', _fail_to_close)
+    args = cli.build_parser().parse_args(['eda', '--data', str(tmp_path / 'diabetes.csv'),
+                                          '--checkpoint-dir', str(tmp_path / 'checkpoints')])
+    with pytest.raises(ValueError, match='stage failed'):
+        cli._run_stage(args)
+    assert 'figure pool failed' in capsys.readouterr().err
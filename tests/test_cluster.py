@@ -0,0 +1,55 @@
+import math
+import os
+
+import numpy as np
+import pytest
+from joblib import Parallel, delayed
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+from diabetes_pipeline.cluster import start_workers, use_workers
+from diabetes_pipeline.model_search import HalvingSearchCV, TransformCache
+
+
+def _searches(pipeline, param_grid):
+    cv = StratifiedKFold(n_splits=4, shuffle=True, random_state=0)
+    return [GridSearchCV(pipeline, param_grid, cv=cv, scoring='roc_auc', n_jobs=-1),
+            HalvingSearchCV(pipeline, param_grid, cv, factor=2, n_jobs=-1,
+                            transform_cache=TransformCache(),
+                            staged_param='classifier__n_estimators')]
+
+
+def test_workers_match_local_run(search_data, search_pipeline, param_grid):
+    X, y = search_data
+    local = [search.fit(X, y) for search in _searches(search_pipeline, param_grid)]
+    with use_workers('2'):
+        remote = [search.fit(X, y) for search in _searches(search_pipeline, param_grid)]
+        pids = Parallel(n_jobs=-1)(delayed(os.getpid)() for _ in range(8))
+    assert os.getpid() not in pids
+    for expected, search in zip(local, remote):
+        np.testing.assert_array_equal(search.cv_results_['mean_test_score'],
+                                      expected.cv_results_['mean_test_score'])
+        assert search.best_params_ == expected.best_params_
+
+
+# An exception raised by a call is raised by Parallel, not retried
+def test_call_errors_are_raised():
+    with use_workers('1'):
+        with pytest.raises(ValueError, match='math domain error'):
+            Parallel(n_jobs=-1)(delayed(math.sqrt)(x) for x in [4, -1, 9])
+
+
+# The batches of a worker that dies go to the remaining workers
+def test_lost_worker_batches_are_retried():
+    processes, addresses = start_workers(2, authkey='test-key')
+    try:
+        spec = ','.join(f'{host}:{port}' for host, port in addresses)
+        with use_workers(spec, authkey='test-key'):
+            processes[0].kill()
+            processes[0].wait()
+            results = Parallel(n_jobs=-1, batch_size=1)(delayed(math.sqrt)(x)
+                                                        for x in range(20))
+        assert results == [math.sqrt(x) for x in range(20)]
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
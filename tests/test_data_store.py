@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from diabetes_pipeline.data_store import DIABETES_SCHEMA, ingest_csv, load_store
+
+
+def _frame(n_rows=50):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({column: rng.integers(0, 5, n_rows) for column in DIABETES_SCHEMA})
+    frame['Outcome'] = rng.integers(0, 2, n_rows)
+    return frame
+
+
+def _ingest(tmp_path, text):
+    csv_path = tmp_path / 'diabetes.csv'
+    csv_path.write_text(text)
+    meta = ingest_csv(csv_path, tmp_path / 'store', chunk_size=7)
+    return meta, load_store(tmp_path / 'store')
+
+
+def test_trailing_blank_line(tmp_path):
+    frame = _frame()
+    meta, stored = _ingest(tmp_path, frame.to_csv(index=False) + '\n')
+    assert meta['n_rows'] == len(frame)
+    np.testing.assert_array_equal(stored['Age'], frame['Age'])
+
+
+def test_quoted_newline(tmp_path):
+    frame = _frame()
+    lines = frame.to_csv(index=False).splitlines()
+    # A quoted value spanning two lines is still one row
+    values = lines[3].split(',')
+    values[0] = f'"{values[0]}\n"'
+    lines[3] = ','.join(values)
+    meta, stored = _ingest(tmp_path, '\n'.join(lines) + '\n')
+    assert meta['n_rows'] == len(frame)
+    np.testing.assert_array_equal(stored['Pregnancies'], frame['Pregnancies'])
+    np.testing.assert_array_equal(stored['Outcome'], frame['Outcome'])
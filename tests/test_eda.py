@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+import pytest
+
+from diabetes_pipeline.eda import FigureRenderer, visualize_distributions
+
+
+def _broken_figure(df):
+    raise RuntimeError("cannot draw")
+
+
+def test_headless_figures_saved(tmp_path):
+    renderer = FigureRenderer(mode='headless', output_dir=tmp_path, n_workers=1)
+    renderer.render('distributions', visualize_distributions, pd.DataFrame({'a': [1, 2, 3]}),
+                    "Distributions")
+    paths = renderer.close()
+    assert paths == [os.path.join(tmp_path, 'distributions.png')]
+    assert os.path.exists(paths[0])
+
+
+def test_failed_figure_shuts_the_pool_down(tmp_path):
+    renderer = FigureRenderer(mode='headless', output_dir=tmp_path, n_workers=1)
+    renderer.render('broken', _broken_figure, pd.DataFrame({'a': [1, 2, 3]}))
+    executor = renderer._executor
+    with pytest.raises(RuntimeError, match="cannot draw"):
+        renderer.close()
+    assert renderer._executor is None
+    assert executor._flags.shutdown
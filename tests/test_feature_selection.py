@@ -0,0 +1,39 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+from diabetes_pipeline.feature_selection import select_top_features
+
+
+def _cv():
+    return StratifiedKFold(n_splits=4, shuffle=True, random_state=0)
+
+
+# The original loop: cross_val_score on the top n columns for every n
+def test_exhaustive_matches_cross_val_score(selection_data):
+    X, y = selection_data
+    sorted_features = list(X.columns)
+    result = select_top_features(LogisticRegression(), X, y, sorted_features, _cv())
+    assert result['n_features_list'] == list(range(1, len(sorted_features) + 1))
+    expected = [cross_val_score(LogisticRegression(), X[sorted_features[:n]], y, cv=_cv(),
+                                scoring='roc_auc').mean()
+                for n in result['n_features_list']]
+    np.testing.assert_allclose(result['auc_scores'], expected, rtol=1e-12)
+    assert result['max_auc_score'] == max(result['auc_scores'])
+
+
+# The faster searches only evaluate some n, each with the exhaustive score
+def test_searches_score_like_exhaustive(selection_data):
+    X, y = selection_data
+    sorted_features = list(X.columns)
+    exhaustive = select_top_features(LogisticRegression(), X, y, sorted_features, _cv())
+    scores = dict(zip(exhaustive['n_features_list'], exhaustive['auc_scores']))
+    for options in ({'method': 'coarse_to_fine', 'coarse_points': 4, 'refine_factor': 2},
+                    {'method': 'bisection'},
+                    {'method': 'exhaustive', 'patience': 3}):
+        result = select_top_features(LogisticRegression(), X, y, sorted_features, _cv(),
+                                     **options)
+        assert len(result['n_features_list']) <= len(scores)
+        for n, score in zip(result['n_features_list'], result['auc_scores']):
+            assert score == scores[n]
+        assert result['optimal_features'] in result['n_features_list']
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import make_scorer, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.pipeline import make_pipeline
+
+from diabetes_pipeline.imputation import (ImputerCache, evaluate_imputation_methods,
+                                          impute_data, make_imputer)
+
+STRATEGIES = ['mean', 'median', 'knn']
+
+
+def _data(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, 4)), columns=list('abcd'))
+    y = (X['a'] + X['b'] + rng.normal(size=n_rows) > 0).astype(int)
+    return X.mask(rng.random(X.shape) < 0.15), y
+
+
+def _cv():
+    return StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+
+
+# 'fold' mode fits each imputer on the training fold only, like an imputer +
+# classifier pipeline under cross_val_score
+def test_fold_mode_matches_pipeline_cross_validation():
+    X, y = _data()
+    scorer = make_scorer(roc_auc_score, response_method='predict_proba')
+    performance = evaluate_imputation_methods(X, y, STRATEGIES, scorer, cv=_cv(), mode='fold')
+    for strategy in STRATEGIES:
+        pipeline = make_pipeline(make_imputer(strategy),
+                                 RandomForestClassifier(random_state=1234))
+        expected = cross_val_score(pipeline, X, y, cv=_cv(), scoring=scorer).mean()
+        np.testing.assert_allclose(performance[strategy], expected, rtol=1e-12)
+
+
+# The evaluation fits imputers on the folds only; impute_data fits the chosen
+# strategy on the whole training set once, and a hit is counted only when a
+# cached fit is reused
+def test_cache_counts_only_reused_fits():
+    X, y = _data()
+    X_train, X_test = X.iloc[:150], X.iloc[150:]
+    cache = ImputerCache()
+    scorer = make_scorer(roc_auc_score, response_method='predict_proba')
+    n_fits = len(STRATEGIES) * _cv().get_n_splits()
+    first = evaluate_imputation_methods(X_train, y.iloc[:150], STRATEGIES, scorer, cv=_cv(),
+                                        mode='fold', cache=cache)
+    assert cache.stats() == {'hits': 0, 'misses': n_fits, 'size': n_fits}
+
+    for repeat in range(2):
+        train_imputed, test_imputed = impute_data(X_train, X_test, strategy='knn', cache=cache)
+        expected_train, expected_test = impute_data(X_train, X_test, strategy='knn')
+        np.testing.assert_array_equal(train_imputed, expected_train)
+        np.testing.assert_array_equal(test_imputed, expected_test)
+    assert cache.stats() == {'hits': 1, 'misses': n_fits + 1, 'size': n_fits + 1}
+
+    again = evaluate_imputation_methods(X_train, y.iloc[:150], STRATEGIES, scorer, cv=_cv(),
+                                        mode='fold', cache=cache)
+    assert again == first
+    assert cache.stats() == {'hits': n_fits + 1, 'misses': n_fits + 1, 'size': n_fits + 1}
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from diabetes_pipeline import training
+from diabetes_pipeline.batch_scoring import MISSING_INDICATORS
+from diabetes_pipeline.data_store import COLUMNS_WITH_ZEROS
+from diabetes_pipeline.feature_engineering import add_custom_features
+from diabetes_pipeline.inference_plan import compile_plan
+from diabetes_pipeline.pairwise_features import pairwise_features
+
+
+# The pandas path the plan was compiled from: impute, custom features, pairwise
+# features, then the model's columns
+def _pandas_features(run, preprocessor, imputed_columns):
+    X, _ = run.get('prepared')
+    imputed = pd.DataFrame(preprocessor.transform(X), columns=imputed_columns, index=X.index)
+    enhanced = add_custom_features(imputed)
+    return pairwise_features(enhanced, enhanced.columns)
+
+
+def _imputed_columns(preprocessor):
+    return [name.split('__', 1)[1] for name in preprocessor.get_feature_names_out()]
+
+
+def test_plan_matches_pandas_path(scoring_run):
+    artifacts = load(scoring_run.get('artifacts'))
+    plan = artifacts['plan']
+    expected = _pandas_features(scoring_run, artifacts['preprocessor'],
+                                _imputed_columns(artifacts['preprocessor']))
+    expected = expected[artifacts['model_features']].to_numpy()
+    raw = scoring_run.get('raw')[plan.raw_columns].to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(plan.transform(raw), expected)
+
+
+# Every feature the pairwise step can produce, not only the model's selection
+def test_plan_matches_pandas_path_for_all_features(scoring_run):
+    preprocessor = load(scoring_run.get('artifacts'))['preprocessor']
+    imputed_columns = _imputed_columns(preprocessor)
+    expected = _pandas_features(scoring_run, preprocessor, imputed_columns)
+    plan = compile_plan(preprocessor, imputed_columns, list(expected.columns),
+                        add_custom_features, COLUMNS_WITH_ZEROS, MISSING_INDICATORS)
+    raw = scoring_run.get('raw')[plan.raw_columns]
+    np.testing.assert_array_equal(plan.transform(raw.to_numpy(dtype=np.float64)),
+                                  expected.to_numpy())
+    records = raw.iloc[:20].to_dict('records')
+    np.testing.assert_array_equal(plan.transform_records(records), plan.transform(raw.iloc[:20]))
+
+
+
+# The compact mode casts the imputed columns to float32 before the custom
+# features; a plan compiled with that dtype scores the features it was trained on
+def test_plan_matches_compact_training(scoring_run):
+    preprocessor = load(scoring_run.get('artifacts'))['preprocessor']
+    imputed_columns = _imputed_columns(preprocessor)
+    X, y = scoring_run.get('prepared')
+    X = X.astype(np.float32)
+    # As search_imputation builds full_imputed_df in the compact mode
+    imputed = pd.DataFrame(preprocessor.transform(X).astype(np.float32),
+                           columns=imputed_columns, index=X.index)
+    indicators = [column for column in imputed_columns if column.endswith('_missing')]
+    imputed[indicators] = imputed[indicators].astype(np.uint8)
+    imputed[training.TARGET] = y
+    X_train, _, _, _ = training._synthesize_features_compact(imputed, False, training.TARGET)
+
+    plan = compile_plan(preprocessor, imputed_columns, list(X_train.columns),
+                        add_custom_features, COLUMNS_WITH_ZEROS, MISSING_INDICATORS,
+                        dtype=np.float32)
+    raw = X.loc[X_train.index, plan.raw_columns].to_numpy(dtype=np.float64)
+    # Exact: a float64 plan differs in the last float32 bit of ~7% of the values
+    np.testing.assert_array_equal(plan.transform(raw), X_train.to_numpy())
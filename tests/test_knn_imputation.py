@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.impute import KNNImputer
+
+from diabetes_pipeline.benchmark import synthetic_diabetes
+from diabetes_pipeline.data_store import COLUMNS_WITH_ZEROS
+from diabetes_pipeline.imputation import make_imputer, make_knn_imputer
+from diabetes_pipeline.knn_imputation import ApproximateKNNImputer
+
+
+# Integer-valued columns, so many donors are equally distant
+def _tied_data(n_rows=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 8, size=(n_rows, 5)).astype(float)
+    X[:, 4] = rng.integers(20, 300, size=n_rows)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    return X
+
+
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+@pytest.mark.parametrize('chunk', [7, 40, 500])
+def test_transform_does_not_depend_on_the_batch(weights, chunk):
+    X = _tied_data()
+    imputer = ApproximateKNNImputer(n_neighbors=5, weights=weights).fit(X)
+    chunks = [imputer.transform(X[start:start + chunk]) for start in range(0, len(X), chunk)]
+    np.testing.assert_array_equal(imputer.transform(X), np.vstack(chunks))
+
+
+# With a single incomplete column every donor is complete, so the neighbours are
+# the ones KNNImputer finds
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+def test_matches_knn_imputer_with_complete_donors(weights):
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2000, 4))
+    X[rng.random(len(X)) < 0.3, 2] = np.nan
+    expected = KNNImputer(n_neighbors=5, weights=weights).fit_transform(X)
+    result = ApproximateKNNImputer(n_neighbors=5, weights=weights).fit(X).transform(X)
+    np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+
+def test_column_without_donors_gets_the_training_mean():
+    X = np.array([[1.0, np.nan], [2.0, 4.0], [np.nan, 6.0]])
+    result = ApproximateKNNImputer(n_neighbors=2).fit(X).transform(np.array([[np.nan, np.nan]]))
+    np.testing.assert_allclose(result, [[1.5, 5.0]])
+
+
+def _pima_like(n_rows=768, seed=0):
+    df = synthetic_diabetes(n_rows, random_state=seed)
+    df[COLUMNS_WITH_ZEROS] = df[COLUMNS_WITH_ZEROS].replace(0, np.nan)
+    return df.drop(columns='Outcome')
+
+
+# The KD-tree queries run on n_jobs threads without changing any value
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_n_jobs_does_not_change_the_result(n_jobs):
+    X = _pima_like()
+    expected = ApproximateKNNImputer().fit(X).transform(X)
+    imputer = make_knn_imputer(backend='approximate', n_jobs=n_jobs)
+    assert imputer.n_jobs == n_jobs
+    np.testing.assert_array_equal(imputer.fit(X).transform(X), expected)
+
+
+# With incomplete donors the approximate imputer picks other neighbours than
+# KNNImputer, so the pipelines keep KNNImputer unless asked otherwise
+def test_pima_like_data_keeps_the_exact_imputer():
+    X = _pima_like()
+    assert isinstance(make_knn_imputer(), KNNImputer)
+    assert isinstance(make_imputer('knn'), KNNImputer)
+    exact = KNNImputer().fit_transform(X)
+    approximate = ApproximateKNNImputer().fit(X).transform(X)
+    assert not np.allclose(exact, approximate)
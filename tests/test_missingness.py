@@ -0,0 +1,86 @@
+import numpy as np
+from scipy.stats import chi2
+
+from diabetes_pipeline.missingness import little_mcar_test
+
+
+def _data(n_rows=400, mar=False, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.multivariate_normal([1, 2, 3, 4, 5], np.eye(5) + 0.5, size=n_rows)
+    missing = rng.random(values.shape) < 0.15
+    if mar:
+        # Column 1 goes missing when column 0 is large
+        missing[:, 1] |= values[:, 0] > 1.5
+    missing[:, 0] = False
+    values[missing] = np.nan
+    return values
+
+
+# Row-by-row EM and Little's d2 pattern by pattern, with the same start and
+# stopping rule as little_mcar_test
+def _reference(values, max_iter=200, tol=1e-6):
+    observed = ~np.isnan(values)
+    values, observed = values[observed.any(axis=1)], observed[observed.any(axis=1)]
+    n_rows, n_columns = values.shape
+    mu = np.nanmean(values, axis=0)
+    S = np.diag(np.nanmean(values ** 2, axis=0) - mu ** 2)
+    for _ in range(max_iter):
+        filled = values.copy()
+        correction = np.zeros((n_columns, n_columns))
+        for row, o in zip(filled, observed):
+            m = ~o
+            if not m.any():
+                continue
+            B = np.linalg.solve(S[np.ix_(o, o)], S[np.ix_(o, m)])
+            row[m] = mu[m] + (row[o] - mu[o]) @ B
+            correction[np.ix_(m, m)] += S[np.ix_(m, m)] - S[np.ix_(m, o)] @ B
+        new_mu = filled.mean(axis=0)
+        new_S = (filled.T @ filled + correction) / n_rows - np.outer(new_mu, new_mu)
+        change = max(np.max(np.abs(new_mu - mu)), np.max(np.abs(new_S - S)))
+        scale = max(np.max(np.abs(new_mu)), np.max(np.abs(new_S)), 1.0)
+        mu, S = new_mu, new_S
+        if change <= tol * scale:
+            break
+
+    statistic, dof = 0.0, -n_columns
+    for pattern in np.unique(observed, axis=0):
+        rows = (observed == pattern).all(axis=1)
+        diff = values[rows][:, pattern].mean(axis=0) - mu[pattern]
+        statistic += rows.sum() * diff @ np.linalg.solve(S[np.ix_(pattern, pattern)], diff)
+        dof += pattern.sum()
+    return statistic, dof, chi2.sf(statistic, dof), mu, S
+
+
+def test_matches_reference():
+    for mar in (False, True):
+        values = _data(mar=mar)
+        result = little_mcar_test(values)
+        statistic, dof, p_value, mu, S = _reference(values)
+        np.testing.assert_allclose(result['mean'], mu, rtol=1e-10)
+        np.testing.assert_allclose(result['covariance'], S, rtol=1e-9)
+        np.testing.assert_allclose(result['chi2'], statistic, rtol=1e-9)
+        assert result['dof'] == dof
+        np.testing.assert_allclose(result['p_value'], p_value, rtol=1e-6)
+    # The MAR data are detected, the MCAR data are not
+    assert little_mcar_test(_data(mar=True))['p_value'] < 0.01
+    assert little_mcar_test(_data())['p_value'] > 0.01
+
+
+# Rare patterns (summed in chunks of outer products) and frequent ones (one matrix
+# product) give the same statistic
+def test_rare_and_frequent_patterns_agree(monkeypatch):
+    values = _data(n_rows=2000, seed=1)
+    frequent = little_mcar_test(values)
+    monkeypatch.setattr('diabetes_pipeline.missingness._DENSE_PATTERN_ROWS', 10 ** 9)
+    monkeypatch.setattr('diabetes_pipeline.missingness._OUTER_CHUNK_BYTES', 4096)
+    rare = little_mcar_test(values)
+    np.testing.assert_allclose(rare['chi2'], frequent['chi2'], rtol=1e-10)
+    np.testing.assert_allclose(rare['covariance'], frequent['covariance'], rtol=1e-10)
+
+
+def test_rows_without_observed_values_are_dropped():
+    values = _data()
+    with_empty = np.vstack([values, np.full((5, values.shape[1]), np.nan)])
+    result = little_mcar_test(with_empty)
+    assert result['n_rows'] == len(values)
+    assert result['chi2'] == little_mcar_test(values)['chi2']
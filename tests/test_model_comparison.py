@@ -0,0 +1,46 @@
+import gc
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from diabetes_pipeline.model_comparison import compare_models
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 5))
+    y = (X[:, 0] + X[:, 1] + rng.normal(size=300) > 0).astype(int)
+    return X[:200], y[:200], X[200:], y[200:]
+
+
+def _compare(tmp_path, **options):
+    X_train, y_train, X_test, y_test = _data()
+    models = {'Logistic_Regression': LogisticRegression()}
+    scalers = {'standard': StandardScaler(), 'minmax': MinMaxScaler()}
+    grid = {'Logistic_Regression': {'classifier__C': [0.01, 1.0]}}
+    cv = StratifiedKFold(n_splits=4, shuffle=True, random_state=0)
+    rows = list(compare_models(models, scalers, grid, X_train, y_train, X_test, y_test, cv,
+                               temp_folder=tmp_path, **options))
+    return {row['Scaler']: row for row in rows}, scalers, cv
+
+
+def test_matches_grid_search(tmp_path):
+    rows, scalers, cv = _compare(tmp_path, n_workers=2)
+    X_train, y_train, _, _ = _data()
+    for name, scaler in scalers.items():
+        search = GridSearchCV(Pipeline([('scaler', scaler), ('classifier', LogisticRegression())]),
+                              {'classifier__C': [0.01, 1.0]}, cv=cv, scoring='roc_auc')
+        search.fit(X_train, y_train)
+        assert np.isclose(rows[name]['Best Score (ROC-AUC)'], search.best_score_, rtol=1e-12)
+        assert rows[name]['Best Params'] == {'classifier__C': search.best_params_['classifier__C']}
+
+
+def test_fold_store_not_kept_mapped(tmp_path):
+    # With one worker the combinations run in this process
+    _compare(tmp_path, n_workers=1)
+    gc.collect()
+    with open('/proc/self/maps') as maps:
+        assert str(tmp_path) not in maps.read()
@@ -0,0 +1,98 @@
+from itertools import product
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+from xgboost import XGBClassifier
+
+from diabetes_pipeline.model_search import (HalvingSearchCV, TransformCache, make_search,
+                                            truncate_ensemble)
+
+
+def _grid_scores(pipeline, param_grid, X, y, cv):
+    search = GridSearchCV(pipeline, param_grid, cv=cv, scoring='roc_auc').fit(X, y)
+    return {repr(sorted(params.items())): score for params, score in
+            zip(search.cv_results_['params'], search.cv_results_['mean_test_score'])}, search
+
+
+# Staged trees and the transform cache change how the fits are shared, not the scores
+def test_grid_with_staged_trees_matches_grid_search(search_data, search_pipeline, param_grid):
+    X, y = search_data
+    cv = StratifiedKFold(n_splits=4, shuffle=True, random_state=0)
+    expected, reference = _grid_scores(search_pipeline, param_grid, X, y, cv)
+    search = make_search(search_pipeline, param_grid, cv, method='grid', staged_trees=True,
+                         transform_cache=TransformCache()).fit(X, y)
+    assert isinstance(search, HalvingSearchCV)
+    scores = {repr(sorted(params.items())): score for params, score in
+              zip(search.cv_results_['params'], search.cv_results_['mean_test_score'])}
+    assert scores.keys() == expected.keys()
+    for key, score in scores.items():
+        np.testing.assert_allclose(score, expected[key], rtol=1e-12)
+    assert search.best_params_ == reference.best_params_
+
+
+# Every candidate that reaches the full budget scores as in GridSearchCV
+def test_halving_and_hyperband_finalists_match_grid_search(search_data, search_pipeline,
+                                                           param_grid):
+    X, y = search_data
+    cv = StratifiedKFold(n_splits=6, shuffle=True, random_state=0)
+    expected, _ = _grid_scores(search_pipeline, param_grid, X, y, cv)
+    for method, staged_trees in product(('halving', 'hyperband'), (False, True)):
+        search = make_search(search_pipeline, param_grid, cv, method=method, factor=2,
+                             staged_trees=staged_trees).fit(X, y)
+        finalists = [i for i, n in enumerate(search.cv_results_['n_resources']) if n == 6]
+        assert finalists
+        for i in finalists:
+            key = repr(sorted(search.cv_results_['params'][i].items()))
+            np.testing.assert_allclose(search.cv_results_['mean_test_score'][i], expected[key],
+                                       rtol=1e-12)
+        np.testing.assert_allclose(search.best_score_,
+                                   expected[repr(sorted(search.best_params_.items()))])
+
+
+def test_truncated_xgboost_matches_smaller_model(search_data):
+    X, y = search_data
+    full = XGBClassifier(n_estimators=20, max_depth=2).fit(X, y)
+    small = XGBClassifier(n_estimators=8, max_depth=2).fit(X, y)
+    truncated = truncate_ensemble(full, 'n_estimators', 8)
+    np.testing.assert_allclose(truncated.predict_proba(X), small.predict_proba(X), rtol=1e-6)
+
+
+# A cache smaller than the search's working set: entries that hit must not be
+# evicted by the misses of the same chunk
+def test_small_transform_cache_with_hyperband(search_data, search_pipeline):
+    X, y = search_data
+    grid = {'preprocessor__imputer__strategy': ['mean', 'median', 'most_frequent'],
+            'classifier__n_estimators': [5, 10],
+            'classifier__max_depth': [2, 4, None]}
+    cv = StratifiedKFold(n_splits=6, shuffle=True, random_state=0)
+    cache = TransformCache(max_entries=5)
+    search = HalvingSearchCV(search_pipeline, grid, cv, method='hyperband', factor=2,
+                             transform_cache=cache, random_state=0).fit(X, y)
+    uncached = HalvingSearchCV(search_pipeline, grid, cv, method='hyperband', factor=2,
+                               random_state=0).fit(X, y)
+    assert cache.stats()['evictions'] > 0
+    np.testing.assert_allclose(search.cv_results_['mean_test_score'],
+                               uncached.cv_results_['mean_test_score'])
+    assert search.best_params_ == uncached.best_params_
+
+
+# A hyperband bracket can draw a candidate that an earlier bracket already scored
+# on the full budget; it must stay a finalist
+def test_hyperband_keeps_full_budget_candidates(search_data):
+    X, y = search_data
+    X = X.fillna(0)
+    cv = StratifiedKFold(n_splits=9, shuffle=True, random_state=0)
+    grid = {'C': list(np.logspace(-3, 3, 27))}
+    for seed in range(6):
+        search = HalvingSearchCV(LogisticRegression(), grid, cv, method='hyperband',
+                                 random_state=seed).fit(X, y)
+        full_budget = {repr(params) for params, n in zip(search.cv_results_['params'],
+                                                         search.cv_results_['n_resources'])
+                       if n == 9}
+        assert {repr(search._candidates[c]) for c in search.finalists_} == full_budget
+        best = max(score for score, n in zip(search.cv_results_['mean_test_score'],
+                                              search.cv_results_['n_resources']) if n == 9)
+        assert search.best_score_ == best
+        assert search.cv_results_['mean_test_score'][search.best_index_] == best
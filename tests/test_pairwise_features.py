@@ -0,0 +1,72 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from diabetes_pipeline.pairwise_features import pairwise_feature_names, pairwise_features
+
+
+def _frame(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, 4)), columns=['a', 'b', 'c', 'd'])
+    df.loc[::7, 'b'] = 0.0  # divisions by zero
+    df.loc[::11, 'c'] = np.nan
+    return df
+
+
+# One pandas column at a time, as the featuretools primitives computed them (on
+# the float32 columns)
+def _reference(df, columns):
+    df = df[columns].astype(np.float32)
+    features = {}
+    for name in pairwise_feature_names(columns):
+        if name in df:
+            values = df[name]
+        else:
+            left, symbol, right = name.split(' ')
+            values = {'+': df[left] + df[right], '*': df[left] * df[right],
+                      '/': df[left] / df[right]}[symbol]
+        features[name] = values.where(np.isfinite(values))
+    return pd.DataFrame(features)
+
+
+def test_matches_reference():
+    df = _frame()
+    features = pairwise_features(df, df.columns)
+    expected = _reference(df, list(df.columns))
+    assert list(features.columns) == list(expected.columns)
+    assert features.index.equals(df.index)
+    np.testing.assert_array_equal(features.to_numpy(), expected.to_numpy())
+
+
+# Pruning applies to the generated pairs; the original columns are always kept
+def test_prune_drops_constant_and_duplicate_pairs():
+    df = _frame()
+    df['e'] = 3.0
+    df['f'] = df['a'] * df['b']
+    pruned = pairwise_features(df, df.columns, prune=True)
+    assert list(pruned.columns[:6]) == list(df.columns)
+    # Affine copies of a, and a copy of the column f
+    for name in ('a + e', 'a * e', 'a / e', 'a * b'):
+        assert name not in pruned
+    assert 'a + b' in pruned and 'a / b' in pruned
+    full = pairwise_features(df, df.columns)
+    np.testing.assert_array_equal(pruned.to_numpy(), full[pruned.columns].to_numpy())
+
+
+# Positive multiples of one column: every sum is a copy of a, every product a
+# copy of a * a and every ratio constant, so 31 of 1770 features survive and the
+# unpruned matrix must never be allocated
+def test_prune_does_not_allocate_the_unpruned_matrix():
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=5000)
+    df = pd.DataFrame({f'x{j}': a * (j + 1) for j in range(30)})
+    unpruned_bytes = len(df) * len(pairwise_feature_names(df.columns)) * 4
+    tracemalloc.start()
+    try:
+        pruned = pairwise_features(df, df.columns, prune=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert pruned.shape == (5000, 31)
+    assert peak < unpruned_bytes / 4
@@ -0,0 +1,72 @@
+import numpy as np
+import optuna
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+
+from diabetes_pipeline.model_search import TransformCache, make_search
+from diabetes_pipeline.persistent_search import PersistentSearchCV
+
+
+def _data(seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=list('abc'))
+    y = pd.Series((X['a'] + rng.normal(size=len(X)) > 0).astype(int))
+    return X, y
+
+
+def _search(storage, param_grid, n_trials=3):
+    cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+    return PersistentSearchCV(LogisticRegression(), param_grid, cv, storage=str(storage),
+                              study_name='test', n_trials=n_trials, refit=False)
+
+
+def test_rerun_resumes_the_same_study(tmp_path):
+    X, y = _data(0)
+    grid = {'C': [0.01, 0.1, 1.0, 10.0]}
+    first = _search(tmp_path / 'trials.db', grid).fit(X, y)
+    second = _search(tmp_path / 'trials.db', grid, n_trials=5).fit(X, y)
+    assert second.study_name_ == first.study_name_
+    assert first.n_trials_ == 3 and second.n_trials_ == 5
+
+
+# Changed data or a changed grid must not reuse trials scored on the old ones
+def test_changed_data_or_grid_starts_a_new_study(tmp_path):
+    storage = tmp_path / 'trials.db'
+    X, y = _data(0)
+    first = _search(storage, {'C': [0.01, 0.1, 1.0, 10.0]}).fit(X, y)
+
+    X_new, y_new = _data(1)
+    new_data = _search(storage, {'C': [0.01, 0.1, 1.0, 10.0]}).fit(X_new, y_new)
+    assert new_data.study_name_ != first.study_name_
+    assert new_data.n_trials_ == 3
+
+    new_grid = _search(storage, {'C': [0.5, 5.0], 'fit_intercept': [True, False]}).fit(X, y)
+    assert new_grid.study_name_ not in (first.study_name_, new_data.study_name_)
+    assert set(new_grid.best_params_) == {'C', 'fit_intercept'}
+
+
+@pytest.mark.parametrize('options', [{'transform_cache': TransformCache()},
+                                     {'staged_trees': True}])
+def test_tpe_rejects_unsupported_options(options):
+    cv = StratifiedKFold(n_splits=3)
+    with pytest.raises(ValueError):
+        make_search(LogisticRegression(), {'C': [1.0]}, cv, method='tpe', **options)
+
+
+# A trial left RUNNING by a killed run is failed and its params are scored again
+def test_interrupted_trial_is_retried(tmp_path):
+    X, y = _data(0)
+    grid = {'C': [0.01, 0.1, 1.0, 10.0]}
+    first = _search(tmp_path / 'trials.db', grid, n_trials=1).fit(X, y)
+    interrupted = first.study_.ask()
+    C = interrupted.suggest_categorical('C', grid['C'])
+
+    second = _search(tmp_path / 'trials.db', grid, n_trials=2).fit(X, y)
+    trials = second.study_.get_trials(deepcopy=False)
+    assert trials[interrupted.number].state == optuna.trial.TrialState.FAIL
+    retried = trials[-1]
+    assert retried.state == optuna.trial.TrialState.COMPLETE
+    assert retried.params == {'C': C} and retried.user_attrs['retries'] == 1
+    assert second.n_trials_ == 2
@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from diabetes_pipeline.batch_scoring import score_file
+from diabetes_pipeline.prediction_server import PredictionServer
+
+
+# Run coroutine(server) with the server's micro-batcher, without the HTTP layer
+def _serve(server, coroutine):
+    async def main():
+        server._queue = asyncio.Queue()
+        batcher = asyncio.create_task(server._batcher())
+        try:
+            return await coroutine(server)
+        finally:
+            batcher.cancel()
+    return asyncio.run(main())
+
+
+def _records(run, n):
+    raw = pd.read_csv(run.get('csv')).head(n)
+    return raw.drop(columns=['Outcome']).to_dict('records')
+
+
+async def _one_at_a_time(server, records):
+    return [(await server.predict([record]))[0] for record in records]
+
+
+async def _concurrently(server, records):
+    return await asyncio.gather(*(server.predict([record]) for record in records))
+
+
+@pytest.mark.parametrize('max_batch_size', [1, 8, 64])
+def test_predictions_do_not_depend_on_the_batch(scoring_run, tmp_path, max_batch_size):
+    records = _records(scoring_run, 100)
+    server = PredictionServer(scoring_run.get('artifacts'), max_batch_size=max_batch_size,
+                              max_wait_ms=50)
+    alone = _serve(server, lambda server: _one_at_a_time(server, records))
+    batched = [result[0] for result in _serve(server, lambda server: _concurrently(server, records))]
+    np.testing.assert_array_equal(batched, alone)
+
+    score_file(scoring_run.get('artifacts'), scoring_run.get('csv'), tmp_path / 'scores.csv',
+               n_jobs=1)
+    # The CSV holds the float32 probabilities as text
+    expected = pd.read_csv(tmp_path / 'scores.csv')['probability'].head(len(records))
+    np.testing.assert_allclose(alone, expected, rtol=1e-6)
+
+
+def test_non_numeric_row_only_fails_its_own_request(scoring_run):
+    records = _records(scoring_run, 3)
+    records[1] = dict(records[1], Glucose='high')
+    server = PredictionServer(scoring_run.get('artifacts'), max_wait_ms=50)
+
+    async def requests(server):
+        return await asyncio.gather(*(server.predict([record]) for record in records),
+                                    return_exceptions=True)
+    results = _serve(server, requests)
+    assert isinstance(results[1], ValueError)
+    assert all(isinstance(results[i][0], float) for i in (0, 2))
+
+
+def test_failing_row_is_isolated_from_its_batch(scoring_run, monkeypatch):
+    records = _records(scoring_run, 4)
+    server = PredictionServer(scoring_run.get('artifacts'), max_wait_ms=50)
+    predict = server._predict
+
+    # A row the model cannot score, although its values are numbers
+    def fussy_predict(rows):
+        if any(row[0] == -1 for row in rows):
+            raise RuntimeError("cannot score")
+        return predict(rows)
+    monkeypatch.setattr(server, '_predict', fussy_predict)
+    records[2] = dict(records[2], **{server.raw_columns[0]: -1})
+
+    async def requests(server):
+        return await asyncio.gather(*(server.predict([record]) for record in records),
+                                    return_exceptions=True)
+    results = _serve(server, requests)
+    assert isinstance(results[2], RuntimeError)
+    assert all(isinstance(results[i][0], float) for i in (0, 1, 3))
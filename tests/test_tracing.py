@@ -0,0 +1,43 @@
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+
+from diabetes_pipeline import tracing
+from diabetes_pipeline.feature_selection import select_top_features
+
+
+def _traced_selection(path, data):
+    X, y = data
+    X = X.iloc[:, :4]
+    cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+    with tracing.trace(path):
+        with tracing.span('select'):
+            select_top_features(LogisticRegression(), X, y, list(X.columns), cv)
+    return tracing.load_trace(path)
+
+
+# Every (n, fold) fit is recorded once, attributed to the open stage, in both formats
+def test_fits_recorded_in_both_formats(tmp_path, selection_data):
+    for name in ('trace.json', 'trace.jsonl'):
+        records = _traced_selection(tmp_path / name, selection_data)
+        stages = [record for record in records if record['type'] == 'stage']
+        fits = [record for record in records if record['type'] == 'fit']
+        assert [stage['name'] for stage in stages] == ['select']
+        assert sorted((fit['params']['n_features'], fit['fold']) for fit in fits) == \
+            [(n, fold) for n in range(1, 5) for fold in range(3)]
+        assert all(fit['stage'] == 'select' and fit['name'] == 'top_n' for fit in fits)
+        assert all(0 <= fit['fit_s'] <= fit['wall_s'] for fit in fits)
+
+
+# A killed run leaves the Chrome trace's event array unterminated
+def test_unterminated_chrome_trace_loads(tmp_path, selection_data):
+    path = tmp_path / 'trace.json'
+    records = _traced_selection(path, selection_data)
+    text = path.read_text()
+    path.write_text(text[:text.rindex('\n]')] + ',\n')
+    assert tracing.load_trace(path) == records
+
+
+def test_no_trace_records_nothing():
+    with tracing.span('select'):
+        tracing.record_fit('top_n', tracing.FitClock().stop())
+    assert tracing._active is None